@@ -9,8 +9,21 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from asgiref.sync import ThreadSensitiveContext
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blango.settings')
+os.environ.setdefault("DJANGO_CONFIGURATION", "Prod")
 
-application = get_asgi_application()
+# configurations.asgi sets the project up as soon as it's imported, so only
+# after the environment is
+from configurations.asgi import get_asgi_application  # noqa: E402
+
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # Django 3.2 runs the sync code of every request (sync views, sync
+    # middleware, sync_to_async calls) in one shared thread; a context per
+    # request gives each request a thread of its own, as Django 4 does
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
@@ -0,0 +1,221 @@
+"""
+Two-tier cache backend.
+
+L1 is a small LRU kept inside each process (Django's LocMemCache, which is
+already a bounded LRU with per-key expiry). L2 is any other configured cache
+alias shared by all processes - the file-based cache in development, memcached
+or redis in a real deployment. Reads are served from L1 when possible, fall
+back to L2 and refill L1; writes go to both.
+
+Writes only reach the L1 of the process that made them, so L1 entries are kept
+for at most L1_TIMEOUT seconds. That bounds how long another process can serve
+a value that has been replaced in L2. Keys that must never be stale, like
+version counters and locks, are kept out of L1 with L1_BYPASS_PREFIXES and
+always read and written in L2.
+
+Configuration::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "blango.cache.TwoTierCache",
+            "OPTIONS": {
+                "L2": "shared",           # alias of the shared cache
+                "L1_MAX_ENTRIES": 1000,
+                "L1_TIMEOUT": 5,
+                "NEGATIVE_TIMEOUT": 30,   # how long get_or_set() remembers None
+                "L1_BYPASS_PREFIXES": ("app:version:",),
+            },
+        },
+        "shared": {...},
+    }
+"""
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_add_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class NegativeResult:
+    """Stored in place of a value that was looked up and found not to exist."""
+
+    def __eq__(self, other):
+        return isinstance(other, NegativeResult)
+
+    def __hash__(self):
+        return hash(NegativeResult)
+
+
+NEGATIVE = NegativeResult()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+
+        self._l2_alias = options.get("L2", "shared")
+        self.l1_timeout = options.get("L1_TIMEOUT", 5)
+        self.negative_timeout = options.get("NEGATIVE_TIMEOUT", 30)
+        self.l1_bypass_prefixes = tuple(options.get("L1_BYPASS_PREFIXES", ()))
+
+        # LocMemCache instances with the same name share their storage, so
+        # every thread of the process sees the same L1
+        self._l1 = LocMemCache(
+            f"two-tier-l1:{location}",
+            {"TIMEOUT": self.l1_timeout, "OPTIONS": {"MAX_ENTRIES": options.get("L1_MAX_ENTRIES", 1000)}},
+        )
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def _count(self, counter, n=1):
+        with self._stats_lock:
+            self._stats[counter] += n
+
+    def get_stats(self):
+        """Hit/miss counters of this process since it started or reset_stats()."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats["hit_rate"] = (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for counter in self._stats:
+                self._stats[counter] = 0
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def _in_l1(self, key):
+        return not key.startswith(self.l1_bypass_prefixes)
+
+    def _get_raw(self, key, version=None):
+        in_l1 = self._in_l1(key)
+        value = self._l1.get(key, _MISSING, version=version) if in_l1 else _MISSING
+        if value is not _MISSING:
+            self._count("l1_hits")
+            return value
+
+        value = self._l2.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            self._count("l2_hits")
+            if in_l1:
+                self._l1.set(key, value, self.l1_timeout, version=version)
+            return value
+
+        self._count("misses")
+        return _MISSING
+
+    def get(self, key, default=None, version=None):
+        value = self._get_raw(key, version=version)
+        if value is _MISSING or value == NEGATIVE:
+            return default
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        l1_keys = [key for key in keys if self._in_l1(key)]
+        l1_values = self._l1.get_many(l1_keys, version=version) if l1_keys else {}
+        self._count("l1_hits", len(l1_values))
+
+        remaining = [key for key in keys if key not in l1_values]
+        l2_values = self._l2.get_many(remaining, version=version) if remaining else {}
+        self._count("l2_hits", len(l2_values))
+        self._count("misses", len(remaining) - len(l2_values))
+        refill = {key: value for key, value in l2_values.items() if self._in_l1(key)}
+        if refill:
+            self._l1.set_many(refill, self.l1_timeout, version=version)
+
+        for key, value in {**l1_values, **l2_values}.items():
+            if value != NEGATIVE:
+                found[key] = value
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        if self._in_l1(key):
+            self._l1.set(key, value, self._l1_ttl(timeout), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._l2.set_many(data, timeout, version=version)
+        l1_data = {key: value for key, value in data.items() if self._in_l1(key)}
+        if l1_data:
+            self._l1.set_many(l1_data, self._l1_ttl(timeout), version=version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # backends like FileBasedCache check and set in two steps, so at least
+        # make add() atomic among the threads of this process (cache handles
+        # are per thread, hence the module level lock)
+        with _add_lock:
+            added = self._l2.add(key, value, timeout, version=version)
+        if added and self._in_l1(key):
+            self._l1.set(key, value, self._l1_ttl(timeout), version=version)
+        else:
+            # somebody else owns the key, make the next read go to L2
+            self._l1.delete(key, version=version)
+        return added
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Read-through: on a miss `default` (usually a callable loading the
+        value) is stored and returned. A load that returns None is cached as a
+        negative result for NEGATIVE_TIMEOUT seconds, so lookups of things
+        that don't exist don't hit the database every time either.
+        """
+        value = self._get_raw(key, version=version)
+        if value == NEGATIVE:
+            return None
+        if value is not _MISSING:
+            return value
+
+        if callable(default):
+            default = default()
+        if default is None:
+            self.set(key, NEGATIVE, self.negative_timeout, version=version)
+        else:
+            self.set(key, default, timeout, version=version)
+        return default
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1.delete(key, version=version)
+        return self._l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._l2.incr(key, delta, version=version)
+        if self._in_l1(key):
+            self._l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def delete(self, key, version=None):
+        self._l1.delete(key, version=version)
+        return self._l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._l1.delete_many(keys, version=version)
+        self._l2.delete_many(keys, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
@@ -0,0 +1,67 @@
+"""
+A small per-process LRU whose entries expire, for the resolvers that map
+lookups (tag values, emails) to primary keys without a cache round-trip.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ExpiringLRU:
+    """
+    Thread-safe mapping of at most `max_entries` keys, least recently used
+    evicted first, each kept for `ttl` seconds. Both may be callables, read
+    on every write, so they can come from settings.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (value, expires_at), least recently used first
+        self._entries = OrderedDict()
+
+    def _option(self, option):
+        return option() if callable(option) else option
+
+    def get_many(self, keys):
+        """{key: value} of the `keys` present and not expired."""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, data):
+        expires_at = time.monotonic() + self._option(self._ttl)
+        max_entries = self._option(self._max_entries)
+        with self._lock:
+            for key, value in data.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_value(self, value):
+        """Drops every key mapped to `value`, for when the key it was stored under isn't known any more."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] == value]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -116,6 +116,8 @@ class Dev(Configuration):
       # 'django.middleware.csrf.CsrfViewMiddleware',
       'django.contrib.auth.middleware.AuthenticationMiddleware',
       'django.contrib.messages.middleware.MessageMiddleware',
+      # publishes scheduled posts the publish_scheduled worker hasn't got to yet
+      'blog.publishing.scheduled_publishing_middleware',
       # 'django.middleware.clickjacking.XFrameOptionsMiddleware',
   ]
 
@@ -267,10 +269,31 @@ class Dev(Configuration):
     # }
 
     #database caching
+    # "default": {
+    #     "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+    #     "LOCATION": "my_cache_table",
+    # }
+
+    #two tier caching: a per-process LRU in front of a shared cache, so most
+    #hits never leave the process and none of them cost an SQL round-trip.
+    #cache_page, {% cache %} fragments and DRF throttling all use "default"
     "default": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": "my_cache_table",
-    }
+        "BACKEND": "blango.cache.TwoTierCache",
+        "OPTIONS": {
+            "L2": "shared",
+            "L1_MAX_ENTRIES": 1000,
+            "L1_TIMEOUT": 5,
+            "NEGATIVE_TIMEOUT": 30,
+            #version counters and leases must be the same in every process
+            "L1_BYPASS_PREFIXES": ("blog:version:", "blog:lease:"),
+        },
+    },
+    #the shared tier; point it at memcached/redis when running several hosts
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("SHARED_CACHE_LOCATION", "/var/tmp/django_cache"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 
     #filesystem cache
     # "default": {
@@ -354,6 +377,27 @@ class Dev(Configuration):
   # URL/path to serve media from
   MEDIA_URL = "/media/"
 
+  # Hero image renditions are generated ahead of time by blog.renditions when
+  # an image is uploaded or its PPOI changes, never while serving a request.
+  VERSATILEIMAGEFIELD_SETTINGS = {
+      "create_images_on_demand": False,
+  }
+
+  VERSATILEIMAGEFIELD_RENDITION_KEY_SETS = {
+      "hero_image": [
+          ("full_size", "url"),
+          ("thumbnail", "thumbnail__100x100"),
+          ("square_crop", "crop__200x200"),
+      ],
+  }
+
+  # processes rendering hero image renditions; 0 renders them in the process
+  # that saved the post
+  BLOG_RENDITION_WORKERS = values.IntegerValue(2)
+
+  # most posts or comments one request to the bulk endpoints may create
+  BLOG_BULK_MAX_ITEMS = values.IntegerValue(10000)
+
 
 
 class Prod(Dev):
@@ -0,0 +1,47 @@
+"""
+Test and benchmark support.
+
+The tests and the benchmark commands write to and clear the cache, so they run
+against TEST_CACHES: the same two tiers as the settings, with an in-process
+shared tier instead of the one a running server uses.
+"""
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+TEST_CACHES = {
+  "default": {
+    "BACKEND": "blango.cache.TwoTierCache",
+    "LOCATION": "blango-test",
+    "OPTIONS": {
+      "L2": "shared",
+      "L1_MAX_ENTRIES": 1000,
+      "L1_TIMEOUT": 5,
+      "NEGATIVE_TIMEOUT": 30,
+      "L1_BYPASS_PREFIXES": ("blog:version:", "blog:lease:"),
+    },
+  },
+  "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "blango-test-shared"},
+}
+
+
+def isolated_cache():
+  """Runs the code under it (as a context manager or decorator) against TEST_CACHES."""
+  return override_settings(CACHES=TEST_CACHES)
+
+
+class IsolatedCacheMixin:
+  """Starts every test with an empty TEST_CACHES cache."""
+
+  def setUp(self):
+    super().setUp()
+    cache.clear()
+
+
+@isolated_cache()
+class CacheTestCase(IsolatedCacheMixin, TestCase):
+  pass
+
+
+@isolated_cache()
+class CacheSimpleTestCase(IsolatedCacheMixin, SimpleTestCase):
+  pass
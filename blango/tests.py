@@ -0,0 +1,105 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from blango.cache import TwoTierCache
+from blango.lru import ExpiringLRU
+
+TEST_CACHES = {
+  "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+  "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "two-tier-test-l2"},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TwoTierCacheTestCase(SimpleTestCase):
+  def setUp(self):
+    self.cache = TwoTierCache(self.id(), {"OPTIONS": {"L2": "shared", "L1_MAX_ENTRIES": 2, "NEGATIVE_TIMEOUT": 30}})
+    self.cache.clear()
+
+  def test_reads_fill_l1_from_l2(self):
+    caches["shared"].set("key", "value")
+    self.assertEqual(self.cache.get("key"), "value")
+    self.assertEqual(self.cache.get("key"), "value")
+    self.assertEqual(self.cache.get("other"), None)
+
+    stats = self.cache.get_stats()
+    self.assertEqual((stats["l1_hits"], stats["l2_hits"], stats["misses"]), (1, 1, 1))
+
+  def test_writes_reach_both_tiers(self):
+    self.cache.set("key", "value")
+    self.assertEqual(caches["shared"].get("key"), "value")
+
+    self.cache.delete("key")
+    self.assertIsNone(caches["shared"].get("key"))
+    self.assertIsNone(self.cache.get("key"))
+
+  def test_l1_is_bounded(self):
+    for i in range(5):
+      self.cache.set(f"key{i}", i)
+    self.cache.reset_stats()
+
+    # the oldest keys were evicted from L1 but are still in L2
+    self.assertEqual(self.cache.get("key0"), 0)
+    self.assertEqual(self.cache.get_stats()["l2_hits"], 1)
+
+  def test_incr_keeps_tiers_in_sync(self):
+    self.cache.set("counter", 1)
+    self.assertEqual(self.cache.incr("counter"), 2)
+    self.assertEqual(self.cache.get("counter"), 2)
+    self.assertEqual(caches["shared"].get("counter"), 2)
+
+  def test_negative_caching(self):
+    calls = []
+
+    def load():
+      calls.append(1)
+      return None
+
+    self.assertIsNone(self.cache.get_or_set("missing", load))
+    self.assertIsNone(self.cache.get_or_set("missing", load))
+    self.assertEqual(len(calls), 1)
+    self.assertFalse(self.cache.has_key("missing"))
+    self.assertEqual(self.cache.get_many(["missing"]), {})
+
+    self.assertEqual(self.cache.get_or_set("present", lambda: "value"), "value")
+    self.assertEqual(self.cache.get("present"), "value")
+
+  def test_l1_bypass(self):
+    options = {"L2": "shared", "L1_BYPASS_PREFIXES": ("version:",)}
+    # two processes: separate L1s over the same L2
+    one = TwoTierCache(f"{self.id()}-one", {"OPTIONS": options})
+    two = TwoTierCache(f"{self.id()}-two", {"OPTIONS": options})
+    for cache in (one, two):
+      cache.set("version:posts", 1)
+      cache.set("value", "old")
+    self.assertEqual((two.get("version:posts"), two.get("value")), (1, "old"))
+
+    one.incr("version:posts")
+    one.set("value", "new")
+    # the counter is read from L2, other keys may be served from L1 for a while
+    self.assertEqual(two.get("version:posts"), 2)
+    self.assertEqual(two.get_many(["version:posts"]), {"version:posts": 2})
+    self.assertEqual(two.get("value"), "old")
+
+    self.assertTrue(one.add("version:lease", 1))
+    self.assertFalse(two.add("version:lease", 1))
+
+
+class ExpiringLRUTestCase(SimpleTestCase):
+  def test_evicts_least_recently_used(self):
+    lru = ExpiringLRU(60, 2)
+    lru.set_many({"a": 1, "b": 2})
+    self.assertEqual(lru.get("a"), 1)
+    lru.set("c", 3)
+    self.assertEqual(lru.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+    lru.delete_value(3)
+    self.assertIsNone(lru.get("c"))
+
+  def test_entries_expire(self):
+    ttl = [60]
+    lru = ExpiringLRU(lambda: ttl[0], 10)
+    lru.set("a", 1)
+    ttl[0] = -1
+    lru.set("b", 2)
+    self.assertEqual(lru.get_many(["a", "b"]), {"a": 1})
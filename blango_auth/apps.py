@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlangoAuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blango_auth'
+
+    def ready(self):
+        # keeps the email resolver cache in step with the users
+        import blango_auth.signals  # noqa: F401
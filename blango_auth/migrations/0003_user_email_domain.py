@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def backfill_email_domain(apps, schema_editor):
+    User = apps.get_model('blango_auth', 'User')
+    users = list(User.objects.only('pk', 'email'))
+    for user in users:
+        user.email_domain = user.email.rpartition('@')[2].lower()
+    User.objects.bulk_update(users, ['email_domain'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blango_auth', '0002_auto_20220509_1554'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_domain',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_email_domain, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='blango_auth_user_email_lower'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 from django.contrib.auth.models import AbstractUser, UserManager
 
@@ -36,17 +37,55 @@ class BlangoUserManager(UserManager):
     
     return self._create_user(email, password, **extra_fields)
 
+  # The lookups below all go through an index: Lower("email") is indexed, and
+  # email_domain is stored lowercased with its own index.
+  def with_email(self, email):
+    """Case-insensitive exact match."""
+    return self.get_queryset().alias(email_lower=Lower("email")).filter(email_lower=email.lower())
+
+  def with_email_prefix(self, prefix):
+    """Case-insensitive prefix match, as a range so the index can be used (unlike LIKE)."""
+    prefix = prefix.lower()
+    if not prefix:
+      return self.get_queryset()
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return self.get_queryset().alias(email_lower=Lower("email")).filter(
+      email_lower__gte=prefix, email_lower__lt=upper
+    )
+
+  def with_email_domain(self, domain):
+    return self.get_queryset().filter(email_domain=domain.lower())
+
+
+def email_domain(email):
+  return email.rpartition("@")[2].lower()
+
 
 class User(AbstractUser):
   username = None
   
   # translation strings. They tell Django: “This text should be translated into the end user’s language, if a translation for this text is available in that language.” 
   email = models.EmailField(_("email address"), unique=True,)
+
+  # derived from email on save, for indexed domain searches
+  email_domain = models.CharField(max_length=255, editable=False, db_index=True, default="")
   
   objects = BlangoUserManager()
 
   USERNAME_FIELD = "email"  # by default is unique and required
   REQUIRED_FIELDS = []
 
+  class Meta(AbstractUser.Meta):
+    indexes = [
+      models.Index(Lower("email"), name="blango_auth_user_email_lower"),
+    ]
+
   def __str__(self):
     return self.email
+
+  def save(self, *args, **kwargs):
+    self.email_domain = email_domain(self.email)
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "email" in update_fields:
+      kwargs["update_fields"] = set(update_fields) | {"email_domain"}
+    super(User, self).save(*args, **kwargs)
@@ -0,0 +1,49 @@
+"""
+Per-process cache of lowercased email -> user primary key.
+
+Author filters and user detail lookups arrive with an email; resolving it
+here once lets the following queries go by primary key. Entries are dropped
+by the signal handlers in blango_auth.signals when a user is saved or
+deleted in this process, and expire after EMAIL_RESOLVER_TTL seconds so a
+change made by another process is picked up too. Unknown emails are not
+cached, a user signing up elsewhere would otherwise stay unresolvable.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from blango.lru import ExpiringLRU
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+
+# lowercased email -> pk
+_pks = ExpiringLRU(
+  lambda: getattr(settings, "EMAIL_RESOLVER_TTL", DEFAULT_TTL),
+  lambda: getattr(settings, "EMAIL_RESOLVER_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+)
+
+
+def resolve_email(email):
+  """Returns the pk of the user with `email` (case-insensitive), or None."""
+  email = email.lower()
+  pk = _pks.get(email)
+  if pk is not None:
+    return pk
+
+  pk = get_user_model().objects.with_email(email).values_list("pk", flat=True).first()
+  if pk is not None:
+    _pks.set(email, pk)
+  return pk
+
+
+def forget_email(email):
+  _pks.delete(email.lower())
+
+
+def forget_user(pk):
+  # the old email of a renamed user isn't known any more
+  _pks.delete_value(pk)
+
+
+def clear():
+  _pks.clear()
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from blango_auth import resolver
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_saved_user(sender, instance, update_fields=None, **kwargs):
+  # logins only save last_login
+  if update_fields is not None and "email" not in update_fields:
+    return
+  resolver.forget_user(instance.pk)
+  resolver.forget_email(instance.email)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_deleted_user(sender, instance, **kwargs):
+  resolver.forget_user(instance.pk)
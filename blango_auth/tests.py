@@ -1,3 +1,57 @@
-from django.test import TestCase
+from django.db import connection
 
-# Create your tests here.
+from blango.testing import CacheTestCase
+from blango_auth import resolver
+from blango_auth.models import User
+
+
+class EmailLookupTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    resolver.clear()
+    self.alice = User.objects.create_user(email="Alice@Example.com")
+    self.bob = User.objects.create_user(email="bob@other.org")
+
+  def test_email_domain(self):
+    self.assertEqual(self.alice.email_domain, "example.com")
+
+    self.bob.email = "bob@NEW.org"
+    self.bob.save(update_fields=["email"])
+    self.bob.refresh_from_db()
+    self.assertEqual(self.bob.email_domain, "new.org")
+
+  def test_lookups(self):
+    self.assertEqual(list(User.objects.with_email("alice@example.COM")), [self.alice])
+    self.assertEqual(list(User.objects.with_email_prefix("ALI")), [self.alice])
+    self.assertEqual(list(User.objects.with_email_prefix("bob@other.org")), [self.bob])
+    self.assertEqual(list(User.objects.with_email_prefix("bob@other.orgx")), [])
+    self.assertEqual(list(User.objects.with_email_domain("Other.org")), [self.bob])
+
+  def test_lookups_use_indexes(self):
+    for queryset in [
+      User.objects.with_email("alice@example.com"),
+      User.objects.with_email_prefix("ali"),
+      User.objects.with_email_domain("example.com"),
+    ]:
+      sql, params = queryset.query.sql_with_params()
+      with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        plan = " ".join(row[-1] for row in cursor.fetchall())
+      self.assertIn("USING INDEX", plan)
+
+  def test_resolver(self):
+    self.assertEqual(resolver.resolve_email("ALICE@example.com"), self.alice.pk)
+    with self.assertNumQueries(0):
+      self.assertEqual(resolver.resolve_email("alice@example.com"), self.alice.pk)
+    self.assertIsNone(resolver.resolve_email("nobody@example.com"))
+
+    # saving drops the entries of the user, under its old email too
+    self.alice.email = "alice@new.org"
+    self.alice.save()
+    self.assertIsNone(resolver.resolve_email("alice@example.com"))
+    self.assertEqual(resolver.resolve_email("alice@new.org"), self.alice.pk)
+
+    pk = self.alice.pk
+    self.alice.delete()
+    self.assertIsNone(resolver.resolve_email("alice@new.org"))
+    self.assertNotEqual(pk, resolver.resolve_email("bob@other.org"))
@@ -0,0 +1,41 @@
+"""
+Async variants of the read-heavy API endpoints, for ASGI deployments. They're
+mounted under /api/v1/async/ and answer fresh cache hits without entering DRF;
+anything else is handled by the viewsets in blog.api.views, with which they
+share cached responses. See blog.caching.async_cached_view.
+"""
+from django.urls import reverse
+
+from blog.caching import async_cached_view
+from blog.api.visibility import visibility_class
+from blog.api.views import (
+  PostViewSet, TagViewSet, post_detail_scopes, post_list_scopes, tag_posts_scopes,
+)
+
+def sync_path(url_name):
+  """The `path` of async_cached_view() for the sync view named `url_name`."""
+  return lambda request, *args, **kwargs: reverse(url_name, args=args, kwargs=kwargs)
+
+
+post_list = async_cached_view(
+  PostViewSet.as_view({"get": "list"}),
+  scopes=post_list_scopes, variant=visibility_class, path=sync_path("post-list"),
+)
+
+posts_by_time = async_cached_view(
+  PostViewSet.as_view({"get": "by_time"}),
+  scopes=post_list_scopes, variant=visibility_class, path=sync_path("posts-by-time"),
+)
+
+post_detail = async_cached_view(
+  PostViewSet.as_view({"get": "retrieve"}, detail=True),
+  scopes=post_detail_scopes, variant=visibility_class, path=sync_path("post-detail"),
+)
+
+tag_list = async_cached_view(TagViewSet.as_view({"get": "list"}), scopes=["tags"], path=sync_path("tag-list"))
+
+# the router would apply the @action options, like its pagination_class
+tag_posts = async_cached_view(
+  TagViewSet.as_view({"get": "posts"}, detail=True, **TagViewSet.posts.kwargs),
+  scopes=tag_posts_scopes, path=sync_path("tag-posts"),
+)
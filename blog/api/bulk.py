@@ -0,0 +1,101 @@
+"""
+Bulk creation of posts and comments.
+
+A request to a bulk endpoint is validated in one pass and written with a
+handful of queries whatever its size: the tags of every post are resolved at
+once by blog.tag_resolver, slugs are checked for uniqueness with one IN query
+per batch and the rows are inserted with bulk_create inside one transaction. bulk_create sends no post_save signals,
+so the posts_bulk_created and comments_bulk_created signals of blog.signals
+are sent instead.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+from blog.models import Comment, Post
+from blog.signals import comments_bulk_created, posts_bulk_created
+from blog.tag_resolver import resolve_tags
+
+BATCH_SIZE = 1000
+
+
+def chunks(items, size=BATCH_SIZE):
+  for start in range(0, len(items), size):
+    yield items[start:start + size]
+
+
+def in_bulk(serializer):
+  """Whether `serializer` (a field or a child serializer) validates part of a bulk request."""
+  return isinstance(serializer.root, serializers.ListSerializer)
+
+
+class BulkPostListSerializer(serializers.ListSerializer):
+  def to_internal_value(self, data):
+    # slugs are checked for the whole request below rather than one query per post
+    slug = self.child.fields["slug"]
+    slug.validators = [v for v in slug.validators if not isinstance(v, UniqueValidator)]
+
+    validated = super(BulkPostListSerializer, self).to_internal_value(data)
+
+    slugs = [item["slug"] for item in validated]
+    taken = set()
+    for batch in chunks(slugs):
+      taken.update(Post.objects.filter(slug__in=batch).values_list("slug", flat=True))
+
+    errors, seen = [], set()
+    for slug in slugs:
+      errors.append({"slug": ["post with this slug already exists."]} if slug in taken or slug in seen else {})
+      seen.add(slug)
+    if any(errors):
+      raise serializers.ValidationError(errors)
+    return validated
+
+  def create(self, validated_data):
+    with transaction.atomic():
+      tags = resolve_tags(value for item in validated_data for value in item["tags"])
+
+      posts = []
+      for item in validated_data:
+        post = Post(**{name: value for name, value in item.items() if name != "tags"})
+        post.update_text_metadata()
+        post.update_is_published()
+        posts.append(post)
+
+      for batch in chunks(posts):
+        Post.objects.bulk_create(batch)
+        if batch[0].pk is None:
+          # not every backend returns the new primary keys from a bulk insert
+          pks = dict(Post.objects.filter(slug__in=[post.slug for post in batch]).values_list("slug", "pk"))
+          for post in batch:
+            post.pk = pks[post.slug]
+
+      Post.tags.through.objects.bulk_create([
+        Post.tags.through(post_id=post.pk, tag_id=tags[value].pk)
+        for post, item in zip(posts, validated_data)
+        for value in set(item["tags"])
+      ], batch_size=BATCH_SIZE)
+
+      posts_bulk_created.send(sender=Post, posts=posts, tag_pks={tag.pk for tag in tags.values()})
+    return posts
+
+
+def create_comments(post, creator, comments_data):
+  """Adds a comment by `creator` to `post` for each of `comments_data`."""
+  post_type = ContentType.objects.get_for_model(Post)
+  with transaction.atomic():
+    comments = Comment.objects.bulk_create([
+      Comment(
+        **{name: value for name, value in item.items() if name != "id"},
+        creator=creator, content_type=post_type, object_id=post.pk,
+      )
+      for item in comments_data
+    ], batch_size=BATCH_SIZE)
+    comments_bulk_created.send(sender=Comment, comments=comments)
+  return comments
+
+
+class BulkCommentListSerializer(serializers.ListSerializer):
+  # the post commented on is passed in the context
+  def create(self, validated_data):
+    return create_comments(self.context["post"], self.context["request"].user, validated_data)
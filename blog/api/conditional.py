@@ -0,0 +1,124 @@
+"""
+Conditional GET (ETag / Last-Modified) for the API viewsets.
+
+The validators come from cheap aggregate queries (a count plus the latest
+modification time) rather than from the rendered body, so a client that
+already has the current representation gets a 304 before the page queryset
+runs or anything is serialized. Cursor paged lists, which exist to avoid
+counting the whole result, are fingerprinted from the rows of the page
+instead, which still saves serializing them.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import CursorPagination
+
+from blog.api.visibility import visibility_class
+from blog.caching import get_versions
+
+
+def make_etag(request, parts):
+  # the same data renders differently per page, format and visibility class;
+  # the users of a class share their responses, and so their validators
+  parts = [
+    request.get_full_path(),
+    request.META.get("HTTP_ACCEPT", ""),
+    visibility_class(request),
+  ] + list(parts)
+  digest = hashlib.md5("\n".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+  return "W/" + quote_etag(digest)
+
+
+def conditional(request, parts, last_modified, respond):
+  """
+  Returns a 304 if the request validators match the fingerprint, otherwise
+  calls `respond()` and adds ETag / Last-Modified to its response.
+  """
+  etag = make_etag(request, parts)
+  timestamp = int(last_modified.timestamp()) if last_modified else None
+
+  response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+  if response is not None:
+    return response
+
+  response = respond()
+  if response.status_code == 200:
+    response["ETag"] = etag
+    if timestamp is not None:
+      response["Last-Modified"] = http_date(timestamp)
+  return response
+
+
+class ConditionalGetMixin:
+  """
+  Adds validators to list and retrieve. `fingerprint_fields` are columns
+  folded into the per-object ETag and `fingerprint_scopes` are cache version
+  scopes (see blog.caching) for related data the aggregates below can't see,
+  like a renamed tag.
+  """
+  modified_field = None
+  fingerprint_fields = ()
+  fingerprint_scopes = ()
+
+  def get_fingerprint_scopes(self):
+    return list(self.fingerprint_scopes)
+
+  def get_list_fingerprint(self, queryset):
+    aggregates = {"count": Count("pk"), "max_pk": Max("pk")}
+    if self.modified_field:
+      aggregates["modified"] = Max(self.modified_field)
+    values = queryset.order_by().aggregate(**aggregates)
+    # no Last-Modified: deleting a row, relinking tags, publishing or a scope
+    # bump change a list without moving its latest modification time, which
+    # only the ETag (with the count and the scope versions) notices
+    return [values["count"], values["max_pk"], values.get("modified")], None
+
+  def get_object_fingerprint(self, queryset):
+    lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+    fields = list(self.fingerprint_fields)
+    if self.modified_field:
+      fields.append(self.modified_field)
+    row = queryset.filter(**lookup).values_list("pk", *fields).first()
+    if row is None:
+      return None, None
+    return list(row), row[-1] if self.modified_field else None
+
+  def get_page_fingerprint(self, page):
+    # the cursors stand for the rows around the page
+    parts = [self.paginator.get_previous_link(), self.paginator.get_next_link()]
+    for obj in page:
+      parts += [obj.pk, getattr(obj, self.modified_field) if self.modified_field else None]
+    return parts
+
+  def paginates_by_cursor(self):
+    paginator = self.paginator
+    if isinstance(paginator, CursorPagination):
+      return True
+    # SelectablePagination picks per request
+    use_cursor = getattr(paginator, "use_cursor", None)
+    return use_cursor is not None and use_cursor(self.request)
+
+  def list(self, request, *args, **kwargs):
+    queryset = self.filter_queryset(self.get_queryset())
+    if self.paginates_by_cursor():
+      page = self.paginate_queryset(queryset)
+      parts = self.get_page_fingerprint(page) + get_versions(self.get_fingerprint_scopes())
+      return conditional(
+        request, parts, None,
+        lambda: self.get_paginated_response(self.get_serializer(page, many=True).data),
+      )
+
+    parts, last_modified = self.get_list_fingerprint(queryset)
+    parts += get_versions(self.get_fingerprint_scopes())
+    return conditional(request, parts, last_modified, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+  def retrieve(self, request, *args, **kwargs):
+    parts, last_modified = self.get_object_fingerprint(self.get_queryset())
+    respond = lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+    if parts is None:
+      # let retrieve produce the 404
+      return respond()
+    parts += get_versions(self.get_fingerprint_scopes())
+    return conditional(request, parts, last_modified, respond)
@@ -0,0 +1,82 @@
+"""
+Streaming export of posts as NDJSON or a JSON array.
+
+The primary keys are read with a server-side iterator and the posts are
+loaded and serialized a chunk at a time, so the export holds one chunk in
+memory however large the result is. QuerySet.iterator() doesn't apply
+prefetch_related, which is why the posts of each chunk are loaded with a
+separate, planned query instead of being iterated directly.
+
+Under WSGI the chunks are produced while the response is sent, so the first
+bytes go out as soon as the first chunk is serialized. Django 3.2's
+ASGIHandler iterates responses on the event loop, where the queries of the
+generator would raise SynchronousOnlyOperation; there the chunks are written
+to a spooled temporary file in the view, which is then sent.
+"""
+import json
+from tempfile import SpooledTemporaryFile
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+EXPORT_FORMATS = {
+  "ndjson": "application/x-ndjson",
+  "json": "application/json",
+}
+
+DEFAULT_CHUNK_SIZE = 500
+
+# buffered exports up to this size stay in memory, larger ones go to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def chunked(iterable, size):
+  chunk = []
+  for item in iterable:
+    chunk.append(item)
+    if len(chunk) == size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+def serialize_in_chunks(queryset, serializer_class, context, chunk_size):
+  pks = queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size)
+  for chunk in chunked(pks, chunk_size):
+    # a single IN query plus the planned prefetches per chunk
+    posts = sorted(queryset.filter(pk__in=chunk), key=lambda post: post.pk)
+    yield from serializer_class(posts, many=True, context=context).data
+
+
+def encode(items, export_format):
+  if export_format == "ndjson":
+    for item in items:
+      yield json.dumps(item, cls=JSONEncoder) + "\n"
+    return
+
+  yield "["
+  for i, item in enumerate(items):
+    yield ("," if i else "") + json.dumps(item, cls=JSONEncoder)
+  yield "]\n"
+
+
+def streams(request):
+  """Whether the response to `request` can run queries while it is sent, see above."""
+  return not isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def export_response(request, queryset, serializer_class, context, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+  items = serialize_in_chunks(queryset, serializer_class, context, chunk_size)
+  filename = f"posts.{export_format}"
+  if streams(request):
+    response = StreamingHttpResponse(encode(items, export_format), content_type=EXPORT_FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+  spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+  for part in encode(items, export_format):
+    spool.write(part.encode())
+  spool.seek(0)
+  return FileResponse(spool, as_attachment=True, filename=filename, content_type=EXPORT_FORMATS[export_format])
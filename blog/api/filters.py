@@ -1,9 +1,12 @@
 from django_filters import rest_framework as filters
+from blog import search
 from blog.models import Post
+from blango_auth.models import User
+from blango_auth.resolver import resolve_email
 
 class PostFilterSet(filters.FilterSet):
   published_from = filters.DateFilter(
-    field_name='author__email', #referenced field email within author(foreignkey)
+    field_name='published_at',
     lookup_expr='gte',
     label='Published Date From'
   )
@@ -14,24 +17,60 @@ class PostFilterSet(filters.FilterSet):
     label='Published Date To'
   )
 
+  # the author filters go through indexes on the user table, see
+  # blango_auth.models.BlangoUserManager
   author_email = filters.CharFilter(
-    field_name='author__email',
-    lookup_expr='icontains',
-    label='Author Email Contains'
+    method='filter_author_email',
+    label='Author Email'
+  )
+
+  author_email_prefix = filters.CharFilter(
+    method='filter_author_email_prefix',
+    label='Author Email Starts With'
+  )
+
+  author_domain = filters.CharFilter(
+    method='filter_author_domain',
+    label='Author Email Domain'
+  )
+
+  # full-text searches, see blog.search; every word has to match
+  search = filters.CharFilter(
+    method = 'filter_search',
+    label = 'Search'
   )
 
   summary = filters.CharFilter(
-    field_name = 'summary',
-    lookup_expr = 'icontains',
+    method = 'filter_search',
     label = 'Summary contains'
   )
 
   content = filters.CharFilter(
-    field_name = 'content',
-    lookup_expr = 'icontains',
+    method = 'filter_search',
     label = 'Content contains'
   )
 
+  def filter_author_email(self, queryset, name, value):
+    # resolved to a pk once per process, so no join on the user table
+    pk = resolve_email(value)
+    if pk is None:
+      return queryset.none()
+    return queryset.filter(author_id=pk)
+
+  def filter_author_email_prefix(self, queryset, name, value):
+    return queryset.filter(author__in=User.objects.with_email_prefix(value))
+
+  def filter_author_domain(self, queryset, name, value):
+    return queryset.filter(author__in=User.objects.with_email_domain(value))
+
+  def filter_search(self, queryset, name, value):
+    column = None if name == 'search' else name
+    queryset = search.search(queryset, value, column=column)
+    # best matches first, unless the request asks for another ordering
+    if name == 'search' and (self.request is None or 'ordering' not in self.request.query_params):
+      queryset = queryset.order_by('search_rank', '-pk')
+    return queryset
+
   class Meta:
     model = Post
     fields = ["author", "tags"]
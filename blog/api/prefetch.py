@@ -0,0 +1,87 @@
+"""
+Serializer-aware prefetch planner.
+
+Walks the fields a serializer will read and works out which relations need a
+select_related (to-one) or prefetch_related (to-many) so serializing a page
+costs a fixed number of queries instead of one or more per row. Nested
+serializers over to-many relations get a Prefetch() whose queryset is planned
+the same way, e.g. PostDetailSerializer.comments becomes
+Prefetch("comments", Comment.objects.select_related("creator")).
+
+A field can plan its own relation with a prefetch_lookups(path) method
+returning the lookups to use, e.g. none for a field which only ever shows a
+few of the related objects and loads them itself.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import relations, serializers
+
+
+def _needs_related_object(field):
+  # a primary key (or pk-based hyperlink) can be read off the foreign key
+  # column without loading the related row
+  if isinstance(field, relations.PrimaryKeyRelatedField):
+    return False
+  if isinstance(field, relations.HyperlinkedRelatedField) and field.lookup_field == "pk":
+    return False
+  return True
+
+
+def plan(serializer, model, prefix=""):
+  """
+  Returns (select_related, prefetch_related) lookups for `serializer`
+  reading instances of `model`.
+  """
+  select_related = []
+  prefetch_related = []
+
+  for field in serializer.fields.values():
+    if field.write_only or field.source == "*":
+      continue
+
+    name = field.source.split(".")[0]
+    try:
+      model_field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+      continue
+    if not model_field.is_relation:
+      continue
+
+    path = prefix + name
+    related_model = model_field.related_model
+    to_many = model_field.many_to_many or model_field.one_to_many
+
+    if hasattr(field, "prefetch_lookups"):
+      prefetch_related += field.prefetch_lookups(path)
+
+    elif isinstance(field, serializers.ListSerializer):
+      child_select, child_prefetch = plan(field.child, related_model)
+      queryset = related_model._default_manager.select_related(*child_select).prefetch_related(*child_prefetch)
+      prefetch_related.append(Prefetch(path, queryset=queryset))
+
+    elif isinstance(field, relations.ManyRelatedField):
+      prefetch_related.append(path)
+
+    elif to_many:
+      # any other field reading through a to-many relation
+      prefetch_related.append(path)
+
+    elif isinstance(field, serializers.BaseSerializer):
+      select_related.append(path)
+      nested_select, nested_prefetch = plan(field, related_model, prefix=path + "__")
+      select_related += nested_select
+      prefetch_related += nested_prefetch
+
+    elif "." in field.source or _needs_related_object(field):
+      select_related.append(path)
+
+  return select_related, prefetch_related
+
+
+def optimize_queryset(queryset, serializer_class):
+  select_related, prefetch_related = plan(serializer_class(), queryset.model)
+  if select_related:
+    queryset = queryset.select_related(*select_related)
+  if prefetch_related:
+    queryset = queryset.prefetch_related(*prefetch_related)
+  return queryset
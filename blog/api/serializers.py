@@ -1,6 +1,12 @@
-from rest_framework import serializers
+from rest_framework import relations, serializers
 from blog.models import Post, Tag, Comment
 from blango_auth.models import User
+from blango_auth.resolver import resolve_email
+from blog.tag_resolver import resolve_tags
+from blog.api.bulk import BulkCommentListSerializer, BulkPostListSerializer, create_comments, in_bulk
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from django.core.files.storage import default_storage
 from versatileimagefield.serializers import VersatileImageFieldSerializer
 # To update the foreign fields for a serializer we use serializer.relatedField which have two functions: 
 # to_representation and to_internal_value. to_representation is used to modify the GET body for your API 
@@ -8,34 +14,92 @@ from versatileimagefield.serializers import VersatileImageFieldSerializer
 # help you in checking if the request for updating relatedField is present in the other table or not and things like that.
 
 
+class TagListField(serializers.ManyRelatedField):
+  # the whole list is resolved in one go rather than one get_or_create per tag
+  def to_internal_value(self, data):
+    values = super(TagListField, self).to_internal_value(data)
+    if in_bulk(self):
+      # BulkPostListSerializer resolves the tags of every post at once
+      return values
+    tags = resolve_tags(values)
+    return [tags[value] for value in dict.fromkeys(values)]
+
+
 class TagField(serializers.SlugRelatedField):
+  @classmethod
+  def many_init(cls, *args, **kwargs):
+    list_kwargs = {"child_relation": cls(*args, **kwargs)}
+    for key in kwargs:
+      if key in relations.MANY_RELATION_KWARGS:
+        list_kwargs[key] = kwargs[key]
+    return TagListField(**list_kwargs)
+
+  # only validates and lowercases the value, TagListField looks the tags up
   def to_internal_value(self, data):
-    try:
-      return self.get_queryset().get_or_create(value=data.lower())[0]
-    except(TypeError, ValueError):
-      self.fail(f"Tag value {data} is invalid")
+    if not isinstance(data, str) or not data.strip():
+      self.fail("invalid")
+    return data.lower()
+
+
+class AuthorField(serializers.HyperlinkedRelatedField):
+  # the email in the URL is resolved through the per-process cache, so the
+  # author is read by primary key
+  def get_object(self, view_name, view_args, view_kwargs):
+    pk = resolve_email(view_kwargs[self.lookup_url_kwarg])
+    if pk is None:
+      raise ObjectDoesNotExist
+    if in_bulk(self):
+      # only the author_id of the new posts is needed
+      return self.get_queryset().model(pk=pk)
+    return self.get_queryset().get(pk=pk)
+
+
+class ResponsiveImageField(serializers.Field):
+  """
+  The srcset of every format in a hero image rendition manifest (see
+  blog.renditions), e.g. {"width": 1920, "height": 1280,
+  "avif": "https://.../hero-320w-3f2a9c1d5e7b.avif 320w, ...", ...}
+  """
+  def __init__(self, **kwargs):
+    kwargs["read_only"] = True
+    super(ResponsiveImageField, self).__init__(**kwargs)
+
+  def to_representation(self, manifest):
+    if not manifest:
+      return None
+    request = self.context.get("request")
+    representation = {"width": manifest["width"], "height": manifest["height"]}
+    for format_name, variants in manifest["sources"].items():
+      representation[format_name] = ", ".join(
+        f"{self.absolute_url(default_storage.url(path), request)} {width}w" for width, path in variants
+      )
+    return representation
+
+  def absolute_url(self, url, request):
+    return request.build_absolute_uri(url) if request else url
 
 
 class PostSerializer(serializers.ModelSerializer):
   tags =TagField(
         slug_field="value", many=True, queryset=Tag.objects.all()
     )
-  author = serializers.HyperlinkedRelatedField(
+  author = AuthorField(
         queryset=User.objects.all(), view_name="api_user_detail", lookup_field="email"
     )
+  # the sizes of VERSATILEIMAGEFIELD_RENDITION_KEY_SETS["hero_image"], which
+  # blog.renditions generates ahead of time
   hero_image = VersatileImageFieldSerializer(
-        sizes=[
-            ("full_size", "url"),
-            ("thumbnail", "thumbnail__100x100"),
-        ],
+        sizes="hero_image",
         read_only=True,
     )
+  hero_image_srcset = ResponsiveImageField(source="hero_image_renditions")
   
   class Meta:
     model = Post
     # fields = "__all__"
-    exclude=['ppoi']
+    exclude=['ppoi', 'hero_image_renditions']
     readonly = ["modified_at", "created_at"]
+    list_serializer_class = BulkPostListSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -52,18 +116,32 @@ class CommentSerializer(serializers.ModelSerializer):
     model = Comment
     fields = ["id", "creator", "content", "modified_at", "created_at"]
     read_only = ["modified_at", "created_at"]
+    list_serializer_class = BulkCommentListSerializer
+
+
+# the number of comments embedded in a post, the rest are paged through
+# /api/v1/posts/<id>/comments/
+COMMENT_PREVIEW_SIZE = 5
+
+
+class CommentPreviewListSerializer(serializers.ListSerializer):
+  """
+  Shows the first COMMENT_PREVIEW_SIZE comments of a post, oldest first.
+  Writes take every comment given, see PostDetailSerializer.update.
+  """
+  def prefetch_lookups(self, path):
+    # prefetching would load the whole thread, the preview is loaded below
+    return []
+
+  def to_representation(self, data):
+    if isinstance(data, models.Manager):
+      data = data.select_related("creator")[:COMMENT_PREVIEW_SIZE]
+    return super(CommentPreviewListSerializer, self).to_representation(data)
 
 
 class PostDetailSerializer(PostSerializer):
-  comments = CommentSerializer(many=True)
-  hero_image = VersatileImageFieldSerializer(
-    sizes =[
-      ('full_size', 'url'),
-      ('thumbnail', 'thumbnail__100x100'),
-      ('square_crop', 'crop__200x200'),
-    ],
-    read_only=True,
-  )
+  comments = CommentPreviewListSerializer(child=CommentSerializer())
+  comments_url = serializers.HyperlinkedIdentityField(view_name="post-comments")
 
   def update(self, instance, validated_data):
     comments = validated_data.pop("comments")
@@ -71,15 +149,9 @@ class PostDetailSerializer(PostSerializer):
     #post instance to be saved besides comments(as they have been popped/removed)
     instance = super(PostDetailSerializer, self).update(instance, validated_data)
 
-    for comment_data in comments:
-      if comment_data.get("id"):
-        continue
-      
-      #for new comments
-      comment = Comment(**comment_data)
-      comment.creator = self.context["request"].user    # request shall be available in self.context for the present instance
-      comment.content_object = instance
-      comment.save()
+    # comments with an id exist already, the new ones are inserted at once
+    # (request shall be available in self.context for the present instance)
+    create_comments(instance, self.context["request"].user, [c for c in comments if not c.get("id")])
 
     return instance
 
@@ -3,6 +3,7 @@ from rest_framework.urlpatterns import format_suffix_patterns
 
 # from .views import PostList, PostDetail
 from blog.api.views import UserDetail, TagViewSet, PostViewSet
+from blog.api import async_views
 import rest_framework.urls
 
 #for auth token
@@ -76,5 +77,14 @@ router.register("posts", PostViewSet)
 
 urlpatterns += [
     path("", include(router.urls)),
-    path("posts/by-time/<str:period_name>/", PostViewSet.as_view({"get": "list"}), name="posts-by-time",),
+    path("posts/by-time/<str:period_name>/", PostViewSet.as_view({"get": "by_time"}), name="posts-by-time",),
+]
+
+#async variants of the read paths for ASGI, see blog.api.async_views
+urlpatterns += [
+    path("async/posts/", async_views.post_list, name="async-post-list"),
+    path("async/posts/<int:pk>/", async_views.post_detail, name="async-post-detail"),
+    path("async/posts/by-time/<str:period_name>/", async_views.posts_by_time, name="async-posts-by-time"),
+    path("async/tags/", async_views.tag_list, name="async-tag-list"),
+    path("async/tags/<int:pk>/posts/", async_views.tag_posts, name="async-tag-posts"),
 ]
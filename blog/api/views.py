@@ -6,9 +6,10 @@
 
 from rest_framework import generics
 
-from blog.api.serializers import PostSerializer, UserSerializer, PostDetailSerializer, TagSerializer
+from blog.api.serializers import CommentSerializer, PostSerializer, UserSerializer, PostDetailSerializer, TagSerializer
 from blog.models import Post, Tag
 from blango_auth.models import User
+from blango_auth.resolver import forget_email, resolve_email
 
 
 #implementation DRF view bases permissions
@@ -31,14 +32,45 @@ from django.views.decorators.vary import vary_on_headers, vary_on_cookie
 from rest_framework.exceptions import PermissionDenied 
 
 from django.db.models import Q
-from django.utils import timezone
-
-from datetime import timedelta
 from django.http import Http404
 
 #filtering by django-filter.rest_framework
 from .filters import PostFilterSet
 
+#ETag / Last-Modified validators
+from .conditional import ConditionalGetMixin
+
+#select_related/prefetch_related planned from the serializer fields
+from .prefetch import optimize_queryset
+
+#streaming export
+from .export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, export_response
+
+#page numbers or, with ?pagination=cursor, keyset cursors
+from .pagination import CommentCursorPagination, SelectablePagination
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import ValidationError
+
+#bulk creation, see blog.api.bulk
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+
+#versioned caching, invalidated by the signal handlers in blog.signals
+from blog.caching import cached_response, get_versions, seconds_until_next_publish
+
+#posts-by-time windows read from day buckets, cached per visibility class
+from blog import time_buckets
+from .conditional import conditional
+from .visibility import visibility_class, visible_drafts
+
+# cached responses are invalidated when their data changes, so the TTLs only
+# bound how long unused entries stay around
+CACHE_TTL = 60 * 60 * 6
+
+# posts-by-time windows move with the clock, not with writes
+POSTS_BY_TIME_TTL = 60
+
 #generic implementation using APIView 
 
 # class PostList(generics.ListCreateAPIView):
@@ -62,24 +94,93 @@ from .filters import PostFilterSet
 
 
 
+# orderings that follow the comment counters (see blog.counters). Comments
+# only bump the "discussed" scope of these and the "post:<pk>" of their post,
+# so other lists show the counts as of when they were cached
+DISCUSSED_ORDERINGS = {"comment_count", "last_activity_at"}
+
+
+def discussed_scopes(request):
+  ordering = request.GET.get("ordering", "")
+  return ["discussed"] if {f.strip().lstrip("-") for f in ordering.split(",")} & DISCUSSED_ORDERINGS else []
+
+
+def post_list_scopes(request, *args, **kwargs):
+  if kwargs.get("period_name"):
+    return ["posts-by-time", "tags", "users"] + discussed_scopes(request)
+  return ["posts", "tags", "users"] + discussed_scopes(request)
+
+
+def post_list_timeout(request, *args, **kwargs):
+  timeout = POSTS_BY_TIME_TTL if kwargs.get("period_name") else CACHE_TTL
+  return seconds_until_next_publish(timeout)
+
+
+def post_detail_scopes(request, *args, **kwargs):
+  return [f"post:{kwargs['pk']}", "tags", "users"]
+
+
+def post_comments_scopes(request, *args, **kwargs):
+  return [f"post:{kwargs['pk']}", "users"]
+
+
+def my_posts_scopes(request, *args, **kwargs):
+  return [f"author:{request.user.pk}", "tags", "users"] + discussed_scopes(request)
+
+
+def user_detail_scopes(request, *args, **kwargs):
+  # by pk, so every spelling of the email and a changed email are invalidated
+  return [f"user:{resolve_email(kwargs['email'])}"]
+
+
+def tag_detail_scopes(request, *args, **kwargs):
+  return [f"tag:{kwargs['pk']}"]
+
+
+def tag_posts_scopes(request, *args, **kwargs):
+  return [f"tag:{kwargs['pk']}", "tags", "users"] + discussed_scopes(request)
+
+
 # implementating viewset based Post views
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
   queryset = Post.objects.all()
   permission_classes = [AuthorModifyOrReadOnly | IsAdminUserForObject]
   filterset_class = PostFilterSet 
+  pagination_class = SelectablePagination
+
+  # validators for conditional GET, see blog.api.conditional
+  modified_field = "modified_at"
+  fingerprint_fields = ("comment_count", "last_activity_at")
+  fingerprint_scopes = ("tags", "users")
 
   # By default, all readable serialized fields are available for ordering
-  ordering_fields = ["published_at", "author", "title", "slug"]
+  # (?ordering=-comment_count for the most discussed posts)
+  ordering_fields = ["published_at", "author", "title", "slug", "comment_count", "last_activity_at"]
 
   filterset_fields = ["author", "tags"]
 
   def get_serializer_class(self):
-    if self.action in ("list", "create"):
+    if self.action in ("list", "create", "mine", "export", "bulk", "by_time"):
       return PostSerializer
+    if self.action in ("comments", "comments_bulk"):
+      return CommentSerializer
     return PostDetailSerializer
 
+  def get_object_fingerprint(self, queryset):
+    parts, last_modified = super(PostViewSet, self).get_object_fingerprint(queryset)
+    if parts is None:
+      return parts, last_modified
+
+    # the detail representation embeds the first comments and the count;
+    # every comment write bumps the version of the post's scope
+    parts += get_versions([f"post:{parts[0]}"])
+    last_activity_at = parts[2]
+    if last_activity_at and last_activity_at > last_modified:
+      last_modified = last_activity_at
+    return parts, last_modified
+
   
-  @method_decorator(cache_page(300))
+  @method_decorator(cached_response(CACHE_TTL, scopes=my_posts_scopes, vary_on=("Authorization", "Cookie")))
   @method_decorator(vary_on_headers("Authorization"))
   @method_decorator(vary_on_cookie)
   #method_decorator(vary_on_headers("Authorization", "Cookie"))  #alternatively
@@ -101,53 +202,182 @@ class PostViewSet(viewsets.ModelViewSet):
   
 
 
+  # the comments on a visible post, oldest first, with cursor paging
+  @method_decorator(cached_response(CACHE_TTL, scopes=post_comments_scopes, variant=visibility_class))
+  @method_decorator(vary_on_headers("Authorization", "Cookie"))
+  @action(methods=["get"], detail=True, name="Comments on the post", pagination_class=CommentCursorPagination)
+  def comments(self, request, pk=None):
+    post = get_object_or_404(self.get_queryset(), pk=pk)
+    page = self.paginate_queryset(post.comments.select_related("creator"))
+    serializer = CommentSerializer(page, many=True, context=self.get_serializer_context())
+    return self.get_paginated_response(serializer.data)
+
+  # creates every post of a JSON array in one transaction, e.g.
+  # POST /api/v1/posts/bulk/ [{"title": ..., "slug": ..., "tags": [...]}, ...]
+  @action(methods=["post"], detail=False, name="Create posts in bulk")
+  def bulk(self, request):
+    serializer = PostSerializer(
+      data=request.data, many=True, max_length=settings.BLOG_BULK_MAX_ITEMS, context=self.get_serializer_context()
+    )
+    serializer.is_valid(raise_exception=True)
+    posts = serializer.save()
+    # serializing thousands of posts back would cost more than creating them
+    return Response({"count": len(posts), "ids": [post.pk for post in posts]}, status=status.HTTP_201_CREATED)
+
+  # adds every comment of a JSON array to a visible post, e.g.
+  # POST /api/v1/posts/1/comments/bulk/ [{"content": ...}, ...]
+  @action(methods=["post"], detail=True, url_path="comments/bulk", name="Add comments in bulk")
+  def comments_bulk(self, request, pk=None):
+    post = get_object_or_404(self.get_queryset(), pk=pk)
+    serializer = CommentSerializer(
+      data=request.data, many=True, max_length=settings.BLOG_BULK_MAX_ITEMS,
+      context={**self.get_serializer_context(), "post": post},
+    )
+    serializer.is_valid(raise_exception=True)
+    comments = serializer.save()
+    return Response({"count": len(comments)}, status=status.HTTP_201_CREATED)
+
+
+  # streams every visible post matching the PostFilterSet filters, e.g.
+  # /api/v1/posts/export/?author=1&export_format=json
+  @action(methods=["get"], detail=False, name="Export posts")
+  def export(self, request):
+    export_format = request.query_params.get("export_format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+      raise ValidationError({"export_format": f"Should be one of {', '.join(EXPORT_FORMATS)}"})
+
+    try:
+      chunk_size = min(int(request.query_params.get("chunk_size", DEFAULT_CHUNK_SIZE)), 2000)
+    except ValueError:
+      raise ValidationError({"chunk_size": "Should be an integer"})
+
+    # only the filters apply, the export is always in primary key order
+    queryset = DjangoFilterBackend().filter_queryset(request, self.get_queryset(), self)
+    return export_response(
+      request, queryset, PostSerializer, self.get_serializer_context(), export_format, max(chunk_size, 1)
+    )
+
+
+  def get_fingerprint_scopes(self):
+    return super(PostViewSet, self).get_fingerprint_scopes() + discussed_scopes(self.request)
+
   # Since the list of Posts now changes with each user, we need to make sure we add the vary_on_headers() decorator to it, with Authorization and Cookie as arguments
   def get_queryset(self):
+    # load the relations the serializer of this action reads in bulk, so a
+    # page costs the same number of queries whatever its size
+    base_queryset = optimize_queryset(self.queryset, self.get_serializer_class())
+
     if self.request.user.is_anonymous:
-      queryset = self.queryset.filter(published_at__lte=timezone.now())
+      queryset = base_queryset.filter(is_published=True)
     
     elif self.request.user.is_staff:
-      queryset = self.queryset
+      queryset = base_queryset
     
     else:
-      queryset = self.queryset.filter(Q(published_at__lte=timezone.now()) | Q(author = self.request.user))
+      queryset = base_queryset.filter(Q(is_published=True) | Q(author = self.request.user))
 
     time_period_name = self.kwargs.get("period_name")
 
     if not time_period_name:
       return queryset
-    
-    if time_period_name == "new":
-      return queryset.filter(published_at__gte= timezone.now()- timedelta(hours=1))
-    elif time_period_name == "today":
-      return queryset.filter(published_at__date=timezone.now().date(),)
-    elif time_period_name == "week":
-      return queryset.filter(published_at__gte=timezone.now() - timedelta(days=7))
-    else:
-      raise Http404(f"Time period {time_period_name} is not valid, should be " f"'new', 'today' or 'week'")
-  
+
+    # range filters the published_at indexes can serve; by_time() reads the
+    # posts in the window from blog.time_buckets when it can
+    start, end = time_buckets.window(time_period_name)
+    queryset = queryset.filter(published_at__gte=start).order_by("-published_at", "-pk")
+    return queryset if end is None else queryset.filter(published_at__lt=end)
+
+  # the posts of the last hour, today or the last 7 days, newest first. The
+  # posts are looked up in the day buckets of blog.time_buckets and only the
+  # page is read from the database; filtered, ordered and cursor paged
+  # requests go through the queryset. Cached per visibility class, so every
+  # user seeing the same posts shares the responses.
+  @method_decorator(cached_response(post_list_timeout, scopes=post_list_scopes, variant=visibility_class))
+  @method_decorator(vary_on_headers("Authorization", "Cookie"))
+  def by_time(self, request, period_name=None):
+    if set(request.query_params) - {"page", "format"}:
+      return super(PostViewSet, self).list(request, period_name=period_name)
+
+    ids = time_buckets.post_ids(period_name, visible_drafts(request.user))
+    parts = ids + get_versions(self.get_fingerprint_scopes())
+    return conditional(request, parts, None, lambda: self.list_posts(ids))
+
+  def list_posts(self, ids):
+    """The paginated response for the posts with primary keys `ids`, in that order."""
+    page = self.paginate_queryset(ids)
+    posts = {post.pk: post for post in self.get_queryset().filter(pk__in=page)}
+    serializer = self.get_serializer([posts[pk] for pk in page if pk in posts], many=True)
+    return self.get_paginated_response(serializer.data)
+
   # adding caching to methods implemented/available with viewset by passthrough same methods using super class
-  @method_decorator(cache_page(120))
+  # Cached per visibility class rather than per Authorization header or
+  # session (see blog.api.visibility): anonymous users and users without
+  # drafts share the published list, the staff share theirs and only an
+  # author with drafts gets responses of their own.
+  @method_decorator(cached_response(post_list_timeout, scopes=post_list_scopes, variant=visibility_class))
   @method_decorator(vary_on_headers("Authorization", "Cookie"))
   def list(self, *args, **kwargs):
     return super(PostViewSet, self).list(*args, **kwargs)
 
+  # unpublished posts are only visible to their authors and staff
+  @method_decorator(cached_response(CACHE_TTL, scopes=post_detail_scopes, variant=visibility_class))
+  @method_decorator(vary_on_headers("Authorization", "Cookie"))
+  def retrieve(self, *args, **kwargs):
+    return super(PostViewSet, self).retrieve(*args, **kwargs)
+
 
-class UserDetail(generics.RetrieveAPIView):
+class UserDetail(ConditionalGetMixin, generics.RetrieveAPIView):
     lookup_field = "email"
     queryset = User.objects.all()
     serializer_class = UserSerializer
-
-    @method_decorator(cache_page(300))
+    fingerprint_fields = ("first_name", "last_name", "email")
+
+    def get_user(self):
+      """
+      The user with the email in the URL, read by primary key after resolving
+      the email through the per-process cache. Shared by the fingerprint and
+      the response, so a request reads the user once.
+      """
+      if not hasattr(self, "_user"):
+        email = self.kwargs["email"].lower()
+        self._user = None
+        for retry in range(2):
+          pk = resolve_email(email)
+          if pk is None:
+            break
+          self._user = self.get_queryset().filter(pk=pk).first()
+          if self._user is not None and self._user.email.lower() == email:
+            break
+          # the pk was cached before another process changed the email
+          self._user = None
+          forget_email(email)
+      return self._user
+
+    def get_object(self):
+      user = self.get_user()
+      if user is None:
+        raise Http404("No user with this email")
+      self.check_object_permissions(self.request, user)
+      return user
+
+    def get_object_fingerprint(self, queryset):
+      user = self.get_user()
+      if user is None:
+        return None, None
+      return [user.pk] + [getattr(user, field) for field in self.fingerprint_fields], None
+
+    @method_decorator(cached_response(CACHE_TTL, scopes=user_detail_scopes))
     def get(self, *args, **kwargs):
       return super(UserDetail, self).get(*args, **kwargs)
 
 
 #Tag viewset
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
   queryset = Tag.objects.all()
   serializer_class = TagSerializer
+  fingerprint_fields = ("value",)
+  fingerprint_scopes = ("tags",)
 
 # methods: A list of HTTP methods that the action will respond to. Defaults to ["get"].
 # detail: Determines if the action should apply to detail requests (if True) or list (if False). This argument is required.
@@ -155,27 +385,29 @@ class TagViewSet(viewsets.ModelViewSet):
 # url_name: Manually specify the name of the URL pattern. Defaults to the method name with underscores replaced by dashes. The full name of our method’s URL is tag-posts.
 # name: A name to display in the Extra Actions menu in the DRF GUI. Defaults to the name of the method.
   
-  @action(methods=["get"], detail=True, name="Posts with the tag")
+  @method_decorator(cached_response(CACHE_TTL, scopes=tag_posts_scopes))
+  @action(methods=["get"], detail=True, name="Posts with the tag", pagination_class=SelectablePagination)
   def posts(self, request, pk=None):
     # We have access to the pk from the URL, so we could fetch the Tag object from the database ourselves. However, the ModelViewSet class provides a helper method that will do that for us – get_object() – so we use that instead.
     tag = self.get_object()
+    posts = optimize_queryset(tag.posts.all(), PostSerializer)
     
     # applying pagination to mine method - user defined viewset method
-    page = self.paginate_queryset(tag.posts)  # adds paging paraphernalia to the existing queryset
+    page = self.paginate_queryset(posts)  # adds paging paraphernalia to the existing queryset
     if page is not None:
       post_serializer = PostSerializer(page, many=True, context={"request":request})
       return self.get_paginated_response(post_serializer.data)
 
     # Since PostSerializer uses a HyperlinkRelatedField it needs access to the current request so we need to pass that in a context dictionary. 
-    post_serializer = PostSerializer(tag.posts, many=True, context={"request":request})
+    post_serializer = PostSerializer(posts, many=True, context={"request":request})
     #--------------------how tag.posts is retrieved: from the name field set in the models-------------------------------
     return Response(post_serializer.data)
 
 
-  @method_decorator(cache_page(300))
+  @method_decorator(cached_response(CACHE_TTL, scopes=["tags"]))
   def list(self, *args, **kwargs):
     return super(TagViewSet, self).list(*args, **kwargs)
 
-  @method_decorator(cache_page(300))
+  @method_decorator(cached_response(CACHE_TTL, scopes=tag_detail_scopes))
   def retrieve(self, *args, **kwargs):
     return super(TagViewSet, self).retrieve(*args, **kwargs)
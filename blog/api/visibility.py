@@ -0,0 +1,74 @@
+"""
+Visibility classes of the post endpoints.
+
+Which posts a request can see depends on who makes it, but most users see
+the same thing: anonymous users and users without drafts see the published
+posts, the staff see every post and an author with drafts sees the published
+posts and their own drafts. Responses are cached per class (see the
+`variant` of blog.caching.cached_response) rather than per Authorization
+header or session cookie, so every request of a class shares them. The
+browsable API is the exception: its pages show who is logged in.
+"""
+from rest_framework.exceptions import APIException, NotAcceptable
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from blog import publishing
+
+PUBLIC = "public"
+STAFF = "staff"
+
+# the class of credentials DRF rejects; their 401 is never cached, so nothing
+# is ever served under it
+INVALID = "invalid"
+
+
+def api_request(request):
+  if isinstance(request, Request):
+    return request
+  # the async views look for cached responses before DRF sees the request
+  return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+
+
+def request_user(request):
+  """The user DRF authenticates `request` as, None for bad credentials."""
+  try:
+    return api_request(request).user
+  except APIException:
+    return None
+
+
+def renders_browsable_api(request):
+  # DRF has negotiated the renderer by the time the view runs
+  renderer = getattr(request, "accepted_renderer", None)
+  if renderer is None:
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+      renderer, media_type = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS().select_renderer(
+        api_request(request), renderers
+      )
+    except NotAcceptable:
+      return False
+  return renderer.format == "api"
+
+
+def visible_drafts(user):
+  """The (pk, author_id, published_at) of the drafts `user` can see, see blog.publishing.drafts()."""
+  if user is None or user.is_anonymous:
+    return []
+  if user.is_staff:
+    return publishing.drafts()
+  return publishing.author_drafts(user.pk)
+
+
+def visibility_class(request, *args, **kwargs):
+  user = request_user(request)
+  if user is None:
+    return INVALID
+  if user.is_authenticated and renders_browsable_api(request):
+    return f"user:{user.pk}"
+  if user.is_staff:
+    return STAFF
+  if visible_drafts(user):
+    return f"author:{user.pk}"
+  return PUBLIC
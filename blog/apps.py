@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # connects the cache invalidation signal handlers
+        import blog.signals  # noqa: F401
+        import blog.checks  # noqa: F401
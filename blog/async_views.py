@@ -0,0 +1,20 @@
+"""
+Async variants of the read-heavy pages, for ASGI deployments. They're mounted
+under /async/ next to the sync views in blog.views, which they share cached
+responses with; see blog.caching.async_cached_view.
+"""
+from asgiref.sync import sync_to_async
+
+from blog import views
+from blog.caching import async_cached_view
+
+index = async_cached_view(
+  views.index, scopes=["posts", "users"], vary_on=("Cookie",), path=lambda request: "/"
+)
+
+
+async def post_detail(request, slug):
+  # only the parts shared by every visitor are cached (the page carries the
+  # comment form) and finding them takes the post from the database; this
+  # only keeps the view off the event loop
+  return await sync_to_async(views.post_detail)(request, slug)
@@ -0,0 +1,240 @@
+"""
+Query-count, latency and memory benchmarks for the blog routes.
+
+seed() fills the database with a synthetic archive and run_benchmarks()
+requests every route a number of times, recording the number of queries, the
+p50/p99 latency and the peak Python memory of a request. Each route has a
+query budget; a result over budget is reported as failed so a regression in
+the number of queries (an N+1 sneaking back in) is caught regardless of how
+fast the machine running the benchmark is.
+
+Run it with the `benchmark` management command, which uses a throwaway test
+database.
+"""
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog import counters, search
+from blog.models import Comment, Post, Tag, count_words, reading_time_for
+
+BATCH_SIZE = 1000
+TAG_COUNT = 200
+TAGS_PER_POST = 3
+POSTS_PER_AUTHOR = 20
+
+# every n-th post is scheduled in the future, i.e. a draft for everyone but
+# its author
+DRAFT_EVERY = 50
+
+CONTENT = " ".join(["lorem ipsum dolor sit amet"] * 200)
+
+# (name, path) of every data route in blog.api.urls and blog.urls. Paths
+# are formatted with the sample objects picked by sample_objects(). Left out:
+# the POST only bulk routes, ip/ and the JWT views, which don't read posts.
+ROUTES = [
+  ("api-post-list", "/api/v1/posts/"),
+  ("api-post-list-ordered", "/api/v1/posts/?ordering=-published_at"),
+  ("api-post-list-cursor", "/api/v1/posts/?pagination=cursor&ordering=title"),
+  ("api-post-search", "/api/v1/posts/?search=benchmark+post+1"),
+  ("api-post-list-discussed", "/api/v1/posts/?ordering=-comment_count"),
+  ("api-post-detail", "/api/v1/posts/{post.pk}/"),
+  ("api-post-comments", "/api/v1/posts/{post.pk}/comments/"),
+  # one author's posts, so the route costs the same at every archive size
+  ("api-post-export", "/api/v1/posts/export/?author={user.pk}"),
+  ("api-posts-mine", "/api/v1/posts/mine/"),
+  ("api-posts-by-time", "/api/v1/posts/by-time/week/"),
+  ("api-tag-list", "/api/v1/tags/"),
+  ("api-tag-detail", "/api/v1/tags/{tag.pk}/"),
+  ("api-tag-posts", "/api/v1/tags/{tag.pk}/posts/"),
+  ("api-user-detail", "/api/v1/users/{user.email}"),
+  ("html-index", "/"),
+  ("html-post-detail", "/post/{post.slug}/"),
+  ("html-post-comments", "/post/{post.slug}/comments/"),
+  # blog.async_views and blog.api.async_views, run through async_to_sync by
+  # the test client
+  ("async-post-list", "/api/v1/async/posts/"),
+  ("async-post-detail", "/api/v1/async/posts/{post.pk}/"),
+  ("async-posts-by-time", "/api/v1/async/posts/by-time/week/"),
+  ("async-tag-list", "/api/v1/async/tags/"),
+  ("async-tag-posts", "/api/v1/async/tags/{tag.pk}/posts/"),
+  ("async-html-index", "/async/"),
+  ("async-html-post-detail", "/async/post/{post.slug}/"),
+]
+
+# maximum number of queries per request, including session, auth and
+# throttling lookups
+QUERY_BUDGETS = {
+  "api-post-list": 8,
+  "api-post-list-ordered": 8,
+  # no COUNT(*)
+  "api-post-list-cursor": 7,
+  "api-post-search": 8,
+  # sorted by the stored counter, no GROUP BY
+  "api-post-list-discussed": 8,
+  "api-post-detail": 8,
+  # cursor paged, no COUNT(*)
+  "api-post-comments": 6,
+  # the primary keys plus the planned queries of a single chunk
+  "api-post-export": 8,
+  "api-posts-mine": 6,
+  "api-posts-by-time": 8,
+  "api-tag-list": 6,
+  "api-tag-detail": 5,
+  "api-tag-posts": 7,
+  "api-user-detail": 5,
+  "html-index": 5,
+  "html-post-detail": 10,
+  "html-post-comments": 4,
+  # the same queries as their sync counterparts
+  "async-post-list": 8,
+  "async-post-detail": 8,
+  "async-posts-by-time": 8,
+  "async-tag-list": 6,
+  "async-tag-posts": 7,
+  "async-html-index": 5,
+  "async-html-post-detail": 10,
+}
+
+
+def seed(size):
+  """Grows the archive to `size` posts, with their authors, tags and comments."""
+  User = get_user_model()
+  now = timezone.now()
+
+  tags = list(Tag.objects.all()[:TAG_COUNT])
+  if len(tags) < TAG_COUNT:
+    Tag.objects.bulk_create(
+      [Tag(value=f"bench-tag-{i}") for i in range(len(tags), TAG_COUNT)], ignore_conflicts=True
+    )
+    tags = list(Tag.objects.all()[:TAG_COUNT])
+
+  author_count = max(1, size // POSTS_PER_AUTHOR)
+  existing_authors = User.objects.filter(email__startswith="bench-author-").count()
+  User.objects.bulk_create(
+    [User(email=f"bench-author-{i}@example.com", email_domain="example.com") for i in range(existing_authors, author_count)],
+    batch_size=BATCH_SIZE,
+  )
+  authors = list(User.objects.filter(email__startswith="bench-author-").order_by("pk").values_list("pk", flat=True))
+
+  post_type = ContentType.objects.get_for_model(Post)
+  word_count = count_words(CONTENT)
+  start = Post.objects.count()
+
+  for batch_start in range(start, size, BATCH_SIZE):
+    batch = range(batch_start, min(batch_start + BATCH_SIZE, size))
+    Post.objects.bulk_create([
+      Post(
+        author_id=authors[i % len(authors)],
+        published_at=now + timedelta(days=1) if i % DRAFT_EVERY == 0 else now - timedelta(minutes=i),
+        is_published=i % DRAFT_EVERY != 0,
+        title=f"Benchmark post {i}",
+        slug=f"bench-post-{i}",
+        summary=f"Summary of benchmark post {i}",
+        content=CONTENT,
+        word_count=word_count,
+        reading_time=reading_time_for(word_count),
+      )
+      for i in batch
+    ])
+    # not every backend returns the new primary keys from a bulk insert
+    pks = dict(Post.objects.filter(slug__in=[f"bench-post-{i}" for i in batch]).values_list("slug", "pk"))
+    post_pks = [(i, pks[f"bench-post-{i}"]) for i in batch]
+
+    Post.tags.through.objects.bulk_create([
+      Post.tags.through(post_id=pk, tag_id=tags[(i + j) % len(tags)].pk)
+      for i, pk in post_pks
+      for j in range(TAGS_PER_POST)
+    ])
+
+    Comment.objects.bulk_create([
+      Comment(creator_id=authors[(i + j) % len(authors)], content=f"Comment {j}", content_type=post_type, object_id=pk)
+      for i, pk in post_pks
+      for j in range(i % 5)
+    ])
+
+  # bulk_create doesn't send the signals that index new posts and count
+  # their comments
+  search.rebuild_index()
+  counters.reconcile()
+
+
+def sample_objects():
+  """The objects the route paths are formatted with: a busy post, tag and author."""
+  post = Post.objects.filter(is_published=True).order_by("-published_at").first()
+  return {
+    "post": post,
+    "tag": post.tags.first(),
+    "user": post.author,
+  }
+
+
+def percentile(values, percent):
+  values = sorted(values)
+  index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+  return values[index]
+
+
+def measure(client, path, iterations):
+  timings = []
+  queries = 0
+
+  for i in range(iterations):
+    # measure the uncached path; this also resets throttling history
+    cache.clear()
+    with CaptureQueriesContext(connection) as ctx:
+      start = time.perf_counter()
+      response = client.get(path)
+      # a streamed response runs its queries while it is sent
+      if response.streaming:
+        b"".join(response.streaming_content)
+      timings.append((time.perf_counter() - start) * 1000)
+    if response.status_code != 200:
+      raise RuntimeError(f"GET {path} returned {response.status_code}")
+    queries = max(queries, len(ctx.captured_queries))
+
+  # a response served from the cache
+  start = time.perf_counter()
+  client.get(path)
+  warm = (time.perf_counter() - start) * 1000
+
+  # tracemalloc slows everything down, so memory is measured on its own run
+  cache.clear()
+  tracemalloc.start()
+  client.get(path)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  return {
+    "queries": queries,
+    "p50_ms": round(statistics.median(timings), 3),
+    "p99_ms": round(percentile(timings, 99), 3),
+    "warm_ms": round(warm, 3),
+    "peak_kb": round(peak / 1024, 1),
+  }
+
+
+def run_benchmarks(size, iterations, routes=ROUTES, budgets=QUERY_BUDGETS):
+  """Returns one result dict per route for the archive currently seeded."""
+  objects = sample_objects()
+  client = Client()
+  client.force_login(objects["user"])
+
+  results = []
+  for name, path in routes:
+    path = path.format(**objects)
+    result = {"size": size, "route": name, "path": path}
+    result.update(measure(client, path, iterations))
+    result["budget"] = budgets.get(name)
+    result["ok"] = result["budget"] is None or result["queries"] <= result["budget"]
+    results.append(result)
+  return results
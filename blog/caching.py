@@ -0,0 +1,344 @@
+"""
+Versioned response caching.
+
+Instead of relying on short TTLs to hide stale data, every cached response is
+tied to one or more *scopes* ("posts", "author:3", "tag:7", ...). Each scope
+has a version number in the cache and the versions are part of the response
+cache key. The signal handlers in blog.signals bump the versions of the scopes
+touched by a write, which makes every response built from the old data
+unreachable at once, so responses can be cached for hours.
+
+Entries are also protected against cache stampedes. When an entry expires (or
+a bump makes a popular key cold) only the worker holding a short lease
+rebuilds it; the others keep serving the previous value or, for a cold key,
+wait briefly for the rebuilt one. Entries are also refreshed a little before
+they expire, with a probability that grows as expiry approaches and with how
+long the value took to compute ("XFetch", probabilistic early expiration).
+"""
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.urls import get_script_prefix
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_KEY_PREFIX = "blog:version:"
+RESPONSE_KEY_PREFIX = "blog:response:"
+FRAGMENT_KEY_PREFIX = "blog:fragment:"
+LEASE_KEY_PREFIX = "blog:lease:"
+
+# how long a rebuild may take before another worker is allowed to try
+LEASE_TIMEOUT = 30
+
+# how long a worker waits for somebody else's rebuild of a cold key
+LEASE_WAIT = 5
+LEASE_POLL_INTERVAL = 0.05
+
+# > 1 refreshes earlier, < 1 later
+EARLY_EXPIRY_BETA = 1.0
+
+# headers that change the rendered representation of every API response
+ALWAYS_VARY_ON = ("Accept",)
+
+
+def version_key(scope):
+  return f"{VERSION_KEY_PREFIX}{scope}"
+
+
+def _initial_version():
+  # a missing version (evicted, or a fresh cache) starts from the clock rather
+  # than from 1 so it can never collide with responses cached under an older
+  # counter that are still sitting in the cache
+  return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+  keys = [version_key(scope) for scope in scopes]
+  versions = cache.get_many(keys)
+
+  for key in keys:
+    if key not in versions:
+      cache.add(key, _initial_version(), None)
+      versions[key] = cache.get(key)
+
+  return [versions[key] for key in keys]
+
+
+def invalidate_now_and_on_commit(invalidate):
+  """
+  Calls `invalidate` now and, inside a transaction, once more on commit.
+
+  A request running between a write and its commit can still read the old
+  rows and cache them again, so the second call drops whatever it cached once
+  the write becomes visible.
+  """
+  invalidate()
+  if transaction.get_connection().in_atomic_block:
+    transaction.on_commit(invalidate)
+
+
+def _bump(scopes):
+  for scope in scopes:
+    key = version_key(scope)
+    try:
+      cache.incr(key)
+    except ValueError:
+      cache.set(key, _initial_version(), None)
+
+
+def bump(*scopes):
+  scopes = set(scopes)
+  invalidate_now_and_on_commit(lambda: _bump(scopes))
+
+
+def seconds_until_next_publish(default):
+  """
+  Posts with a future published_at become visible when blog.publishing gets
+  to them, which invalidates the lists showing them. Lists that hide
+  unpublished posts still don't outlive the next publication, in case it runs
+  late.
+  """
+  from blog.publishing import next_publish_at
+
+  now = timezone.now()
+  next_publish = next_publish_at()
+  if next_publish is None or next_publish <= now:
+    return default
+  return max(1, min(default, int((next_publish - now).total_seconds()) + 1))
+
+
+class Entry:
+  """A cached value with its logical expiry and how long it took to build."""
+
+  def __init__(self, value, timeout, delta):
+    self.value = value
+    self.expires_at = time.time() + timeout
+    self.delta = delta
+
+  def is_fresh(self, beta=EARLY_EXPIRY_BETA):
+    # -log(u) for u in (0, 1] is exponentially distributed, so the early
+    # refresh is rare while expiry is far away and likely right before it
+    return time.time() - self.delta * beta * math.log(1.0 - random.random()) < self.expires_at
+
+
+def store_entry(key, value, timeout, delta):
+  # stale entries are kept around for one more period so they can be served
+  # while the lease holder rebuilds them
+  cache.set(key, Entry(value, timeout, delta), timeout * 2)
+
+
+def acquire_lease(key):
+  return cache.add(LEASE_KEY_PREFIX + key, 1, LEASE_TIMEOUT)
+
+
+def release_lease(key):
+  cache.delete(LEASE_KEY_PREFIX + key)
+
+
+def wait_for_entry(key):
+  deadline = time.monotonic() + LEASE_WAIT
+  while time.monotonic() < deadline:
+    time.sleep(LEASE_POLL_INTERVAL)
+    entry = cache.get(key)
+    if entry is not None:
+      return entry
+  return None
+
+
+def get_or_compute(key, compute, timeout):
+  """
+  Single-flight read-through: returns the cached value of `key`, or the
+  result of `compute()` which is then cached for `timeout` seconds.
+  """
+  entry = cache.get(key)
+  if entry is not None and entry.is_fresh():
+    return entry.value
+
+  leased = acquire_lease(key)
+  if leased:
+    # a lease holder may have stored the value and released the lease since
+    # the read above
+    rebuilt = cache.get(key)
+    if rebuilt is not None and rebuilt.is_fresh():
+      release_lease(key)
+      return rebuilt.value
+  if not leased:
+    if entry is None:
+      entry = wait_for_entry(key)
+    if entry is not None:
+      return entry.value
+    # the lease holder is taking too long, compute without it
+
+  try:
+    start = time.monotonic()
+    value = compute()
+    store_entry(key, value, timeout, time.monotonic() - start)
+  finally:
+    if leased:
+      release_lease(key)
+  return value
+
+
+def response_cache_key(request, scopes, vary_on=(), variant=None):
+  # the responses carry absolute URLs, so the scheme and host are part of the
+  # key like in cache_page()
+  parts = [request.method, request.build_absolute_uri()]
+  parts += [request.META.get("HTTP_" + header.upper().replace("-", "_"), "") for header in ALWAYS_VARY_ON + tuple(vary_on)]
+  if variant is not None:
+    parts.append(f"variant:{variant}")
+  parts += [str(v) for v in get_versions(scopes)]
+  digest = hashlib.md5("\n".join(parts).encode("utf-8")).hexdigest()
+  return f"{RESPONSE_KEY_PREFIX}{digest}"
+
+
+def cached_entry_response(request, entry):
+  # the cached copy carries the validators it was built with
+  response = entry.value
+  return get_conditional_response(
+    request,
+    etag=response.get("ETag"),
+    last_modified=parse_http_date_safe(response.get("Last-Modified")),
+    response=response,
+  )
+
+
+def fresh_cached_response(request, scopes, vary_on, variant, *args, **kwargs):
+  """
+  The response cached_response() holds for the request if it's fresh,
+  otherwise None.
+  """
+  if callable(scopes):
+    scopes = scopes(request, *args, **kwargs)
+  if callable(variant):
+    variant = variant(request, *args, **kwargs)
+  entry = cache.get(response_cache_key(request, scopes, vary_on, variant))
+  if entry is None or not entry.is_fresh():
+    return None
+  return cached_entry_response(request, entry)
+
+
+def cached_response(timeout, scopes=(), vary_on=(), variant=None):
+  """
+  Caches successful GET responses of a view under the current versions of
+  `scopes`, with the stampede protection of get_or_compute().
+
+  `timeout` and `scopes` may be callables taking the view arguments
+  (request, *args, **kwargs). `vary_on` lists request headers that must be
+  part of the key, like vary_on_headers(). `variant` is a callable taking
+  the view arguments whose result is also part of the key, for responses
+  that differ by something coarser than a header, like the visibility
+  classes of blog.api.visibility.
+  """
+  def decorator(view_func):
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+      if request.method not in ("GET", "HEAD"):
+        return view_func(request, *args, **kwargs)
+
+      view_scopes = scopes(request, *args, **kwargs) if callable(scopes) else scopes
+      view_variant = variant(request, *args, **kwargs) if variant is not None else None
+      key = response_cache_key(request, view_scopes, vary_on, view_variant)
+
+      entry = cache.get(key)
+      if entry is None or not entry.is_fresh():
+        if acquire_lease(key):
+          # as in get_or_compute(), a rebuild may have finished since the read
+          # above
+          entry = cache.get(key)
+          if entry is None or not entry.is_fresh():
+            return build(key, True, request, *args, **kwargs)
+          release_lease(key)
+          return cached_entry_response(request, entry)
+        if entry is None:
+          entry = wait_for_entry(key)
+        if entry is None:
+          # the lease holder is taking too long, build without it
+          return build(key, False, request, *args, **kwargs)
+
+      return cached_entry_response(request, entry)
+
+    def build(key, leased, request, *args, **kwargs):
+      def release():
+        if leased:
+          release_lease(key)
+
+      start = time.monotonic()
+      try:
+        response = view_func(request, *args, **kwargs)
+      except Exception:
+        release()
+        raise
+
+      if response.status_code != 200 or response.streaming:
+        release()
+        return response
+
+      view_timeout = timeout(request, *args, **kwargs) if callable(timeout) else timeout
+
+      def store(response):
+        # keep only what goes over the wire, not the serializer data behind it
+        cached = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+          cached[header] = value
+        store_entry(key, cached, view_timeout, time.monotonic() - start)
+        release()
+
+      # DRF and template responses are rendered lazily, cache them once rendered
+      if hasattr(response, "render") and callable(response.render):
+        response.add_post_render_callback(store)
+      else:
+        store(response)
+      return response
+
+    return wrapped
+  return decorator
+
+
+def rewrite_path(request, new_path):
+  """Makes `request` look like a request for `new_path`, with the same query string."""
+  script_prefix = get_script_prefix()
+  path_info = "/" + new_path[len(script_prefix):] if new_path.startswith(script_prefix) else new_path
+  request.path = new_path
+  request.path_info = request.META["PATH_INFO"] = path_info
+
+
+def async_cached_view(view_func, scopes=(), vary_on=(), path=None, variant=None):
+  """
+  An async front for a view whose responses are cached by cached_response()
+  under the same `scopes`, `vary_on` and `variant`, for ASGI deployments.
+
+  `path` is a callable taking the view arguments which returns the path of
+  the sync view the async one is mounted next to. The request is rewritten
+  to that path before it is looked up or handed to the view, so both share
+  the cached responses, and the links in them (pagination, the browsable
+  API) point at the sync view whichever of the two built them.
+
+  Fresh cache hits are answered in one short hop to a thread, without going
+  through the view. Everything else, including misses and stale entries
+  (which get the usual stampede protection), is passed on to the view in a
+  thread. Django 3.2 has neither an async ORM nor an async cache API, so
+  work that needs the database can't stay on the event loop. Cache hits
+  served here skip DRF's authentication and throttling; the key still
+  varies on `vary_on` (or `variant`), so a response is only ever served to
+  requests with the same credentials (or visibility) as the one it was
+  built for.
+  """
+  @wraps(view_func)
+  async def wrapped(request, *args, **kwargs):
+    if path is not None:
+      rewrite_path(request, path(request, *args, **kwargs))
+    if request.method in ("GET", "HEAD"):
+      response = await sync_to_async(fresh_cached_response)(request, scopes, vary_on, variant, *args, **kwargs)
+      if response is not None:
+        return response
+    return await sync_to_async(view_func)(request, *args, **kwargs)
+
+  return wrapped
@@ -0,0 +1,22 @@
+from django.core import checks
+from PIL import Image
+
+
+@checks.register()
+def check_versatileimagefield(app_configs, **kwargs):
+  """
+  versatileimagefield before 3.0 resizes with Image.ANTIALIAS, which Pillow 10
+  removed, so every rendition would fail in the workers.
+  """
+  from importlib.metadata import version
+
+  if hasattr(Image, "ANTIALIAS"):
+    return []
+  installed = version("django-versatileimagefield")
+  if int(installed.split(".")[0]) >= 3:
+    return []
+  return [checks.Error(
+    f"django-versatileimagefield {installed} doesn't support Pillow {Image.__version__}.",
+    hint="Upgrade django-versatileimagefield to 3.0 or later, or pin Pillow below 10.",
+    id="blog.E001",
+  )]
@@ -0,0 +1,73 @@
+"""
+Denormalized comment counters.
+
+Post.comment_count and Post.last_activity_at (when the newest comment was
+made, None for a post without comments) let listings show and sort by how
+much a post is discussed without a GROUP BY over blog_comment.
+
+The signal handlers in blog.signals adjust them with a single UPDATE of F()
+expressions as comments are added or removed, so concurrent writers never
+lose an increment. Comments written without signals (queryset.update(), raw
+SQL) or moved to another post make them drift, which reconcile() repairs by
+recounting; the reconcile_comment_counts management command runs it and is
+meant to be run periodically, e.g. from cron.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, DateTimeField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from blog.models import Comment, Post
+
+BATCH_SIZE = 1000
+
+
+def post_type_id():
+  return ContentType.objects.get_for_model(Post).pk
+
+
+def is_post_comment(comment):
+  return comment.content_type_id == post_type_id()
+
+
+def _post_comments():
+  return Comment.objects.filter(content_type_id=post_type_id(), object_id=OuterRef("pk")).order_by()
+
+
+def _latest_comment_at():
+  return Subquery(_post_comments().order_by("-created_at").values("created_at")[:1])
+
+
+def comments_added(post_pk, count, created_at):
+  at = Value(created_at, output_field=DateTimeField())
+  Post.objects.filter(pk=post_pk).update(
+    comment_count=F("comment_count") + count,
+    last_activity_at=Greatest(Coalesce("last_activity_at", at), at),
+  )
+
+
+def comments_removed(post_pk, count):
+  # the newest comment may be among the removed ones
+  Post.objects.filter(pk=post_pk).update(
+    comment_count=Greatest(F("comment_count") - count, Value(0)),
+    last_activity_at=_latest_comment_at(),
+  )
+
+
+def reconcile(batch_size=BATCH_SIZE):
+  """Recounts the comments of every post, a batch of posts per UPDATE. Returns the number of posts."""
+  counts = _post_comments().values("object_id").annotate(count=Count("pk")).values("count")
+  last_pk = 0
+  updated = 0
+
+  while True:
+    pks = list(Post.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+    if not pks:
+      break
+    Post.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(
+      comment_count=Coalesce(Subquery(counts), Value(0)),
+      last_activity_at=_latest_comment_at(),
+    )
+    last_pk = pks[-1]
+    updated += len(pks)
+
+  return updated
@@ -0,0 +1,51 @@
+"""
+The feed of the latest published posts shown as "Recent posts" on every post
+page.
+
+It's a short list of the ids, slugs and titles of the newest published posts,
+kept in the cache and rebuilt by the signal handlers in blog.signals whenever
+a post is published, unpublished, edited or deleted, including scheduled
+posts going live (see blog.publishing), so reading it costs a single cache
+lookup.
+"""
+import time
+
+from django.core.cache import cache
+
+from blog.caching import invalidate_now_and_on_commit, seconds_until_next_publish, store_entry
+
+FEED_KEY = "blog:feed:latest"
+
+# one more than a page shows, so the post being viewed can be left out
+FEED_SIZE = 6
+
+# rebuilt on every change, this only bounds how long a lost update lives
+FEED_TTL = 60 * 60
+
+# the post fields the feed holds or is ordered by
+FEED_FIELDS = {"title", "slug", "published_at"}
+
+
+def build():
+  """Reads the feed from the database and stores it in the cache."""
+  from blog.models import Post
+
+  start = time.monotonic()
+  posts = list(
+    Post.objects.filter(is_published=True)
+    .order_by("-published_at", "-pk")
+    .values("pk", "slug", "title")[:FEED_SIZE]
+  )
+  store_entry(FEED_KEY, posts, seconds_until_next_publish(FEED_TTL), time.monotonic() - start)
+  return posts
+
+
+def refresh():
+  invalidate_now_and_on_commit(build)
+
+
+def latest(exclude=None, count=FEED_SIZE - 1):
+  """Up to `count` of the newest published posts, without the one with the pk `exclude`."""
+  entry = cache.get(FEED_KEY)
+  posts = entry.value if entry is not None and entry.is_fresh() else build()
+  return [post for post in posts if post["pk"] != exclude][:count]
@@ -0,0 +1,119 @@
+"""
+A load test of the sync and async read paths, served by the ASGI application
+of blango.asgi in this process.
+
+run_loadtest() sends `requests` GETs to each path of a PAIRS entry with
+`concurrency` requests in flight, from clients which read every response
+message `client_delay` seconds late, and reports the throughput and the
+p50/p99 latency of each path. Every request comes from a different client
+address so the throttles don't kick in.
+
+Run it with the `loadtest` management command, which uses a throwaway test
+database seeded by blog.benchmarks.seed().
+"""
+import asyncio
+import itertools
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+
+from blog.benchmarks import percentile, sample_objects
+
+# (name, sync path, async path); paths are formatted with the objects picked
+# by blog.benchmarks.sample_objects()
+PAIRS = [
+  ("html-index", "/", "/async/"),
+  ("html-post-detail", "/post/{post.slug}/", "/async/post/{post.slug}/"),
+  ("api-post-list", "/api/v1/posts/", "/api/v1/async/posts/"),
+  ("api-post-detail", "/api/v1/posts/{post.pk}/", "/api/v1/async/posts/{post.pk}/"),
+  ("api-tag-list", "/api/v1/tags/", "/api/v1/async/tags/"),
+  ("api-tag-posts", "/api/v1/tags/{tag.pk}/posts/", "/api/v1/async/tags/{tag.pk}/posts/"),
+]
+
+_addresses = itertools.count(1)
+
+
+def client_address():
+  n = next(_addresses)
+  return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+async def get(application, path, client_delay=0):
+  """Sends a GET for `path` to `application` and returns the status code."""
+  url = urlsplit(path)
+  scope = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": url.path,
+    "raw_path": url.path.encode("ascii"),
+    "query_string": url.query.encode("ascii"),
+    "root_path": "",
+    "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+    "client": (client_address(), 50000),
+    "server": ("localhost", 80),
+  }
+  status = None
+  request_sent = False
+
+  async def receive():
+    nonlocal request_sent
+    if not request_sent:
+      request_sent = True
+      return {"type": "http.request", "body": b"", "more_body": False}
+    # the client stays connected until the response is complete
+    await asyncio.Future()
+
+  async def send(message):
+    nonlocal status
+    if message["type"] == "http.response.start":
+      status = message["status"]
+    if client_delay:
+      await asyncio.sleep(client_delay)
+
+  await application(scope, receive, send)
+  return status
+
+
+async def load(application, path, requests, concurrency, client_delay=0):
+  semaphore = asyncio.Semaphore(concurrency)
+  timings = []
+
+  async def one():
+    async with semaphore:
+      start = time.perf_counter()
+      status = await get(application, path, client_delay)
+      timings.append((time.perf_counter() - start) * 1000)
+    if status != 200:
+      raise RuntimeError(f"GET {path} returned {status}")
+
+  start = time.perf_counter()
+  await asyncio.gather(*(one() for i in range(requests)))
+  elapsed = time.perf_counter() - start
+
+  return {
+    "rps": round(requests / elapsed, 1),
+    "p50_ms": round(statistics.median(timings), 3),
+    "p99_ms": round(percentile(timings, 99), 3),
+  }
+
+
+def run_loadtest(requests, concurrency, client_delay=0, pairs=PAIRS):
+  """Returns one result dict per path of `pairs`, sync before async."""
+  from blango.asgi import application
+
+  objects = sample_objects()
+  results = []
+  for name, sync_path, async_path in pairs:
+    for variant, path in (("sync", sync_path), ("async", async_path)):
+      path = path.format(**objects)
+      result = {"route": name, "variant": variant, "path": path}
+      # both variants start from a cold cache
+      cache.clear()
+      result.update(asyncio.run(load(application, path, requests, concurrency, client_delay)))
+      results.append(result)
+  return results
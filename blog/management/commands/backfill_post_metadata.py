@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+  help = "Recomputes the stored word count and reading time of every Post."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--batch-size", type=int, default=500)
+
+  def handle(self, *args, **options):
+    batch_size = options["batch_size"]
+    last_pk = 0
+    updated = 0
+
+    # walk the table in primary key order so only one batch of post bodies
+    # is held in memory at a time
+    while True:
+      batch = list(
+        Post.objects.filter(pk__gt=last_pk).order_by("pk").only("pk", "content")[:batch_size]
+      )
+      if not batch:
+        break
+
+      for post in batch:
+        post.update_text_metadata()
+      Post.objects.bulk_update(batch, ["word_count", "reading_time"])
+
+      last_pk = batch[-1].pk
+      updated += len(batch)
+
+    self.stdout.write(self.style.SUCCESS(f"Updated {updated} posts"))
@@ -0,0 +1,64 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from blango.testing import isolated_cache
+from blog.benchmarks import run_benchmarks, seed
+
+
+class Command(BaseCommand):
+  help = (
+    "Seeds synthetic archives in a throwaway test database and records query "
+    "counts, p50/p99 latency and peak memory for every blog route. Fails when "
+    "a route goes over its query budget."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated numbers of posts")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON results")
+
+  # the runs clear the cache, keep them off the one the server uses
+  @isolated_cache()
+  def handle(self, *args, **options):
+    sizes = sorted(int(size) for size in options["sizes"].split(","))
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+      results = []
+      for size in sizes:
+        self.stdout.write(f"Seeding {size} posts")
+        seed(size)
+        for result in run_benchmarks(size, options["iterations"]):
+          results.append(result)
+          self.stdout.write(
+            "{size:>7} {route:<22} {queries:>3} queries  p50 {p50_ms:>8.2f} ms  "
+            "p99 {p99_ms:>8.2f} ms  warm {warm_ms:>7.2f} ms  peak {peak_kb:>8.1f} KiB".format(**result)
+          )
+    finally:
+      runner.teardown_databases(old_config)
+      teardown_test_environment()
+
+    with open(options["output"], "w") as f:
+      json.dump({"commit": self.git_commit(), "created_at": timezone.now().isoformat(), "results": results}, f, indent=2)
+    self.stdout.write(f"Results written to {options['output']}")
+
+    over_budget = [r for r in results if not r["ok"]]
+    if over_budget:
+      raise CommandError("Query budget exceeded: " + ", ".join(
+        f"{r['route']} at {r['size']} posts ({r['queries']} > {r['budget']})" for r in over_budget
+      ))
+
+  def git_commit(self):
+    try:
+      return subprocess.run(
+        ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+      ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+      return None
@@ -0,0 +1,66 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import renditions
+from blog.management.commands.warm_hero_images import HERO_IMAGE_DIR, walk
+
+
+class Command(BaseCommand):
+  help = (
+    "Encodes hero images in every responsive format and width, in memory, and "
+    "reports the bytes per variant against the original upload. A variant that "
+    "isn't smaller isn't served (see blog.renditions.render_responsive), so the "
+    "totals count the upload in its place."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("names", nargs="*", help=f"Storage names, defaults to the whole {HERO_IMAGE_DIR} tree")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+
+  def handle(self, *args, **options):
+    names = options["names"]
+    if not names:
+      if not default_storage.exists(HERO_IMAGE_DIR):
+        raise CommandError(f"No {HERO_IMAGE_DIR} directory")
+      names = list(walk(default_storage, HERO_IMAGE_DIR))
+
+    formats = renditions.available_formats()
+    results = []
+    totals = {format_name: 0 for format_name in formats}
+    original_total = 0
+
+    for name in names:
+      original = default_storage.size(name)
+      image = renditions.load_image(name)
+      # a page shows the variant closest to its layout width; the largest one
+      # is what a full width view of the original is compared against
+      width = renditions.responsive_widths(image.width)[-1]
+      original_total += original
+
+      for format_name in formats:
+        size = len(renditions.encode(image, width, format_name))
+        totals[format_name] += min(size, original)
+        results.append({
+          "name": name,
+          "format": format_name,
+          "width": width,
+          "bytes": size,
+          "original_bytes": original,
+          "saving": round(1 - size / original, 3),
+          "served": size < original,
+        })
+        self.stdout.write(
+          f"{name:50} {format_name:5} {width:5}w {size:9} bytes ({size / original:6.1%} of {original})"
+          + ("" if size < original else ", the upload is served instead")
+        )
+
+    for format_name, total in totals.items():
+      self.stdout.write(self.style.SUCCESS(
+        f"{format_name}: {total} bytes served, {total / original_total:.1%} of the originals ({original_total} bytes)"
+      ))
+
+    if options["output"]:
+      with open(options["output"], "w") as f:
+        json.dump(results, f, indent=2)
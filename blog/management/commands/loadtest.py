@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from blango.testing import isolated_cache
+from blog.benchmarks import seed
+from blog.loadtest import run_loadtest
+
+
+class Command(BaseCommand):
+  help = (
+    "Seeds a synthetic archive in a throwaway test database and compares the "
+    "throughput and p50/p99 latency of the sync and async read paths under "
+    "concurrent load, served by the ASGI application in this process."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--size", type=int, default=1000, help="Number of posts")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per path")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight")
+    parser.add_argument(
+      "--client-delay", type=float, default=0.0, help="Seconds a client takes to read each response message"
+    )
+
+  # the runs clear the cache, keep them off the one the server uses
+  @isolated_cache()
+  def handle(self, *args, **options):
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+      self.stdout.write(f"Seeding {options['size']} posts")
+      seed(options["size"])
+      for result in run_loadtest(options["requests"], options["concurrency"], options["client_delay"]):
+        self.stdout.write(
+          "{route:<18} {variant:<5} {rps:>8.1f} req/s  p50 {p50_ms:>8.2f} ms  p99 {p99_ms:>8.2f} ms".format(**result)
+        )
+    finally:
+      runner.teardown_databases(old_config)
+      teardown_test_environment()
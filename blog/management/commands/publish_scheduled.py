@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog import publishing
+
+
+class Command(BaseCommand):
+  help = (
+    "Publishes scheduled Posts as their published_at arrives, sleeping until the next one is due. "
+    "With --once, publishes the Posts that are due and exits."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--once", action="store_true", help="Catch up once instead of running as a worker")
+    parser.add_argument(
+      "--interval", type=float, default=60,
+      help="Longest time to sleep between checks, in seconds, so schedule changes made without signals are noticed",
+    )
+
+  def handle(self, *args, **options):
+    while True:
+      published = publishing.publish_due()
+      if published:
+        self.stdout.write(self.style.SUCCESS(f"Published {published} posts"))
+      if options["once"]:
+        return
+
+      next_publish = publishing.next_publish_at()
+      delay = options["interval"]
+      if next_publish is not None:
+        delay = min(delay, max(0, (next_publish - timezone.now()).total_seconds()))
+      time.sleep(delay)
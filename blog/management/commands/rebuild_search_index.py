@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog import search
+
+
+class Command(BaseCommand):
+  help = "Recopies every Post into the full-text search index, e.g. after a bulk import."
+
+  def handle(self, *args, **options):
+    search.rebuild_index()
+    self.stdout.write(self.style.SUCCESS(f"Rebuilt the {search.backend()} search index"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog import counters
+
+
+class Command(BaseCommand):
+  help = (
+    "Recounts the comments of every Post and resets its comment_count and "
+    "last_activity_at, repairing any drift of the counters kept by the signal handlers."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--batch-size", type=int, default=counters.BATCH_SIZE)
+
+  def handle(self, *args, **options):
+    updated = counters.reconcile(options["batch_size"])
+    self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} posts"))
@@ -0,0 +1,59 @@
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blog import renditions
+from blog.models import Post
+
+HERO_IMAGE_DIR = "hero_images"
+
+
+def walk(storage, path):
+  directories, files = storage.listdir(path)
+  for name in files:
+    yield posixpath.join(path, name)
+  for directory in directories:
+    yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+  help = "Renders every hero image rendition of the media/hero_images tree."
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--workers", type=int, default=None,
+      help="Processes to render in, defaults to BLOG_RENDITION_WORKERS (0 renders in this process)",
+    )
+
+  def handle(self, *args, **options):
+    workers = options["workers"]
+    if workers is None:
+      workers = settings.BLOG_RENDITION_WORKERS
+
+    if not default_storage.exists(HERO_IMAGE_DIR):
+      self.stdout.write(f"No {HERO_IMAGE_DIR} directory")
+      return
+
+    # crops depend on the PPOI of the post using the image
+    ppois = dict(Post.objects.exclude(hero_image="").values_list("hero_image", "ppoi").iterator())
+    jobs = [(name, ppois.get(name, (0.5, 0.5))) for name in walk(default_storage, HERO_IMAGE_DIR)]
+
+    if workers:
+      with ProcessPoolExecutor(max_workers=workers, initializer=renditions._init_worker) as executor:
+        results = list(executor.map(renditions.render, *zip(*jobs), chunksize=8)) if jobs else []
+    else:
+      results = [renditions.render(name, ppoi) for name, ppoi in jobs]
+
+    for (name, ppoi), (count, paths, manifest) in zip(jobs, results):
+      renditions.save_manifest(name, manifest)
+
+    created = sum(count for count, paths, manifest in results)
+    failed = [path for count, paths, manifest in results for path in paths]
+    for path in failed:
+      self.stderr.write(f"Failed: {path}")
+    self.stdout.write(self.style.SUCCESS(
+      f"Rendered {created} renditions of {len(jobs)} images, {len(failed)} failed"
+    ))
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from blog import search
+    search.create_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from blog import search
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_word_count'),
+    ]
+
+    operations = [
+        # vendor specific, see blog.search; a no-op on other databases
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
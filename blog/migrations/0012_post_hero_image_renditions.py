@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hero_image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
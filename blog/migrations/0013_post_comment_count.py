@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Comment = apps.get_model('blog', 'Comment')
+    Post = apps.get_model('blog', 'Post')
+
+    post_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if post_type is None:
+        # a new database, there are no comments yet
+        return
+    comments = Comment.objects.filter(content_type=post_type, object_id=OuterRef('pk')).order_by()
+    Post.objects.update(
+        comment_count=Coalesce(Subquery(comments.values('object_id').annotate(n=Count('pk')).values('n')), Value(0)),
+        last_activity_at=Subquery(comments.order_by('-created_at').values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_post_hero_image_renditions'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_post_comment_count'),
+    ]
+
+    # the composite index replaces the ones on object_id and created_at, and is
+    # built before they are dropped
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_type', 'object_id', 'created_at'], name='blog_comment_thread'),
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created_at', 'id']},
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='object_id',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:52
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_published(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Post.objects.filter(published_at__lte=timezone.now()).update(is_published=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='is_published',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_published, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['published_at'], name='blog_post_published'),
+        ),
+    ]
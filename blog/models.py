@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
@@ -7,6 +8,24 @@ from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelatio
 # importing versatileimagefield and primarypointofinterest field from 3 party library
 from versatileimagefield.fields import VersatileImageField, PPOIField
 
+import math
+
+# average adult silent reading speed, used for the reading time estimate
+WORDS_PER_MINUTE = 200
+
+
+def count_words(text):
+  # same rule as the wordcount template filter
+  return len(text.split())
+
+
+def reading_time_for(word_count):
+  return math.ceil(word_count / WORDS_PER_MINUTE)
+
+
+# maintained by blog.counters, see Post.save()
+COUNTER_FIELDS = ("comment_count", "last_activity_at")
+
 
 # Create your models here.
 class Tag(models.Model):
@@ -27,14 +46,23 @@ class Comment(models.Model):
   content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
   
   #to get value of the pk of the said content_object.  PK of the related object(Post or User)
-  object_id = models.PositiveIntegerField(db_index=True)
+  object_id = models.PositiveIntegerField()
 
   # its a foreign key to generic object with mapping to its ContentType and its pk 
   content_object = GenericForeignKey("content_type", "object_id")
 
-  created_at = models.DateTimeField(auto_now_add = True, db_index=True)
+  created_at = models.DateTimeField(auto_now_add = True)
   modified_at = models.DateTimeField(auto_now = True)
 
+  class Meta:
+    # oldest first, read in index order; the id breaks ties
+    ordering = ["created_at", "id"]
+    indexes = [
+      # the comments of an object are looked up and sorted without touching
+      # the other comments
+      models.Index(fields=["content_type", "object_id", "created_at"], name="blog_comment_thread"),
+    ]
+
   def __str__(self):
     return self.creator
 
@@ -64,13 +92,74 @@ class Post(models.Model):
 
   ppoi = PPOIField(null=True, blank=True)
 
+  # AVIF/WebP/JPEG variants of hero_image at several widths, see blog.renditions
+  hero_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+  # derived from content on save so listings never have to tokenize post bodies
+  word_count = models.PositiveIntegerField(default=0, editable=False)
+  reading_time = models.PositiveIntegerField(default=0, editable=False, help_text="Minutes")
+
+  # kept up to date by blog.counters so listings can show and sort by how
+  # much a post is discussed without counting its comments
+  comment_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+  last_activity_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+
+  # whether published_at has arrived, so visibility is an equality on a
+  # column rather than a comparison with the clock. Set on save and flipped
+  # for scheduled posts by blog.publishing
+  is_published = models.BooleanField(default=False, editable=False)
+
   class Meta:
     ordering =["created_at"]
+    indexes = [
+      # the published posts, newest first, without the drafts
+      models.Index(fields=["published_at"], condition=models.Q(is_published=True), name="blog_post_published"),
+    ]
 
   
   def __str__(self):
     return self.title
 
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instance = super(Post, cls).from_db(db, field_names, values)
+    # remember what was loaded so signal handlers can tell what changed
+    instance._loaded_values = dict(zip(field_names, values))
+    return instance
+
+  def update_text_metadata(self):
+    self.word_count = count_words(self.content)
+    self.reading_time = reading_time_for(self.word_count)
+
+  def update_is_published(self, now=None):
+    self.is_published = self.published_at is not None and self.published_at <= (now or timezone.now())
+
+  def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+    kwargs = {"force_insert": force_insert, "force_update": force_update, "using": using, "update_fields": update_fields}
+    # inserts, including copies and deleted posts saved again (pk set to
+    # None), and forced saves are left to Django
+    if update_fields is None and self.pk is not None and not self._state.adding and not (force_insert or force_update):
+      # the counters are only ever written with F() expressions; saving the
+      # values this instance was loaded with would undo concurrent updates
+      deferred = self.get_deferred_fields()
+      update_fields = kwargs["update_fields"] = [
+        f.name for f in self._meta.concrete_fields
+        if not f.primary_key and f.name not in COUNTER_FIELDS and f.attname not in deferred
+      ]
+    if update_fields is None or "content" in update_fields:
+      self.update_text_metadata()
+      if update_fields is not None:
+        kwargs["update_fields"] = set(update_fields) | {"word_count", "reading_time"}
+    if update_fields is None or "published_at" in update_fields:
+      self.update_is_published()
+      if update_fields is not None:
+        kwargs["update_fields"] = set(kwargs["update_fields"]) | {"is_published"}
+
+    super(Post, self).save(**kwargs)
+    self._loaded_values = {
+      f.attname: self.__dict__[f.attname] for f in self._meta.concrete_fields if f.attname in self.__dict__
+    }
+
 class AuthorProfile(models.Model):
   user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="profile")
   bio = models.TextField()
@@ -0,0 +1,58 @@
+"""
+Keyset (a.k.a. seek) pagination helpers for the HTML views.
+
+OFFSET pagination makes the database walk and throw away every row before the
+requested page, so deep pages get slower as the archive grows. With a keyset
+we remember the sort key of the last row we showed - here (published_at, pk) -
+and ask for the rows that sort after it, which is a plain range scan on the
+published_at index no matter how far back the reader goes.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(timestamp, pk):
+  raw = f"{timestamp.isoformat()}|{pk}".encode("ascii")
+  return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+  try:
+    raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+    timestamp, pk = raw.split("|")
+    return datetime.fromisoformat(timestamp), int(pk)
+  except (TypeError, ValueError, UnicodeError):
+    raise Http404("Invalid cursor")
+
+
+def keyset_page(queryset, cursor, page_size, field="published_at", descending=True):
+  """
+  Returns (objects, next_cursor) for the page after `cursor`, newest first
+  unless `descending` is False. `field` must be non-null for every row in
+  `queryset`; pk breaks ties.
+  """
+  if descending:
+    queryset = queryset.order_by(f"-{field}", "-pk")
+    after = "lt"
+  else:
+    queryset = queryset.order_by(field, "pk")
+    after = "gt"
+
+  if cursor:
+    timestamp, pk = decode_cursor(cursor)
+    queryset = queryset.filter(
+      Q(**{f"{field}__{after}": timestamp}) | Q(**{field: timestamp, f"pk__{after}": pk})
+    )
+
+  # one extra row tells us whether there is a next page without a COUNT(*)
+  objects = list(queryset[:page_size + 1])
+  next_cursor = None
+  if len(objects) > page_size:
+    objects = objects[:page_size]
+    last = objects[-1]
+    next_cursor = encode_cursor(getattr(last, field), last.pk)
+
+  return objects, next_cursor
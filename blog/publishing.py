@@ -0,0 +1,143 @@
+"""
+Scheduled publishing.
+
+A post is visible to everyone once its published_at has arrived. Rather than
+comparing published_at with the clock in every query, which gives every
+request a different query and keeps lists from being cached past the next
+publication, Post.is_published records it: Post.save() sets it and
+publish_due() flips it for the scheduled posts whose time has come, sending
+posts_published so the signal handlers in blog.signals invalidate the cached
+responses showing them.
+
+publish_due() is run by the publish_scheduled management command, a worker
+that sleeps until the next scheduled post is due, and on demand by
+scheduled_publishing_middleware(), so a post goes live on time even while the
+worker is behind or not running. The time of the next scheduled post and the
+drafts of each author are kept in the cache as separate small entries, so
+checking costs the lookup of a timestamp; only the staff read every draft, see
+drafts().
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+from blog.caching import acquire_lease, invalidate_now_and_on_commit, release_lease
+
+DRAFTS_KEY = "blog:publishing:drafts"
+NEXT_PUBLISH_KEY = "blog:publishing:next"
+AUTHOR_DRAFTS_KEY_PREFIX = "blog:publishing:drafts:"
+
+# cached as the next publish time when no post is scheduled, as a missing
+# entry reads as None
+NOTHING_SCHEDULED = 0
+
+# the entries are forgotten on every write to published_at, this only bounds
+# how long a change made without signals goes unnoticed
+DRAFTS_TTL = 60 * 60
+
+# sent by publish_due() with the list of newly visible `posts`
+posts_published = Signal()
+
+
+def author_drafts_key(author_id):
+  return f"{AUTHOR_DRAFTS_KEY_PREFIX}{author_id}"
+
+
+def drafts():
+  """
+  (pk, author_id, published_at) of every unpublished post, the scheduled
+  ones first in the order they're due and then those without a published_at.
+  """
+  from blog.models import Post
+
+  posts = cache.get(DRAFTS_KEY)
+  if posts is None:
+    posts = list(
+      Post.objects.filter(is_published=False)
+      .order_by(F("published_at").asc(nulls_last=True), "pk")
+      .values_list("pk", "author_id", "published_at")
+    )
+    cache.set(DRAFTS_KEY, posts, DRAFTS_TTL)
+  return posts
+
+
+def author_drafts(author_id):
+  """drafts() of the author with the pk `author_id`, cached on their own."""
+  key = author_drafts_key(author_id)
+  posts = cache.get(key)
+  if posts is None:
+    posts = [draft for draft in drafts() if draft[1] == author_id]
+    cache.set(key, posts, DRAFTS_TTL)
+  return posts
+
+
+def next_publish_at():
+  """When the next scheduled post is due, None if there is none."""
+  at = cache.get(NEXT_PUBLISH_KEY)
+  if at is None:
+    posts = drafts()
+    at = (posts[0][2] if posts else None) or NOTHING_SCHEDULED
+    cache.set(NEXT_PUBLISH_KEY, at, DRAFTS_TTL)
+  return at or None
+
+
+def forget_schedule(*author_ids):
+  """Forgets the cached schedule and the drafts of the authors with the pks `author_ids`."""
+  keys = [DRAFTS_KEY, NEXT_PUBLISH_KEY] + [author_drafts_key(pk) for pk in set(author_ids) if pk is not None]
+  invalidate_now_and_on_commit(lambda: cache.delete_many(keys))
+
+
+def publish_due(now=None):
+  """Marks the scheduled posts whose time has come as published. Returns how many there were."""
+  from blog.models import Post
+
+  now = now or timezone.now()
+  with transaction.atomic():
+    posts = list(
+      Post.objects.select_for_update()
+      .filter(is_published=False, published_at__lte=now)
+      .only("pk", "author_id", "published_at")
+    )
+    if posts:
+      Post.objects.filter(pk__in=[post.pk for post in posts]).update(is_published=True)
+      posts_published.send(sender=Post, posts=posts)
+  forget_schedule(*[post.author_id for post in posts])
+  return len(posts)
+
+
+def is_due(now=None):
+  at = next_publish_at()
+  return at is not None and at <= (now or timezone.now())
+
+
+def catch_up():
+  """Runs publish_due() if a scheduled post is due, with one worker at a time doing it."""
+  if not is_due():
+    return 0
+  if not acquire_lease(DRAFTS_KEY):
+    return 0
+  try:
+    return publish_due()
+  finally:
+    release_lease(DRAFTS_KEY)
+
+
+@sync_and_async_middleware
+def scheduled_publishing_middleware(get_response):
+  """Publishes the posts that are due before the request looks at any of them."""
+  if asyncio.iscoroutinefunction(get_response):
+    # keeps the async views in blog.async_views on the event loop
+    async def middleware(request):
+      await sync_to_async(catch_up)()
+      return await get_response(request)
+  else:
+    def middleware(request):
+      catch_up()
+      return get_response(request)
+  return middleware
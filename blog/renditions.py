@@ -0,0 +1,244 @@
+"""
+Ahead-of-time hero image renditions.
+
+create_images_on_demand is off (see VERSATILEIMAGEFIELD_SETTINGS), so
+serializers and templates only ever build the URLs of sized images and never
+resize inside a request. Instead every size of the "hero_image" rendition key
+set is generated here: after the commit that uploads a hero image or moves its
+PPOI, in a pool of BLOG_RENDITION_WORKERS processes, and in bulk by the
+warm_hero_images management command.
+
+Alongside those, each hero image is encoded as AVIF, WebP and JPEG at the
+RESPONSIVE_WIDTHS no wider than the original. The files are named after a
+hash of their content, so they can be served with an immutable Cache-Control,
+and are listed in the Post.hero_image_renditions manifest which serializers
+and templates turn into srcset attributes. Where a variant would be no smaller
+than the upload, the manifest points at the upload instead:
+
+  {"width": 1920, "height": 1280, "sources": {
+    "avif": [[320, "__responsive__/hero_images/snake-320w-3f2a9c1d.avif"], ...],
+    "webp": [...], "jpeg": [...]}}
+
+The workers only get the file name and the PPOI, never model instances, so
+they don't need a database connection; the manifest is saved by the process
+that submitted the work.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+from versatileimagefield.image_warmer import VersatileImageFieldWarmer
+from versatileimagefield.utils import get_rendition_key_set
+
+logger = logging.getLogger(__name__)
+
+RENDITION_KEY_SET = "hero_image"
+
+RESPONSIVE_DIR = "__responsive__"
+RESPONSIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+
+# best first, as <source> elements are tried in order; JPEG is the fallback
+# for the <img> itself. Uploads are usually JPEGs already, and re-encoding one
+# at a quality close to its own only adds bytes, hence the low-ish qualities.
+RESPONSIVE_FORMATS = {
+  "avif": {"format": "AVIF", "feature": "avif", "content_type": "image/avif", "options": {"quality": 45}},
+  "webp": {"format": "WEBP", "feature": "webp", "content_type": "image/webp", "options": {"quality": 60, "method": 6}},
+  "jpeg": {
+    "format": "JPEG", "feature": "jpg", "content_type": "image/jpeg",
+    "options": {"quality": 70, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+  },
+}
+FALLBACK_FORMAT = "jpeg"
+
+_executor = None
+
+
+def size_keys():
+  return [size_key for name, size_key in get_rendition_key_set(RENDITION_KEY_SET)]
+
+
+def available_formats():
+  # AVIF needs a Pillow built with libavif
+  return [name for name, spec in RESPONSIVE_FORMATS.items() if features.check(spec["feature"])]
+
+
+def responsive_widths(width):
+  widths = [w for w in RESPONSIVE_WIDTHS if w < width]
+  return widths + [min(width, RESPONSIVE_WIDTHS[-1])]
+
+
+def encode(image, width, format_name):
+  """Returns `image` scaled to `width` and encoded as `format_name`, as bytes."""
+  spec = RESPONSIVE_FORMATS[format_name]
+  if width != image.width:
+    image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+  if spec["format"] == "JPEG" and image.mode != "RGB":
+    image = image.convert("RGB")
+  data = io.BytesIO()
+  image.save(data, spec["format"], **spec["options"])
+  return data.getvalue()
+
+
+def load_image(name):
+  with default_storage.open(name) as f:
+    image = ImageOps.exif_transpose(Image.open(f))
+    image.load()
+  if image.mode not in ("RGB", "RGBA"):
+    image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+  return image
+
+
+def original_format(name):
+  """Returns the RESPONSIVE_FORMATS name of the upload `name`, or None."""
+  with default_storage.open(name) as f:
+    image_format = Image.open(f).format
+  return next((format_name for format_name, spec in RESPONSIVE_FORMATS.items() if spec["format"] == image_format), None)
+
+
+def render_responsive(name):
+  """
+  Writes the responsive variants of `name` and returns their manifest.
+
+  A variant is only worth serving while it is smaller than the upload itself.
+  From the first width where it isn't, the srcset ends with the upload at its
+  own width instead, if the upload can stand in for the format (it always can
+  for the <img> fallback); otherwise the format is left out and browsers fall
+  through to the next <source>.
+  """
+  image = load_image(name)
+  original_size = default_storage.size(name)
+  upload_format = original_format(name)
+  stem = posixpath.splitext(name)[0]
+  sources = {}
+
+  for format_name in available_formats():
+    variants = []
+    for width in responsive_widths(image.width):
+      data = encode(image, width, format_name)
+      if len(data) >= original_size:
+        if format_name not in (FALLBACK_FORMAT, upload_format):
+          variants = None
+        else:
+          variants.append([image.width, name])
+        break
+      digest = hashlib.sha256(data).hexdigest()[:12]
+      path = f"{RESPONSIVE_DIR}/{stem}-{width}w-{digest}.{format_name}"
+      # the name changes with the content, so an existing file is current
+      if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(data))
+      variants.append([width, path])
+    if variants:
+      sources[format_name] = variants
+
+  return {"width": image.width, "height": image.height, "sources": sources}
+
+
+def render(name, ppoi):
+  """
+  Creates every rendition of the hero image stored as `name`. Returns the
+  number created, a list of the ones that failed and the responsive manifest.
+  """
+  from blog.models import Post
+
+  # an unsaved post wraps the file in a VersatileImageFieldFile with the PPOI
+  image = Post(hero_image=name, ppoi=ppoi).hero_image
+  created, failed = 0, []
+  for size_key in size_keys():
+    success, url_or_path = VersatileImageFieldWarmer._prewarm_versatileimagefield(size_key, image)
+    if success:
+      created += 1
+    else:
+      failed.append(url_or_path)
+
+  try:
+    manifest = render_responsive(name)
+  except Exception:
+    logger.exception("Rendering responsive variants of %s failed", name)
+    manifest = {}
+    failed.append(name)
+  else:
+    # not counting the upload standing in for a variant
+    created += sum(path != name for variants in manifest["sources"].values() for width, path in variants)
+  return created, failed, manifest
+
+
+def save_manifest(name, manifest):
+  """Stores `manifest` on the posts using the hero image `name`."""
+  from blog.models import Post
+
+  if not manifest:
+    return
+  for post in Post.objects.filter(hero_image=name):
+    post.hero_image_renditions = manifest
+    # through save() so the cached responses showing the post are invalidated
+    post.save(update_fields=["hero_image_renditions", "modified_at"])
+
+
+def srcset(manifest, format_name):
+  return ", ".join(
+    f"{default_storage.url(path)} {width}w" for width, path in manifest.get("sources", {}).get(format_name, [])
+  )
+
+
+def _init_worker():
+  # fork inherits the configured project, spawn and forkserver start afresh
+  from django.apps import apps
+  if not apps.ready:
+    import configurations
+    configurations.setup()
+
+
+def get_executor():
+  global _executor
+  if _executor is None:
+    _executor = ProcessPoolExecutor(max_workers=settings.BLOG_RENDITION_WORKERS, initializer=_init_worker)
+  return _executor
+
+
+def _apply_result(name, future):
+  try:
+    created, failed, manifest = future.result()
+  except Exception:
+    logger.exception("Rendering hero image renditions failed")
+    return
+  for path in failed:
+    logger.error("Could not render a rendition of %s", path)
+
+  # runs on the executor's thread, which gets a database connection of its own
+  try:
+    save_manifest(name, manifest)
+  finally:
+    connections.close_all()
+
+
+def submit(name, ppoi):
+  if not settings.BLOG_RENDITION_WORKERS:
+    created, failed, manifest = render(name, ppoi)
+    save_manifest(name, manifest)
+    return
+  future = get_executor().submit(render, name, ppoi)
+  future.add_done_callback(lambda future: _apply_result(name, future))
+  return future
+
+
+def image_changed(post):
+  if not post.hero_image:
+    return False
+  loaded = getattr(post, "_loaded_values", None)
+  if loaded is None:
+    # a new post, or one that wasn't loaded from the database
+    return True
+  return loaded.get("hero_image") != post.hero_image.name or loaded.get("ppoi") != post.ppoi
+
+
+def schedule(post):
+  """Renders the renditions of `post` once the current transaction commits."""
+  name, ppoi = post.hero_image.name, post.ppoi
+  transaction.on_commit(lambda: submit(name, ppoi))
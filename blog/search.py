@@ -0,0 +1,175 @@
+"""
+Full-text search over post titles, summaries and content.
+
+On SQLite the posts are copied into an FTS5 table, blog_post_fts, whose rowid
+is the post id; the signal handlers in blog.signals keep it in sync. On
+PostgreSQL blog_post gets a generated tsvector column with a GIN index, which
+the database keeps in sync itself. Anything else falls back to icontains
+lookups, i.e. a table scan.
+
+search() narrows a Post queryset to the posts matching every word of the
+query and annotates a search_rank (lower is better), so callers can order by
+relevance.
+"""
+from django.db import connection as default_connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "blog_post_fts"
+FTS_COLUMNS = ("title", "summary", "content")
+
+# title matches weigh most, then the summary, then the content
+PG_WEIGHTS = {"title": "A", "summary": "B", "content": "C"}
+PG_CONFIG = "english"
+
+_fts5_available = {}
+
+
+def fts5_available(connection=default_connection):
+  if connection.vendor != "sqlite":
+    return False
+  if connection.alias not in _fts5_available:
+    with connection.cursor() as cursor:
+      cursor.execute("PRAGMA compile_options")
+      _fts5_available[connection.alias] = ("ENABLE_FTS5",) in cursor.fetchall()
+  return _fts5_available[connection.alias]
+
+
+def backend(connection=default_connection):
+  if connection.vendor == "postgresql":
+    return "postgres"
+  if fts5_available(connection):
+    return "fts5"
+  return "fallback"
+
+
+def create_index(connection=default_connection):
+  with connection.cursor() as cursor:
+    if backend(connection) == "fts5":
+      cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5({', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+      )
+      rebuild_index(connection)
+
+    elif backend(connection) == "postgres":
+      vector = " || ".join(
+        f"setweight(to_tsvector('{PG_CONFIG}', coalesce({column}, '')), '{weight}')"
+        for column, weight in PG_WEIGHTS.items()
+      )
+      cursor.execute(
+        f"ALTER TABLE blog_post ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED"
+      )
+      cursor.execute(
+        "CREATE INDEX IF NOT EXISTS blog_post_search_vector_idx ON blog_post USING GIN (search_vector)"
+      )
+
+
+def drop_index(connection=default_connection):
+  with connection.cursor() as cursor:
+    if backend(connection) == "fts5":
+      cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif backend(connection) == "postgres":
+      cursor.execute("ALTER TABLE blog_post DROP COLUMN IF EXISTS search_vector")
+
+
+def rebuild_index(connection=default_connection):
+  """Recopies every post into the FTS5 table, e.g. after a bulk_create."""
+  if backend(connection) != "fts5":
+    return
+  with connection.cursor() as cursor:
+    cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    cursor.execute(
+      f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+      f"SELECT id, {', '.join(FTS_COLUMNS)} FROM blog_post"
+    )
+
+
+def index_post(post, connection=default_connection):
+  if backend(connection) != "fts5":
+    return
+  with connection.cursor() as cursor:
+    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post.pk])
+    cursor.execute(
+      f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s)",
+      [post.pk] + [getattr(post, column) for column in FTS_COLUMNS],
+    )
+
+
+def index_posts(posts, connection=default_connection):
+  """Adds new posts to the FTS5 table, e.g. after a bulk_create."""
+  if backend(connection) != "fts5" or not posts:
+    return
+  with connection.cursor() as cursor:
+    cursor.executemany(
+      f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s)",
+      [[post.pk] + [getattr(post, column) for column in FTS_COLUMNS] for post in posts],
+    )
+
+
+def remove_post(pk, connection=default_connection):
+  if backend(connection) != "fts5":
+    return
+  with connection.cursor() as cursor:
+    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def fts5_query(words, column=None):
+  # every word is quoted so user input can't use (or break) the FTS5 query
+  # syntax; adjacent strings are ANDed
+  query = " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+  if column:
+    return f"{column} : ({query})"
+  return query
+
+
+def search(queryset, query, column=None):
+  """
+  Returns `queryset` narrowed to the posts containing every word of `query`,
+  in `column` if it is given, annotated with search_rank.
+  """
+  words = query.split()
+  if not words:
+    return queryset
+
+  vendor = backend(connections[queryset.db])
+
+  if vendor == "fts5":
+    match = fts5_query(words, column)
+    return queryset.filter(
+      pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    ).annotate(search_rank=RawSQL(
+      # bm25() is only available within the full-text query itself
+      f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+      f"WHERE {FTS_TABLE} MATCH %s AND rowid = blog_post.id",
+      [match],
+      output_field=FloatField(),
+    ))
+
+  if vendor == "postgres":
+    text = " ".join(words)
+    queryset = queryset.filter(pk__in=RawSQL(
+      f"SELECT id FROM blog_post WHERE search_vector @@ plainto_tsquery('{PG_CONFIG}', %s)", [text]
+    ))
+    if column:
+      # the GIN index narrows down the candidates, the column is rechecked
+      queryset = queryset.annotate(search_column_match=RawSQL(
+        f"to_tsvector('{PG_CONFIG}', blog_post.{column}) @@ plainto_tsquery('{PG_CONFIG}', %s)",
+        [text],
+        output_field=BooleanField(),
+      )).filter(search_column_match=True)
+    # ts_rank_cd is higher for better matches, negated to sort like bm25()
+    return queryset.annotate(search_rank=RawSQL(
+      f"-ts_rank_cd(blog_post.search_vector, plainto_tsquery('{PG_CONFIG}', %s))",
+      [text],
+      output_field=FloatField(),
+    ))
+
+  columns = [column] if column else FTS_COLUMNS
+  for word in words:
+    condition = Q()
+    for name in columns:
+      condition |= Q(**{f"{name}__icontains": word})
+    queryset = queryset.filter(condition)
+  return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
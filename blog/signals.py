@@ -0,0 +1,231 @@
+"""
+Signal handlers that invalidate cached responses when the data behind them
+changes, keep the full-text search index, the recent posts feed (see
+blog.feed), the posts-by-time day buckets (see blog.time_buckets) and the
+comment counters (see blog.counters) in step with the posts and comments and
+render new hero images. See blog.caching for how the scope versions are used.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from blog import caching, counters, feed, publishing, renditions, search, tag_resolver, time_buckets
+from blog.models import AuthorProfile, Comment, Post, Tag
+
+# posts-by-time only ever looks this far back
+TIME_WINDOW = timedelta(days=7)
+
+# sent by blog.api.bulk in place of the post_save signals bulk_create skips,
+# with the list of new `posts` (and the `tag_pks` they link to) or `comments`
+posts_bulk_created = Signal()
+comments_bulk_created = Signal()
+
+
+def _in_time_window(*published_ats):
+  since = timezone.now() - TIME_WINDOW
+  return any(published_at is not None and published_at >= since for published_at in published_ats)
+
+
+def post_scopes(post):
+  loaded = getattr(post, "_loaded_values", {})
+  scopes = ["posts", f"post:{post.pk}", f"author:{post.author_id}"]
+
+  # the post may have moved away from an author or out of a time window
+  if loaded.get("author_id") not in (None, post.author_id):
+    scopes.append(f"author:{loaded['author_id']}")
+  if _in_time_window(post.published_at, loaded.get("published_at")):
+    scopes.append("posts-by-time")
+
+  return scopes
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+  # the tag links are gone by the time post_delete fires
+  instance._deleted_tag_pks = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+  tag_pks = getattr(instance, "_deleted_tag_pks", None)
+  if tag_pks is None:
+    tag_pks = instance.tags.values_list("pk", flat=True)
+  caching.bump(*post_scopes(instance), *[f"tag:{pk}" for pk in tag_pks])
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and not set(search.FTS_COLUMNS) & set(update_fields):
+    return
+  search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+  search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def refresh_feed(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and not feed.FEED_FIELDS & set(update_fields):
+    return
+  feed.refresh()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_schedule(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and "published_at" not in update_fields:
+    return
+  loaded = getattr(instance, "_loaded_values", {})
+  publishing.forget_schedule(instance.author_id, loaded.get("author_id"))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_time_buckets(sender, instance, update_fields=None, **kwargs):
+  if update_fields is not None and "published_at" not in update_fields:
+    return
+  loaded = getattr(instance, "_loaded_values", {})
+  time_buckets.forget(instance.published_at, loaded.get("published_at"))
+
+
+@receiver(post_save, sender=Post)
+def render_hero_image(sender, instance, **kwargs):
+  if renditions.image_changed(instance):
+    renditions.schedule(instance)
+
+
+@receiver(posts_bulk_created)
+def invalidate_bulk_posts(sender, posts, tag_pks, **kwargs):
+  scopes = ["posts"] + [f"author:{pk}" for pk in {post.author_id for post in posts}]
+  if _in_time_window(*[post.published_at for post in posts]):
+    scopes.append("posts-by-time")
+  caching.bump(*scopes, *[f"tag:{pk}" for pk in tag_pks])
+
+
+@receiver(posts_bulk_created)
+def refresh_bulk_feed(sender, **kwargs):
+  feed.refresh()
+
+
+@receiver(posts_bulk_created)
+def forget_bulk_schedule(sender, posts, **kwargs):
+  publishing.forget_schedule(*[post.author_id for post in posts])
+  time_buckets.forget(*[post.published_at for post in posts])
+
+
+@receiver(publishing.posts_published)
+def invalidate_published_posts(sender, posts, **kwargs):
+  scopes = ["posts"]
+  for post in posts:
+    scopes += [f"post:{post.pk}", f"author:{post.author_id}"]
+  if _in_time_window(*[post.published_at for post in posts]):
+    scopes.append("posts-by-time")
+  tag_pks = Post.tags.through.objects.filter(post_id__in=[post.pk for post in posts]).values_list("tag_id", flat=True)
+  caching.bump(*scopes, *[f"tag:{pk}" for pk in set(tag_pks)])
+
+
+@receiver(publishing.posts_published)
+def refresh_published_feed(sender, **kwargs):
+  feed.refresh()
+
+
+@receiver(publishing.posts_published)
+def forget_published_time_buckets(sender, posts, **kwargs):
+  time_buckets.forget(*[post.published_at for post in posts])
+
+
+@receiver(posts_bulk_created)
+def index_bulk_posts(sender, posts, **kwargs):
+  search.index_posts(posts)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+  if action not in ("post_add", "post_remove", "pre_clear"):
+    return
+
+  if reverse:
+    # instance is a Tag and pk_set holds Post pks
+    posts = Post.objects.filter(pk__in=pk_set) if pk_set else instance.posts.all()
+    tag_pks = [instance.pk]
+  else:
+    posts = [instance]
+    tag_pks = pk_set if pk_set else instance.tags.values_list("pk", flat=True)
+
+  scopes = [f"tag:{pk}" for pk in tag_pks]
+  for post in posts:
+    scopes += post_scopes(post)
+  caching.bump(*scopes)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+  caching.bump("tags", f"tag:{instance.pk}")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def forget_tag(sender, instance, **kwargs):
+  tag_resolver.forget_tag(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+  if counters.is_post_comment(instance):
+    # the post shows its comments and the count; lists only follow the counts
+    # when they are ordered by them, see blog.api.views.DISCUSSED_ORDERINGS
+    caching.bump(f"post:{instance.object_id}", "discussed")
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+  if created and counters.is_post_comment(instance):
+    counters.comments_added(instance.object_id, 1, instance.created_at)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+  if counters.is_post_comment(instance):
+    counters.comments_removed(instance.object_id, 1)
+
+
+@receiver(comments_bulk_created)
+def invalidate_bulk_comments(sender, comments, **kwargs):
+  post_pks = {c.object_id for c in comments if counters.is_post_comment(c)}
+  if post_pks:
+    caching.bump(*[f"post:{pk}" for pk in post_pks], "discussed")
+
+
+@receiver(comments_bulk_created)
+def count_bulk_comments(sender, comments, **kwargs):
+  added = {}
+  for comment in comments:
+    if counters.is_post_comment(comment):
+      count, created_at = added.get(comment.object_id, (0, comment.created_at))
+      added[comment.object_id] = (count + 1, max(created_at, comment.created_at))
+  for post_pk, (count, created_at) in added.items():
+    counters.comments_added(post_pk, count, created_at)
+
+
+@receiver(post_save, sender=AuthorProfile)
+@receiver(post_delete, sender=AuthorProfile)
+def invalidate_profile(sender, instance, **kwargs):
+  # shown on the author's post pages, see blog.views.post_page()
+  caching.bump(f"profile:{instance.user_id}")
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+  # logins save last_login only, which none of the cached responses show
+  if update_fields is not None and not {"email", "first_name", "last_name"} & set(update_fields):
+    return
+  caching.bump("users", f"user:{instance.pk}")
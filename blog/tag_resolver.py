@@ -0,0 +1,64 @@
+"""
+Per-process cache of tag value -> tag primary key.
+
+resolve_tags() turns the tag values of one or more posts into Tag instances
+in at most three queries, whatever their number: one IN lookup for the
+values not cached here, one bulk insert (ignoring conflicts) for the ones
+that don't exist and one re-read of those. Hot tags cost no query at all.
+
+Ids are only cached once the transaction that read or created their row has
+committed. Entries are dropped by the signal handlers in blog.signals when a
+tag is saved or deleted in this process, and expire after TAG_RESOLVER_TTL
+seconds so a change made by another process is picked up too.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from blango.lru import ExpiringLRU
+from blog import caching
+from blog.models import Tag
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+
+# value -> pk
+_ids = ExpiringLRU(
+  lambda: getattr(settings, "TAG_RESOLVER_TTL", DEFAULT_TTL),
+  lambda: getattr(settings, "TAG_RESOLVER_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+)
+
+
+def _tag(pk, value):
+  # as if loaded from the database, so it can be added to relations
+  return Tag.from_db(Tag.objects.db, ["id", "value"], [pk, value])
+
+
+def resolve_tags(values):
+  """Returns {value: Tag} for the lowercased `values`, creating the missing tags."""
+  values = set(values)
+  ids = _ids.get_many(values)
+
+  missing = values - ids.keys()
+  if missing:
+    found = dict(Tag.objects.filter(value__in=missing).values_list("value", "pk"))
+    new = missing - found.keys()
+    if new:
+      # another request may create some of them in the meantime
+      Tag.objects.bulk_create([Tag(value=value) for value in new], ignore_conflicts=True)
+      found.update(Tag.objects.filter(value__in=new).values_list("value", "pk"))
+      # bulk_create sends no post_save for blog.signals.invalidate_tag
+      caching.bump("tags")
+    ids.update(found)
+    # a rolled back row must not stay cached
+    transaction.on_commit(lambda: _ids.set_many(found))
+
+  return {value: _tag(pk, value) for value, pk in ids.items()}
+
+
+def forget_tag(pk):
+  # the old value of a renamed tag isn't known any more
+  _ids.delete_value(pk)
+
+
+def clear():
+  _ids.clear()
@@ -19,7 +19,10 @@ from django.contrib.auth import get_user_model
 from django import template   # Step1: import django template
 
 
-from blog.models import Post
+from blog import feed
+from blog.caching import FRAGMENT_KEY_PREFIX, get_or_compute
+from blog.renditions import FALLBACK_FORMAT, RESPONSIVE_FORMATS, srcset
+from django.core.cache.utils import make_template_fragment_key
 
 import logging
 
@@ -162,8 +165,71 @@ registration.
 
 @register.inclusion_tag("blog/post-list.html")
 def recent_posts(post):
-  posts = Post.objects.exclude(pk=post.pk)[:5]  # get last 5 after exclusion as they will be latest
- 
-  # to test template caching
+  # the latest published posts other than this one, read from the feed
+  # maintained by blog.feed
+  posts = feed.latest(exclude=post.pk)
   logger.debug("Loaded %d recent posts for post %d", len(posts), post.pk)
   return {"title": "Recent posts", "posts":posts}
+
+
+
+# <picture> for the responsive variants of a hero image (see blog.renditions),
+# or a plain <img> of the upload until they've been rendered
+@register.inclusion_tag("blog/hero-picture.html")
+def hero_picture(post, sizes="100vw", css_class="img-fluid"):
+  manifest = post.hero_image_renditions
+  sources = [
+    {"type": RESPONSIVE_FORMATS[format_name]["content_type"], "srcset": srcset(manifest, format_name)}
+    for format_name in manifest.get("sources", {})
+    if format_name != FALLBACK_FORMAT
+  ]
+  return {
+    "post": post,
+    "manifest": manifest,
+    "sources": sources,
+    "fallback_srcset": srcset(manifest, FALLBACK_FORMAT),
+    "sizes": sizes,
+    "css_class": css_class,
+  }
+
+
+"""
+stampede_cache works like the built in cache tag:
+{% stampede_cache 3600 fragment_name [var1 var2 ...] %} ... {% endstampede_cache %}
+but when the fragment expires only one worker re-renders it while the others
+keep serving the previous copy (see blog.caching.get_or_compute).
+"""
+
+class StampedeCacheNode(template.Node):
+  def __init__(self, nodelist, timeout_var, fragment_name, vary_on):
+    self.nodelist = nodelist
+    self.timeout_var = timeout_var
+    self.fragment_name = fragment_name
+    self.vary_on = vary_on
+
+  def render(self, context):
+    try:
+      timeout = int(self.timeout_var.resolve(context))
+    except (ValueError, TypeError):
+      raise template.TemplateSyntaxError(f"stampede_cache tag got a non-integer timeout value: {self.timeout_var.var!r}")
+
+    vary_on = [var.resolve(context) for var in self.vary_on]
+    key = FRAGMENT_KEY_PREFIX + make_template_fragment_key(self.fragment_name, vary_on)
+    return get_or_compute(key, lambda: self.nodelist.render(context), timeout)
+
+
+@register.tag("stampede_cache")
+def do_stampede_cache(parser, token):
+  nodelist = parser.parse(("endstampede_cache",))
+  parser.delete_first_token()
+
+  tokens = token.split_contents()
+  if len(tokens) < 3:
+    raise template.TemplateSyntaxError(f"'{tokens[0]}' tag requires at least 2 arguments.")
+
+  return StampedeCacheNode(
+    nodelist,
+    parser.compile_filter(tokens[1]),
+    tokens[2],
+    [parser.compile_filter(t) for t in tokens[3:]],
+  )
@@ -0,0 +1,85 @@
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.utils import timezone
+
+from blango.testing import CacheTestCase
+from blog.api.pagination import SelectablePagination
+from blog.api.views import PostViewSet
+from blog.models import Post, Tag
+
+
+class AsyncViewTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.tag = Tag.objects.create(value="django")
+    self.post = Post.objects.create(
+      author=self.u1,
+      published_at=timezone.now(),
+      title="Post1 title",
+      slug="post-1-slug",
+      summary="Post1 summary",
+      content="Post1 content",
+    )
+    self.post.tags.add(self.tag)
+    self.async_client = AsyncClient()
+
+  async def test_same_responses_as_sync_views(self):
+    for sync_path, async_path in [
+      ("/api/v1/posts/", "/api/v1/async/posts/"),
+      (f"/api/v1/posts/{self.post.pk}/", f"/api/v1/async/posts/{self.post.pk}/"),
+      ("/api/v1/tags/", "/api/v1/async/tags/"),
+      (f"/api/v1/tags/{self.tag.pk}/posts/", f"/api/v1/async/tags/{self.tag.pk}/posts/"),
+    ]:
+      cache.clear()
+      resp = await self.async_client.get(async_path)
+      self.assertEqual(resp.status_code, 200)
+      self.assertEqual(resp.json(), (await self.async_client.get(sync_path)).json())
+
+  async def test_html_pages(self):
+    resp = await self.async_client.get("/async/")
+    self.assertContains(resp, "Post1 title")
+    resp = await self.async_client.get("/async/post/post-1-slug/")
+    self.assertContains(resp, "Post1 content")
+
+  async def test_shares_cached_responses_with_sync_views(self):
+    # built by the sync view, answered by the async one without entering it
+    await self.async_client.get("/api/v1/posts/")
+    with mock.patch.object(PostViewSet, "list", side_effect=AssertionError):
+      resp = await self.async_client.get("/api/v1/async/posts/")
+    self.assertEqual(resp.json()["results"][0]["title"], "Post1 title")
+
+    # and the other way round
+    cache.clear()
+    await self.async_client.get(f"/api/v1/async/posts/{self.post.pk}/?format=json")
+    with mock.patch.object(PostViewSet, "get_serializer", side_effect=AssertionError):
+      resp = await self.async_client.get(f"/api/v1/posts/{self.post.pk}/?format=json")
+    self.assertEqual(resp.json()["title"], "Post1 title")
+
+  async def test_export(self):
+    # the ASGI handler iterates the response on the event loop
+    resp = await self.async_client.get("/api/v1/posts/export/")
+    self.assertEqual(resp.status_code, 200)
+    lines = b"".join(resp.streaming_content).decode().splitlines()
+    self.assertEqual([json.loads(line)["title"] for line in lines], ["Post1 title"])
+
+  @mock.patch.object(SelectablePagination, "page_size", 1)
+  async def test_shared_responses_link_to_sync_views(self):
+    await sync_to_async(Post.objects.create)(
+      author=self.u1, published_at=timezone.now(), title="Post2 title", slug="post-2-slug", summary="", content=""
+    )
+    for warm, path in [("/api/v1/async/posts/", "/api/v1/posts/"), ("/api/v1/posts/", "/api/v1/async/posts/")]:
+      cache.clear()
+      for page, link in [(1, "next"), (2, "previous")]:
+        await self.async_client.get(f"{warm}?page={page}")
+        data = (await self.async_client.get(f"{path}?page={page}")).json()
+        self.assertTrue(data[link].startswith("http://testserver/api/v1/posts/"), data[link])
+
+  async def test_missing_objects(self):
+    resp = await self.async_client.get("/api/v1/async/posts/0/")
+    self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,12 @@
+from blango.testing import CacheTestCase
+from blog.benchmarks import run_benchmarks, seed
+
+
+class QueryBudgetTestCase(CacheTestCase):
+  def test_routes_within_query_budget(self):
+    # the full 1k/10k/100k runs are done by the benchmark command, this keeps
+    # the budgets enforced on every test run
+    for size in (60, 120):
+      seed(size)
+      for result in run_benchmarks(size, iterations=1):
+        self.assertTrue(result["ok"], f"{result['route']} made {result['queries']} queries, budget is {result['budget']}")
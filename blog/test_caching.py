@@ -0,0 +1,238 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from blango.testing import CacheSimpleTestCase, CacheTestCase
+from blog import caching
+from blog.models import AuthorProfile, Comment, Post, Tag
+
+
+class VersionedCacheTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.tag = Tag.objects.create(value="django")
+    self.post = Post.objects.create(
+      author=self.u1,
+      published_at=timezone.now(),
+      title="Post1 title",
+      slug="post-1-slug",
+      summary="Post1 summary",
+      content="Post1 content",
+    )
+    self.post.tags.add(self.tag)
+
+    self.client = APIClient()
+    token = Token.objects.create(user=self.u1)
+    self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+  def test_post_list_served_from_cache_until_edit(self):
+    self.client.get("/api/v1/posts/")
+    versions = caching.get_versions(["posts"])
+
+    resp = self.client.get("/api/v1/posts/")
+    self.assertEqual(resp.json()["results"][0]["title"], "Post1 title")
+
+    self.post.title = "Edited title"
+    self.post.save()
+    self.assertNotEqual(caching.get_versions(["posts"]), versions)
+
+    resp = self.client.get("/api/v1/posts/")
+    self.assertEqual(resp.json()["results"][0]["title"], "Edited title")
+
+  def test_tag_change_invalidates_post_list(self):
+    self.client.get("/api/v1/posts/")
+    self.post.tags.add(Tag.objects.create(value="python"))
+
+    resp = self.client.get("/api/v1/posts/")
+    self.assertEqual(set(resp.json()["results"][0]["tags"]), {"django", "python"})
+
+  def test_targeted_scopes(self):
+    author_versions = caching.get_versions([f"author:{self.u1.pk}"])
+    other_tag = Tag.objects.create(value="other")
+    other_versions = caching.get_versions([f"tag:{other_tag.pk}"])
+
+    list_versions = caching.get_versions(["posts", "posts-by-time", "tags", "users"])
+    Comment.objects.create(creator=self.u1, content="Comment", content_object=self.post)
+    self.assertEqual(caching.get_versions([f"author:{self.u1.pk}"]), author_versions)
+    # a comment leaves the lists that aren't ordered by the comment counts alone
+    self.assertEqual(caching.get_versions(["posts", "posts-by-time", "tags", "users"]), list_versions)
+
+    self.post.save()
+    self.assertNotEqual(caching.get_versions([f"author:{self.u1.pk}"]), author_versions)
+    self.assertEqual(caching.get_versions([f"tag:{other_tag.pk}"]), other_versions)
+
+  def test_comment_invalidates_post_detail(self):
+    resp = self.client.get(f"/api/v1/posts/{self.post.pk}/")
+    self.assertEqual(resp.json()["comments"], [])
+
+    Comment.objects.create(creator=self.u1, content="Comment", content_object=self.post)
+    resp = self.client.get(f"/api/v1/posts/{self.post.pk}/")
+    self.assertEqual(len(resp.json()["comments"]), 1)
+
+  @override_settings(ALLOWED_HOSTS=["one.example", "two.example"])
+  def test_keyed_on_host_and_scheme(self):
+    # the responses link to the author with absolute URLs
+    resp = self.client.get("/api/v1/posts/", HTTP_HOST="one.example")
+    self.assertTrue(resp.json()["results"][0]["author"].startswith("http://one.example/"))
+    resp = self.client.get("/api/v1/posts/", HTTP_HOST="two.example")
+    self.assertTrue(resp.json()["results"][0]["author"].startswith("http://two.example/"))
+    resp = self.client.get("/api/v1/posts/", HTTP_HOST="two.example", secure=True)
+    self.assertTrue(resp.json()["results"][0]["author"].startswith("https://two.example/"))
+
+
+class PostPageCacheTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = get_user_model().objects.create_user(
+      email="author@example.com", password="password", first_name="Ada", last_name="Author"
+    )
+    self.reader = get_user_model().objects.create_user(email="reader@example.com", password="password")
+    self.profile = AuthorProfile.objects.create(user=self.author, bio="Writes posts")
+    self.post = Post.objects.create(
+      author=self.author,
+      published_at=timezone.now(),
+      title="Post1 title",
+      slug="post-1-slug",
+      summary="Post1 summary",
+      content="Post1 content",
+    )
+
+  def test_page_shared_by_visitors(self):
+    resp = self.client.get("/post/post-1-slug/")
+    self.assertContains(resp, "Ada Author")
+    self.assertContains(resp, "Writes posts")
+    self.assertNotContains(resp, "Add Comment")
+
+    # the post, its comments and the author's profile come from the cache
+    self.client.force_login(self.reader)
+    with self.assertNumQueries(3):
+      # session, user and post
+      resp = self.client.get("/post/post-1-slug/")
+    self.assertContains(resp, "Post1 content")
+    self.assertContains(resp, "Ada Author")
+    self.assertContains(resp, "Add Comment")
+
+    self.client.force_login(self.author)
+    resp = self.client.get("/post/post-1-slug/")
+    self.assertContains(resp, "<strong>me</strong>")
+    self.assertNotContains(resp, "Ada Author")
+
+  def test_page_invalidation(self):
+    self.client.get("/post/post-1-slug/")
+
+    Comment.objects.create(creator=self.reader, content="First comment", content_object=self.post)
+    resp = self.client.get("/post/post-1-slug/")
+    self.assertContains(resp, "Comments (1)")
+    self.assertContains(resp, "First comment")
+
+    self.profile.bio = "Writes better posts"
+    self.profile.save()
+    self.assertContains(self.client.get("/post/post-1-slug/"), "Writes better posts")
+
+    self.author.first_name = "Grace"
+    self.author.save()
+    self.assertContains(self.client.get("/post/post-1-slug/"), "Grace Author")
+
+    self.post.content = "Edited content"
+    self.post.save()
+    self.assertContains(self.client.get("/post/post-1-slug/"), "Edited content")
+
+
+class StampedeProtectionTestCase(CacheSimpleTestCase):
+  def setUp(self):
+    super().setUp()
+    self.key = f"test:{self.id()}"
+
+  def test_single_flight_on_cold_key(self):
+    calls = []
+
+    def compute():
+      calls.append(1)
+      time.sleep(0.2)
+      return "value"
+
+    threads = [threading.Thread(target=caching.get_or_compute, args=(self.key, compute, 60)) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(len(calls), 1)
+    self.assertEqual(caching.get_or_compute(self.key, compute, 60), "value")
+
+  def test_stale_value_served_during_rebuild(self):
+    caching.store_entry(self.key, "old", 60, 0)
+    entry = cache.get(self.key)
+    entry.expires_at = time.time() - 1
+    cache.set(self.key, entry, 60)
+
+    # another worker holds the lease, so the stale copy is served
+    self.assertTrue(caching.acquire_lease(self.key))
+    self.assertEqual(caching.get_or_compute(self.key, lambda: "new", 60), "old")
+
+    caching.release_lease(self.key)
+    self.assertEqual(caching.get_or_compute(self.key, lambda: "new", 60), "new")
+
+  def test_rebuild_finished_before_the_lease(self):
+    calls = []
+
+    @caching.cached_response(60)
+    def view(request):
+      calls.append(1)
+      return HttpResponse("new")
+
+    request = RequestFactory().get("/rebuilt/")
+    key = caching.response_cache_key(request, ())
+
+    # the previous lease holder stores the response between the first read and
+    # the lease being taken
+    rebuilt = {key: HttpResponse("rebuilt"), self.key: "rebuilt"}
+    acquire_lease = caching.acquire_lease
+
+    def rebuilt_then_acquire(key):
+      caching.store_entry(key, rebuilt[key], 60, 0)
+      return acquire_lease(key)
+
+    with mock.patch.object(caching, "acquire_lease", side_effect=rebuilt_then_acquire):
+      self.assertEqual(view(request).content, b"rebuilt")
+      self.assertEqual(caching.get_or_compute(self.key, lambda: calls.append(1), 60), "rebuilt")
+    self.assertEqual(calls, [])
+    # and the leases were given back
+    self.assertTrue(caching.acquire_lease(key))
+    self.assertTrue(caching.acquire_lease(self.key))
+
+  def test_probabilistic_early_expiration(self):
+    entry = caching.Entry("value", 60, 0.001)
+    self.assertTrue(entry.is_fresh())
+
+    # an expensive value close to expiry is nearly always refreshed early
+    entry = caching.Entry("value", 1, 100)
+    refreshes = sum(not entry.is_fresh() for i in range(100))
+    self.assertGreater(refreshes, 90)
+
+  def test_stampede_cache_tag(self):
+    renders = []
+    template = Template(
+      "{% load blog_extras %}{% stampede_cache 60 fragment name %}{{ render }} {{ name }}{% endstampede_cache %}"
+    )
+
+    def render():
+      renders.append(1)
+      return len(renders)
+
+    self.assertEqual(template.render(Context({"render": render, "name": "a"})), "1 a")
+    # the second render is a cache hit, other vary_on values get their own copy
+    self.assertEqual(template.render(Context({"render": render, "name": "a"})), "1 a")
+    self.assertEqual(template.render(Context({"render": render, "name": "b"})), "2 b")
+    self.assertEqual(len(renders), 2)
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog import counters
+from blog.api.serializers import COMMENT_PREVIEW_SIZE
+from blog.models import Comment, Post
+
+
+class CommentIndexTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.posts = [
+      Post.objects.create(
+        author=self.user,
+        published_at=timezone.now(),
+        title=f"Post{i} title",
+        slug=f"post-{i}-slug",
+        summary=f"Post{i} summary",
+        content=f"Post{i} content",
+      )
+      for i in range(3)
+    ]
+    # a popular thread among a few quiet ones, and comments on a user
+    post_type = ContentType.objects.get_for_model(Post)
+    user_type = ContentType.objects.get_for_model(self.user)
+    Comment.objects.bulk_create(
+      [Comment(creator=self.user, content="Popular", content_type=post_type, object_id=self.posts[0].pk)] * 2000
+      + [Comment(creator=self.user, content="Quiet", content_type=post_type, object_id=post.pk) for post in self.posts[1:]]
+      + [Comment(creator=self.user, content="On a user", content_type=user_type, object_id=self.posts[0].pk)] * 200,
+      batch_size=500,
+    )
+    with connection.cursor() as cursor:
+      cursor.execute("ANALYZE")
+
+  def plan(self, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+      cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+      return " ".join(row[-1] for row in cursor.fetchall())
+
+  def test_thread_queries_use_the_index(self):
+    if connection.vendor != "sqlite":
+      self.skipTest("EXPLAIN QUERY PLAN is SQLite's")
+
+    post_type = ContentType.objects.get_for_model(Post)
+    post = self.posts[0]
+    queries = {
+      "thread": post.comments.all(),
+      "latest": post.comments.order_by("-created_at")[:5],
+      # what prefetch_related("comments") runs for a page of posts
+      "prefetch": Comment.objects.filter(content_type=post_type, object_id__in=[p.pk for p in self.posts]),
+      "count": post.comments.order_by().values("pk"),
+    }
+    for name, queryset in queries.items():
+      plan = self.plan(queryset)
+      self.assertIn("INDEX blog_comment_thread", plan, name)
+      # comments of several posts are merged by created_at, one thread is
+      # read in order
+      if name != "prefetch":
+        self.assertNotIn("TEMP B-TREE", plan, name)
+
+    self.assertIn("COVERING INDEX blog_comment_thread", self.plan(queries["count"]))
+    self.assertEqual(len(post.comments.all()), 2000)
+
+  def test_ordering(self):
+    comments = list(self.posts[1].comments.all()) + [
+      Comment.objects.create(creator=self.user, content="Newer", content_object=self.posts[1])
+    ]
+    self.assertEqual(list(self.posts[1].comments.all()), comments)
+    self.assertEqual(
+      [c.content for c in Post.objects.prefetch_related(Prefetch("comments")).get(pk=self.posts[1].pk).comments.all()],
+      ["Quiet", "Newer"],
+    )
+    self.assertEqual(counters.reconcile(), 3)
+
+
+class CommentThreadTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.post = Post.objects.create(
+      author=self.user,
+      published_at=timezone.now(),
+      title="Post title",
+      slug="post-slug",
+      summary="Post summary",
+      content="Post content",
+    )
+    self.comments = [
+      Comment.objects.create(creator=self.user, content=f"Comment {i}", content_object=self.post) for i in range(25)
+    ]
+    self.client = APIClient()
+
+  def test_api_comment_pages(self):
+    data = self.client.get(f"/api/v1/posts/{self.post.pk}/").json()
+    self.assertEqual([c["content"] for c in data["comments"]], [f"Comment {i}" for i in range(COMMENT_PREVIEW_SIZE)])
+    self.assertEqual(data["comment_count"], 25)
+    self.assertTrue(data["comments_url"].endswith(f"/api/v1/posts/{self.post.pk}/comments/"))
+
+    contents = []
+    url = data["comments_url"]
+    while url:
+      page = self.client.get(url).json()
+      contents += [c["content"] for c in page["results"]]
+      url = page["next"]
+    self.assertEqual(contents, [f"Comment {i}" for i in range(25)])
+
+    # the first page is cached until a comment is added
+    Comment.objects.create(creator=self.user, content="Comment 25", content_object=self.post)
+    Comment.objects.filter(content="Comment 0").delete()
+    first = self.client.get(data["comments_url"]).json()["results"][0]
+    self.assertEqual(first["content"], "Comment 1")
+
+    self.assertEqual(self.client.get("/api/v1/posts/0/comments/").status_code, 404)
+
+  def test_html_comment_pages(self):
+    resp = self.client.get("/post/post-slug/")
+    self.assertContains(resp, "Comments (25)")
+    self.assertContains(resp, "Comment 19</p>")
+    self.assertNotContains(resp, "Comment 20</p>")
+    more = resp.context["next_cursor"]
+
+    resp = self.client.get("/post/post-slug/comments/", {"cursor": more})
+    self.assertContains(resp, "Comment 20</p>")
+    self.assertContains(resp, "Comment 24</p>")
+    self.assertNotContains(resp, "Comment 19</p>")
+    self.assertNotContains(resp, "Load more comments")
+    self.assertNotContains(resp, "<html")
+
+    self.assertEqual(self.client.get("/post/post-slug/comments/", {"cursor": "garbage"}).status_code, 404)
@@ -0,0 +1,118 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog import caching
+from blog.api.conditional import make_etag
+from blog.api.visibility import api_request
+from blog.models import Comment, Post, Tag
+
+
+class ConditionalGetTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.post = Post.objects.create(
+      author=self.u1,
+      published_at=timezone.now(),
+      title="Post1 title",
+      slug="post-1-slug",
+      summary="Post1 summary",
+      content="Post1 content",
+    )
+    self.tag = Tag.objects.create(value="django")
+
+    self.client = APIClient()
+    token = Token.objects.create(user=self.u1)
+    self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+  def assertRevalidates(self, url):
+    resp = self.client.get(url)
+    self.assertEqual(resp.status_code, 200)
+    etag = resp["ETag"]
+
+    resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(resp.status_code, 304)
+    return etag
+
+  def test_post_list(self):
+    etag = self.assertRevalidates("/api/v1/posts/")
+
+    self.post.title = "Edited title"
+    self.post.save()
+    resp = self.client.get("/api/v1/posts/", HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(resp.json()["results"][0]["title"], "Edited title")
+
+  def test_etag_shared_by_visibility_class(self):
+    reader = get_user_model().objects.create_user(email="reader@example.com", password="password")
+    staff = get_user_model().objects.create_user(email="staff@example.com", password="password", is_staff=True)
+
+    def etag(user):
+      token = Token.objects.get_or_create(user=user)[0]
+      request = RequestFactory().get("/api/v1/posts/", HTTP_AUTHORIZATION="Token " + token.key)
+      return make_etag(api_request(request), [1])
+
+    # the users of a class share the cached responses, and so their validators
+    self.assertEqual(etag(self.u1), etag(reader))
+    self.assertNotEqual(etag(reader), etag(staff))
+
+  def test_post_list_has_no_last_modified(self):
+    resp = self.client.get("/api/v1/posts/")
+    self.assertNotIn("Last-Modified", resp)
+
+    # neither change moves the latest modified_at of the listed posts, so a
+    # date can't tell the client the list changed
+    since = http_date(time.time() + 60)
+    self.post.tags.add(self.tag)
+    resp = self.client.get("/api/v1/posts/", HTTP_IF_MODIFIED_SINCE=since)
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(len(resp.json()["results"][0]["tags"]), 1)
+
+    self.post.delete()
+    resp = self.client.get("/api/v1/posts/", HTTP_IF_MODIFIED_SINCE=since)
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(resp.json()["results"], [])
+
+  def test_post_detail_tracks_comments(self):
+    url = f"/api/v1/posts/{self.post.pk}/"
+    etag = self.assertRevalidates(url)
+
+    Comment.objects.create(creator=self.u1, content="Comment", content_object=self.post)
+    resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(len(resp.json()["comments"]), 1)
+
+  def test_tags_and_users(self):
+    self.assertRevalidates("/api/v1/tags/")
+    etag = self.assertRevalidates(f"/api/v1/tags/{self.tag.pk}/")
+    self.assertRevalidates("/api/v1/users/test@example.com")
+
+    self.tag.value = "python"
+    self.tag.save()
+    resp = self.client.get(f"/api/v1/tags/{self.tag.pk}/", HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(resp.status_code, 200)
+
+  def test_not_modified_skips_serialization(self):
+    resp = self.client.get("/api/v1/posts/")
+
+    # a bump of a scope the list fingerprint doesn't include misses the
+    # response cache but keeps the same ETag
+    caching.bump("posts")
+    with CaptureQueriesContext(connection) as ctx:
+      resp = self.client.get("/api/v1/posts/", HTTP_IF_NONE_MATCH=resp["ETag"])
+    self.assertEqual(resp.status_code, 304)
+
+    # only the fingerprint aggregate touches the post table
+    post_queries = [q["sql"] for q in ctx.captured_queries if '"blog_post"' in q["sql"]]
+    self.assertEqual(len(post_queries), 1)
+    self.assertIn("MAX(", post_queries[0])
@@ -0,0 +1,110 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog import counters
+from blog.api.bulk import create_comments
+from blog.api.views import PostViewSet
+from blog.models import Comment, Post
+
+
+class CommentCounterTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.posts = [
+      Post.objects.create(
+        author=self.u1,
+        published_at=timezone.now(),
+        title=f"Post{i} title",
+        slug=f"post-{i}-slug",
+        summary=f"Post{i} summary",
+        content=f"Post{i} content",
+      )
+      for i in range(2)
+    ]
+    self.client = APIClient()
+
+  def comment(self, post, content="A comment"):
+    return Comment.objects.create(creator=self.u1, content=content, content_object=post)
+
+  def test_counts_follow_comments(self):
+    post = self.posts[0]
+    first = self.comment(post)
+    second = self.comment(post)
+    post.refresh_from_db()
+    self.assertEqual(post.comment_count, 2)
+    self.assertEqual(post.last_activity_at, second.created_at)
+
+    second.delete()
+    post.refresh_from_db()
+    self.assertEqual(post.comment_count, 1)
+    self.assertEqual(post.last_activity_at, first.created_at)
+
+    first.delete()
+    post.refresh_from_db()
+    self.assertEqual((post.comment_count, post.last_activity_at), (0, None))
+
+    comments = create_comments(post, self.u1, [{"content": "One"}, {"content": "Two"}])
+    post.refresh_from_db()
+    self.assertEqual(post.comment_count, 2)
+    self.assertEqual(post.last_activity_at, max(c.created_at for c in comments))
+
+  def test_saving_a_stale_post_keeps_the_counts(self):
+    stale = Post.objects.get(pk=self.posts[0].pk)
+    self.comment(self.posts[0])
+    stale.title = "Edited"
+    stale.save()
+    stale.refresh_from_db()
+    self.assertEqual(stale.comment_count, 1)
+
+  def test_copy_and_save_deleted_post(self):
+    post = Post.objects.get(pk=self.posts[0].pk)
+    post.pk = None
+    post.slug = "post-copy-slug"
+    post.save()
+    self.assertNotEqual(post.pk, self.posts[0].pk)
+    self.assertEqual(Post.objects.get(pk=post.pk).title, "Post0 title")
+
+    post.delete()
+    post.title = "Saved again"
+    post.save()
+    self.assertEqual(Post.objects.get(pk=post.pk).title, "Saved again")
+
+    self.posts[1].save(force_update=True)
+
+  def test_reconcile(self):
+    self.comment(self.posts[0])
+    # written without signals
+    Comment.objects.bulk_create([
+      Comment(creator=self.u1, content="Imported", content_type=ContentType.objects.get_for_model(Post), object_id=self.posts[1].pk)
+    ])
+    Post.objects.filter(pk=self.posts[0].pk).update(comment_count=5)
+
+    call_command("reconcile_comment_counts", batch_size=1, stdout=StringIO())
+    self.assertEqual(
+      list(Post.objects.order_by("pk").values_list("comment_count", flat=True)), [1, 1]
+    )
+    self.assertIsNotNone(Post.objects.get(pk=self.posts[1].pk).last_activity_at)
+    self.assertEqual(counters.reconcile(), 2)
+
+  def test_most_discussed(self):
+    resp = self.client.get("/api/v1/posts/", {"ordering": "-comment_count"})
+    self.assertEqual([p["comment_count"] for p in resp.json()["results"]], [0, 0])
+    self.client.get("/api/v1/posts/")
+
+    # the cached list is invalidated by the new comment, other lists are not
+    self.comment(self.posts[1])
+    with mock.patch.object(PostViewSet, "get_serializer", side_effect=AssertionError):
+      self.assertEqual(self.client.get("/api/v1/posts/").status_code, 200)
+    resp = self.client.get("/api/v1/posts/", {"ordering": "-comment_count"})
+    self.assertEqual([p["slug"] for p in resp.json()["results"]], ["post-1-slug", "post-0-slug"])
+    self.assertEqual(resp.json()["results"][0]["comment_count"], 1)
+    self.assertIsNotNone(resp.json()["results"][0]["last_activity_at"])
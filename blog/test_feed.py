@@ -0,0 +1,78 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from blango.testing import CacheTestCase
+from blog import feed
+from blog.models import Post
+
+
+class FeedTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    now = timezone.now()
+    # created oldest first but published newest first, so the default
+    # created_at ordering gets them the wrong way round
+    self.posts = [self.create(i, now - timedelta(hours=i)) for i in range(7)]
+
+  def create(self, i, published_at):
+    return Post.objects.create(
+      author=self.user,
+      published_at=published_at,
+      title=f"Post{i} title",
+      slug=f"post-{i}-slug",
+      summary=f"Post{i} summary",
+      content=f"Post{i} content",
+    )
+
+  def titles(self, **kwargs):
+    return [post["title"] for post in feed.latest(**kwargs)]
+
+  def test_latest_published(self):
+    self.assertEqual(self.titles(), [f"Post{i} title" for i in range(5)])
+    self.assertEqual(self.titles(exclude=self.posts[0].pk), [f"Post{i} title" for i in range(1, 6)])
+
+    # read from the cache
+    with self.assertNumQueries(0):
+      self.titles()
+
+  def test_refreshed_on_publish_and_unpublish(self):
+    self.titles()
+
+    draft = self.create("New", timezone.now() + timedelta(days=1))
+    self.assertNotIn("PostNew title", self.titles())
+
+    draft.published_at = timezone.now()
+    draft.save()
+    self.assertEqual(self.titles()[0], "PostNew title")
+
+    draft.published_at = None
+    draft.save()
+    self.assertNotIn("PostNew title", self.titles())
+
+    self.posts[0].delete()
+    self.assertEqual(self.titles()[0], "Post1 title")
+
+  def test_scheduled_post_appears_when_published(self):
+    self.create("Scheduled", timezone.now() + timedelta(seconds=1))
+    self.assertNotIn("PostScheduled title", self.titles())
+
+    # the entry expires when the scheduled post is published
+    entry = cache.get(feed.FEED_KEY)
+    self.assertLess(entry.expires_at, time.time() + 3)
+
+  def test_recent_posts_on_post_page(self):
+    resp = self.client.get("/post/post-0-slug/")
+    self.assertEqual(
+      [post["title"] for post in resp.context["posts"]], [f"Post{i} title" for i in range(1, 6)]
+    )
+
+    # a different post doesn't get the first one's list
+    resp = self.client.get("/post/post-1-slug/")
+    self.assertEqual(
+      [post["title"] for post in resp.context["posts"]], ["Post0 title"] + [f"Post{i} title" for i in range(2, 6)]
+    )
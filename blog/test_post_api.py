@@ -1,7 +1,10 @@
+import json
 from datetime import datetime
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from pytz import UTC
@@ -9,11 +12,15 @@ from pytz import UTC
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
-from blog.models import Post
+from blango.testing import CacheTestCase
+from blog import caching, tag_resolver
+from blog.api.pagination import PostCursorPagination
+from blog.models import Post, Tag
 
 
-class PostApiTestCase(TestCase):
+class PostApiTestCase(CacheTestCase):
   def setUp(self):
+    super().setUp()
     self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
     
     self.u2 = get_user_model().objects.create_user(email="test2@example.com", password="password2")
@@ -58,6 +65,8 @@ class PostApiTestCase(TestCase):
       self.assertEqual(post_obj.slug, post_dict["slug"])
       self.assertEqual(post_obj.summary, post_dict["summary"])
       self.assertEqual(post_obj.content, post_dict["content"])
+      self.assertEqual(post_dict["word_count"], 2)
+      self.assertEqual(post_dict["reading_time"], 1)
 
       self.assertTrue(post_dict["author"].endswith(f"/api/v1/users/{post_obj.author.email}"))
       self.assertEqual(
@@ -105,4 +114,195 @@ class PostApiTestCase(TestCase):
     self.assertEqual(post.content, post_dict["content"])
     self.assertEqual(post.author, self.u1)
     self.assertEqual(post.published_at, datetime(2021, 1, 10, 9, 0, 0, tzinfo=UTC))
-    
\ No newline at end of file
+    
+
+  def test_post_export(self):
+    resp = self.client.get("/api/v1/posts/export/", {"chunk_size": 1})
+    self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+    # the posts are read while the response is sent
+    with CaptureQueriesContext(connection) as ctx:
+      lines = b"".join(resp.streaming_content).decode().splitlines()
+    self.assertGreater(len(ctx.captured_queries), 1)
+    exported = [json.loads(line) for line in lines]
+    self.assertEqual([p["id"] for p in exported], sorted(self.post_lookup))
+    self.assertEqual(exported[0]["title"], "Post1 title")
+
+    resp = self.client.get("/api/v1/posts/export/", {"export_format": "json", "author": self.u2.pk})
+    exported = json.loads(b"".join(resp.streaming_content))
+    self.assertEqual([p["slug"] for p in exported], ["post-2-title"])
+
+    resp = self.client.get("/api/v1/posts/export/", {"export_format": "xml"})
+    self.assertEqual(resp.status_code, 400)
+
+
+  @mock.patch.object(PostCursorPagination, "page_size", 1)
+  def test_post_list_cursor_pagination(self):
+    with CaptureQueriesContext(connection) as ctx:
+      resp = self.client.get("/api/v1/posts/", {"pagination": "cursor", "ordering": "title"})
+    # neither the page nor its validators count the posts
+    self.assertFalse([q["sql"] for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+    etag = resp["ETag"]
+    data = resp.json()
+    self.assertNotIn("count", data)
+    self.assertEqual([p["title"] for p in data["results"]], ["Post1 title"])
+
+    # the next link carries the cursor and the ordering
+    data = self.client.get(data["next"]).json()
+    self.assertEqual([p["title"] for p in data["results"]], ["Post2 Title"])
+    self.assertIsNone(data["next"])
+
+    # nullable fields order the pages while no row holds a NULL
+    data = self.client.get("/api/v1/posts/", {"pagination": "cursor", "ordering": "published_at"}).json()
+    self.assertEqual([p["title"] for p in data["results"]], ["Post1 title"])
+    data = self.client.get(data["next"]).json()
+    self.assertEqual([p["title"] for p in data["results"]], ["Post2 Title"])
+
+    data = self.client.get("/api/v1/posts/", {"pagination": "cursor", "ordering": "author"}).json()
+    data = self.client.get(data["next"]).json()
+    self.assertEqual([p["title"] for p in data["results"]], ["Post2 Title"])
+
+    resp = self.client.get("/api/v1/posts/", {"cursor": "garbage"})
+    self.assertEqual(resp.status_code, 404)
+
+    # the validators of a page follow its rows; bumping "posts" only makes the
+    # cached response unreachable
+    params = {"pagination": "cursor", "ordering": "title"}
+    caching.bump("posts")
+    self.assertEqual(self.client.get("/api/v1/posts/", params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+    Post.objects.filter(title="Post1 title").update(modified_at=timezone.now())
+    caching.bump("posts")
+    self.assertEqual(self.client.get("/api/v1/posts/", params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    with CaptureQueriesContext(connection) as ctx:
+      resp = self.client.get("/api/v1/posts/by-time/week/", params)
+    self.assertEqual(resp.status_code, 200)
+    self.assertFalse([q["sql"] for q in ctx.captured_queries if "COUNT(" in q["sql"]])
+
+    # nullable fields are refused once a row holds a NULL, here a draft only its author sees
+    Post.objects.create(author=self.u1, title="Draft", slug="draft", summary="Draft", content="Draft")
+    resp = self.client.get("/api/v1/posts/", {"pagination": "cursor", "ordering": "-published_at"})
+    self.assertEqual(resp.status_code, 400)
+    self.assertIn("ordering", resp.json())
+    resp = self.client.get("/api/v1/posts/", {"pagination": "cursor", "ordering": "-last_activity_at"})
+    self.assertEqual(resp.status_code, 400)
+
+
+  def test_author_filters(self):
+    def slugs(**params):
+      return sorted(p["slug"] for p in self.client.get("/api/v1/posts/", params).json()["results"])
+
+    self.assertEqual(slugs(author_email="TEST@example.com"), ["post-1-slug"])
+    self.assertEqual(slugs(author_email="nobody@example.com"), [])
+    self.assertEqual(slugs(author_email_prefix="test2"), ["post-2-title"])
+    self.assertEqual(slugs(author_email_prefix="TEST"), ["post-1-slug", "post-2-title"])
+    self.assertEqual(slugs(author_domain="Example.com"), ["post-1-slug", "post-2-title"])
+    self.assertEqual(slugs(author_domain="example.org"), [])
+
+
+  def test_user_detail(self):
+    resp = self.client.get("/api/v1/users/TEST2@example.com")
+    self.assertEqual(resp.status_code, 200)
+    self.assertEqual(resp.json()["email"], "test2@example.com")
+
+    self.u2.email = "renamed@example.com"
+    self.u2.save()
+    self.assertEqual(self.client.get("/api/v1/users/test2@example.com").status_code, 404)
+    self.assertEqual(self.client.get("/api/v1/users/renamed@example.com").status_code, 200)
+
+
+  def test_bulk_create(self):
+    def posts(count, start=0):
+      return [{
+        "title": f"Bulk post {i}",
+        "slug": f"bulk-post-{i}",
+        "summary": "Bulk summary",
+        "content": "Bulk content",
+        "author": "http://testserver/api/v1/users/test2@example.com",
+        "published_at": "2021-01-10T09:00:00Z",
+        "tags": ["Django", f"tag-{i % 3}"],
+      } for i in range(start, start + count)]
+
+    with CaptureQueriesContext(connection) as small:
+      self.client.post("/api/v1/posts/bulk/", posts(3), format="json")
+    with CaptureQueriesContext(connection) as large:
+      resp = self.client.post("/api/v1/posts/bulk/", posts(60, start=3), format="json")
+    self.assertEqual(resp.status_code, 201)
+    self.assertEqual(resp.json()["count"], 60)
+    # tags, slugs and rows are each handled in one go whatever the size
+    self.assertLessEqual(len(large.captured_queries), len(small.captured_queries))
+
+    post = Post.objects.get(pk=resp.json()["ids"][0])
+    self.assertEqual(post.slug, "bulk-post-3")
+    self.assertEqual(post.author, self.u2)
+    self.assertEqual(post.word_count, 2)
+    self.assertEqual(sorted(t.value for t in post.tags.all()), ["django", "tag-0"])
+    self.assertEqual(Tag.objects.filter(value__in=["django", "tag-0", "tag-1", "tag-2"]).count(), 4)
+    self.assertEqual(self.client.get("/api/v1/posts/", {"search": "bulk"}).json()["count"], 63)
+
+    # nothing is created unless every post is valid
+    batch = posts(2, start=100) + posts(1, start=3)
+    batch[0]["author"] = "http://testserver/api/v1/users/nobody@example.com"
+    resp = self.client.post("/api/v1/posts/bulk/", batch, format="json")
+    self.assertEqual(resp.status_code, 400)
+    self.assertIn("author", resp.json()[0])
+    batch[0]["author"] = batch[1]["author"]
+    errors = self.client.post("/api/v1/posts/bulk/", batch, format="json").json()
+    self.assertEqual([bool(e) for e in errors], [False, False, True])
+    self.assertFalse(Post.objects.filter(slug="bulk-post-100").exists())
+
+
+  def test_bulk_comments(self):
+    post = Post.objects.get(slug="post-2-title")
+    self.client.get(f"/api/v1/posts/{post.pk}/")
+
+    resp = self.client.post(
+      f"/api/v1/posts/{post.pk}/comments/bulk/", [{"content": "First"}, {"content": "Second"}], format="json"
+    )
+    self.assertEqual(resp.status_code, 201)
+    self.assertEqual(resp.json()["count"], 2)
+
+    comments = self.client.get(f"/api/v1/posts/{post.pk}/").json()["comments"]
+    self.assertEqual(sorted(c["content"] for c in comments), ["First", "Second"])
+    self.assertEqual({c["creator"]["email"] for c in comments}, {"test@example.com"})
+
+    self.client.credentials()
+    resp = self.client.post(f"/api/v1/posts/{post.pk}/comments/bulk/", [{"content": "Anon"}], format="json")
+    self.assertEqual(resp.status_code, 401)
+
+
+  def test_tag_resolution(self):
+    tag_resolver.clear()
+    Tag.objects.create(value="django")
+    post_dict = {
+      "title": "Tagged",
+      "slug": "tagged",
+      "summary": "Tagged summary",
+      "content": "Tagged content",
+      "author": "http://testserver/api/v1/users/test@example.com",
+      "tags": ["Django", "python", "django", "rest"],
+    }
+
+    with CaptureQueriesContext(connection) as ctx:
+      resp = self.client.post("/api/v1/posts/", post_dict, format="json")
+    self.assertEqual(resp.status_code, 201)
+    self.assertEqual(sorted(resp.json()["tags"]), ["django", "python", "rest"])
+    # leaving out the ones setting and reading the post's tags
+    tag_queries = [q["sql"] for q in ctx.captured_queries if '"blog_tag"' in q["sql"] and "blog_post_tags" not in q["sql"]]
+    # one lookup, one insert of the new tags and one re-read
+    self.assertEqual(len(tag_queries), 3)
+
+    # ids are cached once their transaction commits
+    tag_resolver._ids.set_many(dict(Tag.objects.values_list("value", "pk")))
+    with self.assertNumQueries(0):
+      tags = tag_resolver.resolve_tags(["django", "python"])
+    self.assertEqual(tags["python"], Tag.objects.get(value="python"))
+
+    Tag.objects.filter(value="python").delete()
+    tag = Tag.objects.get(value="rest")
+    tag.value = "drf"
+    tag.save()
+    with self.assertNumQueries(3):
+      tags = tag_resolver.resolve_tags(["python", "rest"])
+    self.assertNotEqual(tags["rest"].pk, tag.pk)
+
+    resp = self.client.post("/api/v1/posts/", dict(post_dict, slug="bad-tags", tags=[" "]), format="json")
+    self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog.api.prefetch import plan
+from blog.api.serializers import CommentSerializer, PostDetailSerializer, PostSerializer
+from blog.models import Comment, Post, Tag
+
+
+class PrefetchPlannerTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.u1 = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.tags = [Tag.objects.create(value=f"tag{i}") for i in range(3)]
+
+    self.client = APIClient()
+    token = Token.objects.create(user=self.u1)
+    self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+  def create_posts(self, count):
+    for i in range(count):
+      user = get_user_model().objects.create_user(email=f"author{Post.objects.count()}@example.com")
+      post = Post.objects.create(
+        author=user,
+        published_at=timezone.now(),
+        title="Title",
+        slug=f"slug-{Post.objects.count()}",
+        summary="Summary",
+        content="Content",
+      )
+      post.tags.set(self.tags)
+      for j in range(2):
+        Comment.objects.create(creator=user, content="Comment", content_object=post)
+
+  def count_queries(self, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as ctx:
+      resp = self.client.get(url)
+    self.assertEqual(resp.status_code, 200)
+    return len(ctx.captured_queries)
+
+  def test_plan(self):
+    select_related, prefetch_related = plan(PostSerializer(), Post)
+    self.assertEqual(select_related, ["author"])
+    self.assertEqual(prefetch_related, ["tags"])
+
+    # a nested serializer over a to-many relation gets a planned Prefetch()
+    class ThreadSerializer(PostSerializer):
+      comments = CommentSerializer(many=True)
+
+    select_related, prefetch_related = plan(ThreadSerializer(), Post)
+    comments = [p for p in prefetch_related if getattr(p, "prefetch_to", None) == "comments"][0]
+    self.assertEqual(comments.queryset.query.select_related, {"creator": {}})
+
+    # the comment preview loads its few comments itself
+    select_related, prefetch_related = plan(PostDetailSerializer(), Post)
+    self.assertEqual(prefetch_related, ["tags"])
+
+  def test_list_query_count_is_constant(self):
+    tag_posts_url = f"/api/v1/tags/{self.tags[0].pk}/posts/"
+    self.create_posts(2)
+    small_page = self.count_queries("/api/v1/posts/")
+    small_tag_page = self.count_queries(tag_posts_url)
+
+    self.create_posts(10)
+    self.assertEqual(self.count_queries("/api/v1/posts/"), small_page)
+    self.assertEqual(self.count_queries(tag_posts_url), small_tag_page)
+
+  def test_detail_query_count_is_constant(self):
+    self.create_posts(1)
+    post = Post.objects.get()
+    few_comments = self.count_queries(f"/api/v1/posts/{post.pk}/")
+
+    for i in range(10):
+      user = get_user_model().objects.create_user(email=f"commenter{i}@example.com")
+      Comment.objects.create(creator=user, content="Comment", content_object=post)
+    self.assertEqual(self.count_queries(f"/api/v1/posts/{post.pk}/"), few_comments)
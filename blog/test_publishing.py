@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from blango.testing import CacheTestCase
+from blog import caching, feed, publishing
+from blog.models import Post, Tag
+
+
+class PublishingTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.tag = Tag.objects.create(value="django")
+    self.published = self.create("published", timezone.now() - timedelta(hours=1))
+    self.scheduled = self.create("scheduled", timezone.now() + timedelta(hours=1))
+    self.scheduled.tags.add(self.tag)
+
+  def create(self, slug, published_at):
+    return Post.objects.create(
+      author=self.user,
+      published_at=published_at,
+      title=f"{slug} title",
+      slug=slug,
+      summary=f"{slug} summary",
+      content=f"{slug} content",
+    )
+
+  def slugs(self):
+    return [post["slug"] for post in self.client.get("/api/v1/posts/").json()["results"]]
+
+  def test_save_sets_is_published(self):
+    self.assertTrue(self.published.is_published)
+    self.assertFalse(self.scheduled.is_published)
+
+    self.published.published_at = None
+    self.published.save()
+    self.assertFalse(Post.objects.get(pk=self.published.pk).is_published)
+
+    self.scheduled.published_at = timezone.now()
+    self.scheduled.save(update_fields=["published_at"])
+    self.assertTrue(Post.objects.get(pk=self.scheduled.pk).is_published)
+
+  def test_publish_due(self):
+    self.assertEqual(publishing.next_publish_at(), self.scheduled.published_at)
+    self.assertEqual(publishing.publish_due(), 0)
+
+    versions = caching.get_versions(["posts", f"tag:{self.tag.pk}"])
+    self.assertEqual(publishing.publish_due(now=timezone.now() + timedelta(hours=2)), 1)
+    self.assertTrue(Post.objects.get(pk=self.scheduled.pk).is_published)
+    self.assertIsNone(publishing.next_publish_at())
+    for old, new in zip(versions, caching.get_versions(["posts", f"tag:{self.tag.pk}"])):
+      self.assertNotEqual(old, new)
+    self.assertEqual([post["slug"] for post in feed.latest()], ["scheduled", "published"])
+
+  def test_requests_read_the_small_entries(self):
+    self.assertEqual(self.slugs(), ["published"])
+    self.assertEqual(publishing.author_drafts(self.user.pk), [(self.scheduled.pk, self.user.pk, self.scheduled.published_at)])
+
+    # once cached, neither the middleware nor the visibility class of a
+    # request reads the list of every draft
+    with mock.patch.object(publishing, "drafts", side_effect=AssertionError):
+      self.assertFalse(publishing.is_due())
+      self.client.force_login(self.user)
+      self.assertEqual(self.slugs(), ["published", "scheduled"])
+
+    # and an author's entry is forgotten with their posts
+    self.scheduled.delete()
+    self.assertEqual(publishing.author_drafts(self.user.pk), [])
+    self.assertIsNone(publishing.next_publish_at())
+
+  def test_command(self):
+    Post.objects.filter(pk=self.scheduled.pk).update(published_at=timezone.now())
+    out = StringIO()
+    call_command("publish_scheduled", once=True, stdout=out)
+    self.assertIn("Published 1 posts", out.getvalue())
+    self.assertTrue(Post.objects.get(pk=self.scheduled.pk).is_published)
+
+  def test_catch_up_on_request(self):
+    self.assertEqual(self.slugs(), ["published"])
+
+    # the worker isn't running; the cached list is invalidated by the request
+    # that publishes the post
+    later = timezone.now() + timedelta(hours=2)
+    with mock.patch("blog.publishing.timezone.now", return_value=later):
+      self.assertEqual(self.slugs(), ["published", "scheduled"])
+
+  def test_published_posts_use_the_partial_index(self):
+    if connection.vendor != "sqlite":
+      self.skipTest("EXPLAIN QUERY PLAN is SQLite's")
+
+    sql, params = Post.objects.filter(is_published=True).order_by("-published_at").query.sql_with_params()
+    with connection.cursor() as cursor:
+      cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+      plan = " ".join(row[-1] for row in cursor.fetchall())
+    self.assertIn("INDEX blog_post_published", plan)
+    self.assertNotIn("TEMP B-TREE", plan)
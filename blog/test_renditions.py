@@ -0,0 +1,171 @@
+import io
+import random
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image, ImageFilter
+
+from blango.testing import CacheTestCase
+from blog import renditions
+from blog.models import Post
+
+
+def png(name="hero.png", size=(300, 200)):
+  data = io.BytesIO()
+  Image.new("RGB", size, "red").save(data, "PNG")
+  return SimpleUploadedFile(name, data.getvalue(), content_type="image/png")
+
+
+def photo(quality, name="photo.jpg", size=(700, 400)):
+  """A JPEG with some detail in it, unlike the flat png()."""
+  noise = random.Random(0).randbytes(size[0] * size[1])
+  image = Image.merge("RGB", [
+    Image.linear_gradient("L").resize(size),
+    Image.frombytes("L", size, noise),
+    Image.linear_gradient("L").rotate(90).resize(size),
+  ]).filter(ImageFilter.GaussianBlur(1))
+  data = io.BytesIO()
+  image.save(data, "JPEG", quality=quality)
+  return SimpleUploadedFile(name, data.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(BLOG_RENDITION_WORKERS=0)
+class RenditionTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.media_root = tempfile.mkdtemp()
+    settings_override = override_settings(MEDIA_ROOT=self.media_root)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+    self.addCleanup(shutil.rmtree, self.media_root)
+
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+
+  def create_post(self, **kwargs):
+    return Post.objects.create(
+      author=self.user,
+      published_at=timezone.now(),
+      title="Title",
+      slug="slug",
+      summary="Summary",
+      content="Content",
+      **kwargs
+    )
+
+  def thumbnail_exists(self, post):
+    return default_storage.exists(post.hero_image.thumbnail["100x100"].name)
+
+  def test_rendered_on_commit(self):
+    with mock.patch.object(renditions, "render", return_value=(0, [], {})) as render:
+      with self.captureOnCommitCallbacks(execute=True):
+        post = self.create_post(hero_image=png())
+        render.assert_not_called()
+    render.assert_called_once_with(post.hero_image.name, (0.5, 0.5))
+
+  def test_sized_renditions_rendered(self):
+    with self.captureOnCommitCallbacks(execute=True):
+      post = self.create_post(hero_image=png())
+    self.assertTrue(self.thumbnail_exists(post))
+    self.assertTrue(default_storage.exists(post.hero_image.crop["200x200"].name))
+
+    created, failed, manifest = renditions.render(post.hero_image.name, post.ppoi)
+    self.assertEqual(failed, [])
+    with default_storage.open(post.hero_image.thumbnail["100x100"].name) as f:
+      self.assertEqual(max(Image.open(f).size), 100)
+
+  def test_only_image_changes_render(self):
+    self.create_post(hero_image=png())
+    post = Post.objects.get()
+
+    with mock.patch.object(renditions, "submit") as submit:
+      with self.captureOnCommitCallbacks(execute=True):
+        post.title = "New title"
+        post.save()
+      submit.assert_not_called()
+
+      with self.captureOnCommitCallbacks(execute=True):
+        post.hero_image.ppoi = (0.2, 0.8)
+        post.save()
+      submit.assert_called_once_with(post.hero_image.name, (0.2, 0.8))
+
+  def test_requests_never_resize(self):
+    post = self.create_post(hero_image=png())
+    resp = self.client.get("/")
+    self.assertContains(resp, post.hero_image.thumbnail["100x100"].url)
+    self.assertFalse(self.thumbnail_exists(post))
+
+  def test_warm_hero_images(self):
+    post = self.create_post(hero_image=png())
+    post.hero_image.ppoi = (0.2, 0.8)
+    post.save()
+    # an image no post uses any more
+    default_storage.save("hero_images/old/unused.png", png())
+
+    with mock.patch.object(renditions, "render", return_value=(1, [], {})) as render:
+      call_command("warm_hero_images", workers=0, stdout=io.StringIO())
+    self.assertCountEqual(render.call_args_list, [
+      mock.call(post.hero_image.name, (0.2, 0.8)),
+      mock.call("hero_images/old/unused.png", (0.5, 0.5)),
+    ])
+
+  def test_responsive_variants(self):
+    post = self.create_post(hero_image=photo(quality=95))
+    with mock.patch.object(renditions, "size_keys", list):
+      renditions.submit(post.hero_image.name, post.ppoi)
+
+    post.refresh_from_db()
+    manifest = post.hero_image_renditions
+    self.assertEqual((manifest["width"], manifest["height"]), (700, 400))
+    self.assertEqual(list(manifest["sources"]), renditions.available_formats())
+    for format_name, variants in manifest["sources"].items():
+      self.assertEqual([width for width, path in variants], [320, 640, 700])
+      for width, path in variants:
+        self.assertTrue(path.endswith(f".{format_name}"))
+        self.assertTrue(default_storage.exists(path))
+
+    # named after the content: rendering again reuses the same files
+    self.assertEqual(renditions.render_responsive(post.hero_image.name), manifest)
+
+    resp = self.client.get(f"/api/v1/posts/{post.pk}/")
+    srcset = resp.json()["hero_image_srcset"]
+    self.assertEqual(srcset["width"], 700)
+    self.assertIn("-640w-", srcset["webp"])
+    self.assertTrue(srcset["webp"].endswith(" 700w"))
+
+    resp = self.client.get(f"/post/{post.slug}/")
+    self.assertContains(resp, '<source type="image/webp"')
+    self.assertContains(resp, 'width="700" height="400"')
+
+  def test_variants_smaller_than_upload(self):
+    post = self.create_post(hero_image=photo(quality=95))
+    manifest = renditions.render_responsive(post.hero_image.name)
+
+    upload_size = post.hero_image.size
+    self.assertEqual(list(manifest["sources"]), renditions.available_formats())
+    for format_name, variants in manifest["sources"].items():
+      self.assertEqual([width for width, path in variants], [320, 640, 700])
+      for width, path in variants:
+        self.assertLess(default_storage.size(path), upload_size, path)
+
+  def test_upload_served_when_not_smaller(self):
+    # re-encoding an already heavily compressed JPEG only adds bytes
+    post = self.create_post(hero_image=photo(quality=30))
+    manifest = renditions.render_responsive(post.hero_image.name)
+
+    sources = manifest["sources"]
+    self.assertEqual(len(sources["jpeg"]), 2)
+    self.assertEqual(sources["jpeg"][0][0], 320)
+    self.assertEqual(sources["jpeg"][1], [700, post.hero_image.name])
+    # the upload is no WebP, so browsers fall back to the <img> instead
+    self.assertNotIn("webp", sources)
+    for format_name, variants in sources.items():
+      for width, path in variants:
+        if path != post.hero_image.name:
+          self.assertLess(default_storage.size(path), post.hero_image.size, path)
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog import search
+from blog.models import Post
+
+
+class SearchTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    self.client = APIClient()
+
+  def create_post(self, slug, title="Title", summary="Summary", content="Content"):
+    return Post.objects.create(
+      author=self.user,
+      published_at=timezone.now(),
+      title=title,
+      slug=slug,
+      summary=summary,
+      content=content,
+    )
+
+  def search(self, **params):
+    resp = self.client.get("/api/v1/posts/", params)
+    self.assertEqual(resp.status_code, 200)
+    return [p["slug"] for p in resp.json()["results"]]
+
+  def test_backend(self):
+    self.assertEqual(search.backend(), "fts5")
+
+  def test_search(self):
+    self.create_post("cats", content="Cats sleep all day")
+    self.create_post("dogs", content="Dogs are running in the park")
+    self.create_post("both", title="Dogs", content="Dogs chase cats")
+
+    self.assertEqual(sorted(self.search(search="cats")), ["both", "cats"])
+    # stemmed, and every word has to match
+    self.assertEqual(self.search(search="dog chased"), ["both"])
+    # the title match ranks first
+    self.assertEqual(self.search(search="dogs")[0], "both")
+    # query syntax is treated as text
+    self.assertEqual(self.search(search='cats" OR "dogs'), [])
+
+  def test_column_filters(self):
+    self.create_post("a", summary="Gardening tips", content="Roses")
+    self.create_post("b", summary="Roses", content="Gardening tips")
+
+    self.assertEqual(self.search(summary="gardening"), ["a"])
+    self.assertEqual(self.search(content="gardening"), ["b"])
+
+  def test_index_follows_changes(self):
+    post = self.create_post("post", content="Original words")
+    self.assertEqual(self.search(search="original"), ["post"])
+
+    post.content = "Replacement words"
+    post.save()
+    self.assertEqual(self.search(search="original"), [])
+    self.assertEqual(self.search(search="replacement"), ["post"])
+
+    post.delete()
+    self.assertEqual(self.search(search="replacement"), [])
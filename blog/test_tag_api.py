@@ -3,11 +3,14 @@ from requests.auth import HTTPBasicAuth
 from rest_framework.test import RequestsClient
 
 from django.contrib.auth import get_user_model
+from blango.testing import IsolatedCacheMixin, isolated_cache
 from blog.models import Tag
 
 
-class TagApiTestCase(LiveServerTestCase):
+@isolated_cache()
+class TagApiTestCase(IsolatedCacheMixin, LiveServerTestCase):
     def setUp(self):
+        super().setUp()
         get_user_model().objects.create_user(
             email="testuser@example.com", password="password"
         )
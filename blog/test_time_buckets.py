@@ -0,0 +1,136 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog import time_buckets
+from blog.models import Post
+
+
+class TimeBucketsTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = get_user_model().objects.create_user(email="author@example.com", password="password")
+    # noon yesterday, so every post below is in the past
+    self.now = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=1), time(12)))
+    self.posts = {
+      "recent": self.create("recent", self.now - timedelta(minutes=30)),
+      "morning": self.create("morning", self.now - timedelta(hours=11)),
+      "days-ago": self.create("days-ago", self.now - timedelta(days=3)),
+      "old": self.create("old", self.now - timedelta(days=10)),
+    }
+
+  def create(self, slug, published_at):
+    return Post.objects.create(
+      author=self.author,
+      published_at=published_at,
+      title=f"{slug} title",
+      slug=slug,
+      summary=f"{slug} summary",
+      content=f"{slug} content",
+    )
+
+  def slugs(self, period_name, **kwargs):
+    pks = time_buckets.post_ids(period_name, now=self.now, **kwargs)
+    slugs = dict(Post.objects.values_list("pk", "slug"))
+    return [slugs[pk] for pk in pks]
+
+  def test_windows(self):
+    self.assertEqual(self.slugs("new"), ["recent"])
+    self.assertEqual(self.slugs("today"), ["recent", "morning"])
+    self.assertEqual(self.slugs("week"), ["recent", "morning", "days-ago"])
+
+    # read from the buckets
+    with self.assertNumQueries(0):
+      time_buckets.post_ids("week", now=self.now)
+
+  def test_buckets_follow_publication(self):
+    self.slugs("week")
+
+    post = self.posts["days-ago"]
+    post.published_at = self.now - timedelta(minutes=5)
+    post.save()
+    self.assertEqual(self.slugs("new"), ["days-ago", "recent"])
+
+    post.published_at = None
+    post.save()
+    self.assertEqual(self.slugs("week"), ["recent", "morning"])
+
+    self.posts["recent"].delete()
+    self.assertEqual(self.slugs("today"), ["morning"])
+
+  def test_drafts_merged_in(self):
+    draft = (0, self.author.pk, self.now + timedelta(hours=1))
+    self.assertEqual(time_buckets.post_ids("week", drafts=[draft], now=self.now)[0], 0)
+    self.assertNotIn(0, time_buckets.post_ids("today", drafts=[(0, self.author.pk, None)], now=self.now))
+
+  def test_invalid_period(self):
+    resp = APIClient().get("/api/v1/posts/by-time/month/")
+    self.assertEqual(resp.status_code, 404)
+
+
+class PostsByTimeApiTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    user_model = get_user_model()
+    self.author = user_model.objects.create_user(email="author@example.com", password="password")
+    self.reader = user_model.objects.create_user(email="reader@example.com", password="password")
+    self.staff = user_model.objects.create_user(email="staff@example.com", password="password", is_staff=True)
+    now = timezone.now()
+    for i in range(3):
+      self.create(f"post-{i}", now - timedelta(days=i, minutes=10), self.reader)
+    self.create("scheduled", now + timedelta(days=1), self.author)
+
+  def create(self, slug, published_at, author):
+    return Post.objects.create(
+      author=author,
+      published_at=published_at,
+      title=f"{slug} title",
+      slug=slug,
+      summary=f"{slug} summary",
+      content=f"{slug} content",
+    )
+
+  def client_for(self, user):
+    client = APIClient()
+    if user is not None:
+      client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.get_or_create(user=user)[0].key)
+    return client
+
+  def slugs(self, client, period_name="week", **params):
+    resp = client.get(f"/api/v1/posts/by-time/{period_name}/", params)
+    self.assertEqual(resp.status_code, 200)
+    return [post["slug"] for post in resp.json()["results"]]
+
+  def test_visibility(self):
+    self.assertEqual(self.slugs(self.client_for(None)), ["post-0", "post-1", "post-2"])
+    self.assertEqual(self.slugs(self.client_for(self.reader)), ["post-0", "post-1", "post-2"])
+    self.assertEqual(self.slugs(self.client_for(self.author)), ["scheduled", "post-0", "post-1", "post-2"])
+    self.assertEqual(self.slugs(self.client_for(self.staff)), ["scheduled", "post-0", "post-1", "post-2"])
+    self.assertEqual(self.slugs(self.client_for(None), "new"), ["post-0"])
+
+    # filters and orderings go through the queryset
+    self.assertEqual(self.slugs(self.client_for(self.author), ordering="title"), ["post-0", "post-1", "post-2", "scheduled"])
+    self.assertEqual(self.slugs(self.client_for(None), author=self.author.pk), [])
+
+  def test_users_without_drafts_share_responses(self):
+    self.slugs(self.client_for(None))
+
+    # the reader only costs the token lookup
+    reader = self.client_for(self.reader)
+    with self.assertNumQueries(1):
+      self.assertEqual(self.slugs(reader), ["post-0", "post-1", "post-2"])
+
+    self.create("new", timezone.now(), self.reader)
+    self.assertEqual(self.slugs(reader)[0], "new")
+
+  def test_pages(self):
+    for i in range(3, 120):
+      self.create(f"post-{i}", timezone.now() - timedelta(hours=i), self.reader)
+    resp = self.client_for(None).get("/api/v1/posts/by-time/week/", {"page": 2}).json()
+    self.assertEqual(resp["count"], 120)
+    self.assertEqual(resp["results"][0]["slug"], "post-100")
@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from blango.testing import CacheTestCase
+from blog.api.views import PostViewSet
+from blog.models import Post
+
+
+class VisibilityCacheTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    user_model = get_user_model()
+    self.author = user_model.objects.create_user(email="author@example.com", password="password")
+    self.reader = user_model.objects.create_user(email="reader@example.com", password="password", first_name="Rita")
+    self.staff = user_model.objects.create_user(email="staff@example.com", password="password", is_staff=True)
+    self.published = self.create("published", timezone.now())
+    self.draft = self.create("draft", None)
+
+  def create(self, slug, published_at):
+    return Post.objects.create(
+      author=self.author,
+      published_at=published_at,
+      title=f"{slug} title",
+      slug=slug,
+      summary=f"{slug} summary",
+      content=f"{slug} content",
+    )
+
+  def client_for(self, user):
+    client = APIClient()
+    if user is not None:
+      client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.get_or_create(user=user)[0].key)
+    return client
+
+  def slugs(self, client, path="/api/v1/posts/"):
+    resp = client.get(path)
+    self.assertEqual(resp.status_code, 200)
+    return [post["slug"] for post in resp.json()["results"]]
+
+  def test_classes_see_their_posts(self):
+    self.assertEqual(self.slugs(self.client_for(None)), ["published"])
+    self.assertEqual(self.slugs(self.client_for(self.reader)), ["published"])
+    self.assertEqual(self.slugs(self.client_for(self.author)), ["published", "draft"])
+    self.assertEqual(self.slugs(self.client_for(self.staff)), ["published", "draft"])
+
+    self.assertEqual(self.client_for(None).get(f"/api/v1/posts/{self.draft.pk}/").status_code, 404)
+    self.assertEqual(self.client_for(self.author).get(f"/api/v1/posts/{self.draft.pk}/").status_code, 200)
+
+  def test_public_responses_shared(self):
+    self.slugs(self.client_for(None))
+
+    # a token and a session of users without drafts hit the anonymous entry
+    reader = self.client_for(self.reader)
+    with mock.patch.object(PostViewSet, "get_serializer", side_effect=AssertionError):
+      self.assertEqual(self.slugs(reader), ["published"])
+      session = APIClient()
+      session.force_login(self.reader)
+      self.assertEqual(self.slugs(session), ["published"])
+
+    # the author's drafts are merged in under their own class
+    self.assertEqual(self.slugs(self.client_for(self.author)), ["published", "draft"])
+
+    # the user's first draft moves them to their own class
+    Post.objects.create(
+      author=self.reader, published_at=None, title="Reader draft", slug="reader-draft", summary="Summary", content="Content"
+    )
+    self.assertEqual(self.slugs(reader), ["published", "reader-draft"])
+    self.assertEqual(self.slugs(self.client_for(None)), ["published"])
+
+  def test_browsable_api_not_shared(self):
+    # the page shows who is logged in
+    resp = self.client_for(self.reader).get("/api/v1/posts/", HTTP_ACCEPT="text/html")
+    self.assertNotContains(resp, "Log in")
+
+    resp = self.client_for(None).get("/api/v1/posts/", HTTP_ACCEPT="text/html")
+    self.assertContains(resp, "Log in")
+
+  def test_bad_credentials(self):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION="Token invalid")
+    self.assertEqual(client.get("/api/v1/posts/").status_code, 401)
+
+
+class AsyncVisibilityTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = get_user_model().objects.create_user(email="author@example.com", password="password")
+    self.token = Token.objects.create(user=self.author)
+    Post.objects.create(
+      author=self.author, published_at=None, title="Draft", slug="draft", summary="Summary", content="Content"
+    )
+    self.async_client = AsyncClient()
+
+  async def test_async_views_authenticate(self):
+    resp = await self.async_client.get("/api/v1/posts/")
+    self.assertEqual(resp.json()["results"], [])
+
+    # the anonymous entry isn't served to the author; Django 3.2's AsyncClient
+    # sends extra arguments as headers under their own name
+    resp = await self.async_client.get("/api/v1/async/posts/", AUTHORIZATION="Token " + self.token.key)
+    self.assertEqual([post["slug"] for post in resp.json()["results"]], ["draft"])
+
+    resp = await self.async_client.get("/api/v1/async/posts/", AUTHORIZATION="Token invalid")
+    self.assertEqual(resp.status_code, 401)
@@ -1,3 +1,94 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from blango.testing import CacheTestCase
+from blog.models import Post
+from blog.views import INDEX_PAGE_SIZE
+
+
+class IndexViewTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+    now = timezone.now()
+
+    # two posts share each timestamp so the pk tie-breaker is exercised
+    self.posts = [
+      Post.objects.create(
+        author=self.user,
+        published_at=now - timedelta(minutes=i // 2),
+        title=f"Post{i} title",
+        slug=f"post-{i}-slug",
+        summary=f"Post{i} summary",
+        content="one two three\nfour",
+      )
+      for i in range(INDEX_PAGE_SIZE + 5)
+    ]
+
+    # unpublished posts never show up on the index
+    Post.objects.create(
+      author=self.user,
+      published_at=now + timedelta(days=1),
+      title="Future title",
+      slug="future-slug",
+      summary="Future summary",
+      content="Future content",
+    )
+
+  def test_index_keyset_pages(self):
+    resp = self.client.get("/")
+    self.assertEqual(resp.status_code, 200)
+    first_page = resp.context["posts"]
+    self.assertEqual(len(first_page), INDEX_PAGE_SIZE)
+    self.assertIsNotNone(resp.context["next_cursor"])
+
+    resp = self.client.get("/", {"cursor": resp.context["next_cursor"]})
+    second_page = resp.context["posts"]
+    self.assertEqual(len(second_page), 5)
+    self.assertIsNone(resp.context["next_cursor"])
+
+    seen = [p.pk for p in first_page] + [p.pk for p in second_page]
+    self.assertEqual(sorted(seen), sorted(p.pk for p in self.posts))
+
+  def test_index_word_count(self):
+    resp = self.client.get("/")
+    self.assertEqual(resp.context["posts"][0].word_count, 4)
+    self.assertContains(resp, "(4 words, 1 min read)")
+
+  def test_index_invalid_cursor(self):
+    resp = self.client.get("/", {"cursor": "not-a-cursor"})
+    self.assertEqual(resp.status_code, 404)
+
+
+class PostMetadataTestCase(CacheTestCase):
+  def setUp(self):
+    super().setUp()
+    self.user = get_user_model().objects.create_user(email="test@example.com", password="password")
+
+  def test_word_count_kept_on_save(self):
+    post = Post.objects.create(
+      author=self.user, title="Title", slug="slug", summary="Summary", content="word " * 450
+    )
+    self.assertEqual(post.word_count, 450)
+    self.assertEqual(post.reading_time, 3)
+
+    post.content = "just three words"
+    post.save(update_fields=["content"])
+    post.refresh_from_db()
+    self.assertEqual(post.word_count, 3)
+    self.assertEqual(post.reading_time, 1)
+
+  def test_backfill_command(self):
+    post = Post.objects.create(
+      author=self.user, title="Title", slug="slug", summary="Summary", content="a b c d e"
+    )
+    Post.objects.filter(pk=post.pk).update(word_count=0, reading_time=0)
+
+    call_command("backfill_post_metadata", batch_size=1, stdout=StringIO())
+    post.refresh_from_db()
+    self.assertEqual(post.word_count, 5)
+    self.assertEqual(post.reading_time, 1)
@@ -0,0 +1,124 @@
+"""
+Day buckets of published posts for the posts-by-time windows.
+
+Each day has a cache entry listing the (pk, published_at) of the posts
+published that day, newest first. The windows ("new", "today", "week") are
+read from the one to eight buckets they span, so finding the posts in a
+window costs a single cache get_many however many posts it holds. Missing
+buckets are read back from the database in one range query on the partial
+blog_post_published index.
+
+The signal handlers in blog.signals forget the buckets of the days a post
+was published on, before and after a write, so only those days are read
+back. Scheduled and other unpublished posts aren't in the buckets; the
+staff and their authors get them from blog.publishing.drafts().
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.http import Http404
+from django.utils import timezone
+
+from blog.caching import invalidate_now_and_on_commit
+
+BUCKET_KEY_PREFIX = "blog:bucket:"
+
+# buckets are forgotten when their posts change; days older than a week
+# aren't read again
+BUCKET_TTL = 60 * 60 * 24 * 8
+
+PERIODS = ("new", "today", "week")
+
+
+def bucket_key(day):
+  return f"{BUCKET_KEY_PREFIX}{day.isoformat()}"
+
+
+def start_of(day):
+  return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def window(period_name, now=None):
+  """The (start, end) of a window, end None for no upper bound."""
+  now = now or timezone.now()
+  if period_name == "new":
+    return now - timedelta(hours=1), None
+  if period_name == "today":
+    today = timezone.localdate(now)
+    return start_of(today), start_of(today + timedelta(days=1))
+  if period_name == "week":
+    return now - timedelta(days=7), None
+  raise Http404(f"Time period {period_name} is not valid, should be " f"'new', 'today' or 'week'")
+
+
+def in_window(published_at, start, end):
+  return published_at is not None and published_at >= start and (end is None or published_at < end)
+
+
+def _read_back(days):
+  from blog.models import Post
+
+  buckets = {day: [] for day in days}
+  posts = (
+    Post.objects.filter(
+      is_published=True, published_at__gte=start_of(min(days)), published_at__lt=start_of(max(days) + timedelta(days=1))
+    )
+    .order_by("-published_at", "-pk")
+    .values_list("pk", "published_at")
+  )
+  for pk, published_at in posts:
+    day = timezone.localdate(published_at)
+    if day in buckets:
+      buckets[day].append((pk, published_at))
+
+  cache.set_many({bucket_key(day): posts for day, posts in buckets.items()}, BUCKET_TTL)
+  return buckets
+
+
+def buckets(days):
+  """{day: [(pk, published_at), ...]} of the published posts of each of `days`."""
+  keys = {bucket_key(day): day for day in days}
+  cached = cache.get_many(keys)
+  found = {keys[key]: posts for key, posts in cached.items()}
+  missing = [day for day in days if day not in found]
+  if missing:
+    found.update(_read_back(missing))
+  return found
+
+
+def published(period_name, now=None):
+  """(pk, published_at) of the published posts in the window, newest first."""
+  now = now or timezone.now()
+  start, end = window(period_name, now)
+  last = timezone.localdate(end - timedelta(microseconds=1) if end else now)
+  days = [last - timedelta(days=n) for n in range((last - timezone.localdate(start)).days + 1)]
+
+  by_day = buckets(days)
+  return [
+    (pk, published_at)
+    for day in days
+    for pk, published_at in by_day[day]
+    if in_window(published_at, start, end)
+  ]
+
+
+def forget(*published_ats):
+  keys = {bucket_key(timezone.localdate(published_at)) for published_at in published_ats if published_at is not None}
+  if not keys:
+    return
+  invalidate_now_and_on_commit(lambda: cache.delete_many(keys))
+
+
+def post_ids(period_name, drafts=(), now=None):
+  """
+  Primary keys of the published posts in the window and of the `drafts`
+  ((pk, author_id, published_at), see blog.publishing.drafts()) that fall in
+  it, newest first.
+  """
+  now = now or timezone.now()
+  start, end = window(period_name, now)
+  posts = published(period_name, now)
+  scheduled = [(pk, published_at) for pk, author_id, published_at in drafts if in_window(published_at, start, end)]
+  if scheduled:
+    posts = sorted(posts + scheduled, key=lambda post: (post[1], post[0]), reverse=True)
+  return [pk for pk, published_at in posts]
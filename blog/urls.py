@@ -1,9 +1,13 @@
 from django.urls import path
-from blog import views
+from blog import async_views, views
 
 
 urlpatterns = [
     path('', views.index),
     path("post/<slug>/", views.post_detail, name="blog-post-detail"),
+    path("post/<slug>/comments/", views.post_comments, name="blog-post-comments"),
     path("ip/", views.get_ip),
+    # async variants for ASGI, see blog.async_views
+    path("async/", async_views.index),
+    path("async/post/<slug>/", async_views.post_detail, name="blog-post-detail-async"),
 ]
\ No newline at end of file
@@ -1,7 +1,9 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from .models import Post
-from django.utils import timezone
 from .forms import CommentForm
+from .pagination import keyset_page
+from .caching import FRAGMENT_KEY_PREFIX, cached_response, get_or_compute, get_versions, seconds_until_next_publish
 # Create your views here.
 
 import logging
@@ -20,31 +22,46 @@ logger = logging.getLogger(__name__)
 from django.core.cache import cache
 # cache is the equivalent of caches["default"]/our default_cache variable
 
+# number of posts shown per page of the index
+INDEX_PAGE_SIZE = 20
+
+# number of comments shown on a post page and loaded by "Load more comments"
+COMMENT_PAGE_SIZE = 20
+
+# the index is invalidated by the "posts" and "users" scopes, see blog.caching
+INDEX_CACHE_TTL = 60 * 60
+
+# the parts of a post page are invalidated by the scopes in post_page_scopes()
+POST_PAGE_CACHE_TTL = 60 * 60
+
+
+def index_timeout(request):
+    return seconds_until_next_publish(INDEX_CACHE_TTL)
+
+
 #caches the response for 300 sec 
 # @cache_page(300)
 # @vary_on_headers("Cookie") #or vary_on_cookie
+@cached_response(index_timeout, scopes=["posts", "users"], vary_on=("Cookie",))
+@vary_on_cookie
 def index(request):
     # #demo for cache_page and cookie test
     # from django.http import HttpResponse
     # return HttpResponse(str(request.user).encode("ascii"))
 
-    posts = Post.objects.filter(published_at__lte=timezone.now()).select_related("author") #lte = less than equal to
-
-    # posts = (Post.objects.filter(published_at__lte=timezone.now())
-    #         .select_related("author")
-    #         .only("title", "summary", "content", "author", "published_at", "slug")
-    #         )
+    # the index pages with a keyset cursor on (published_at, pk) instead of
+    # loading the whole archive; content is deferred as the template only
+    # needs the stored word count
+    posts = (Post.objects.filter(is_published=True)
+            .select_related("author")
+            .defer("content")
+            )
 
-    # posts = (Post.objects.filter(published_at__lte=timezone.now())
-    #         .select_related("author")
-    #         .defer("created_at", "modified_at")
-    #         )
+    posts, next_cursor = keyset_page(posts, request.GET.get("cursor"), INDEX_PAGE_SIZE)
 
     logger.debug("Got %d posts", len(posts))
-    
-    cache.set(f"post_count", len(posts), 30)
 
-    return render(request, "blog/index.html", {"posts": posts})
+    return render(request, "blog/index.html", {"posts": posts, "next_cursor": next_cursor})
 
 
 
@@ -60,7 +77,8 @@ The Comment is then saved, and finally, we perform a redirect back to the curren
 """
 
 def post_detail(request, slug):
-    post = get_object_or_404(Post, slug=slug)
+    # the content is only read to render the page parts, see post_page()
+    post = get_object_or_404(Post.objects.defer("content"), slug=slug)
 
     if request.user.is_active:
         if request.method == "POST":
@@ -79,7 +97,59 @@ def post_detail(request, slug):
     else:
         comment_form = None
     
-    return render(request, "blog/post-detail.html", {"post": post, "comment_form": comment_form})
+    page = post_page(post)
+    return render(
+        request,
+        "blog/post-detail.html",
+        {"post": post, "page": page, "comment_form": comment_form, "next_cursor": page["next_cursor"]},
+    )
+
+
+def post_page_scopes(post):
+    # "post:<pk>" is bumped by the post's comments too; "users" covers the
+    # names of the author and of the commenters
+    return [f"post:{post.pk}", f"profile:{post.author_id}", "users"]
+
+
+def post_page(post):
+    """
+    The parts of a post's page that are the same for every visitor: the
+    byline as others see it, the content, the first page of comments and the
+    author's profile. They're rendered once per version of the post, its
+    comments and the author's profile and shared by anonymous and logged in
+    visitors; post-detail.html fills in the per-user parts around them.
+    """
+    versions = ":".join(str(v) for v in get_versions(post_page_scopes(post)))
+    key = f"{FRAGMENT_KEY_PREFIX}post-page:{post.pk}:{versions}"
+    return get_or_compute(key, lambda: render_post_page(post), POST_PAGE_CACHE_TTL)
+
+
+def render_post_page(post):
+    comments, next_cursor = comment_page(post, None)
+    context = {"post": post, "comments": comments, "next_cursor": next_cursor}
+    return {
+        "byline": render_to_string("blog/post-byline.html", context),
+        "body": render_to_string("blog/post-body.html", context),
+        "comments": render_to_string("blog/post-comments.html", context),
+        "author": render_to_string("blog/post-author.html", context),
+        "next_cursor": next_cursor,
+    }
+
+
+def comment_page(post, cursor):
+    # oldest first, in the order of the blog_comment_thread index
+    return keyset_page(
+        post.comments.select_related("creator"), cursor, COMMENT_PAGE_SIZE, field="created_at", descending=False
+    )
+
+
+def post_comments(request, slug):
+    """The page of comments after ?cursor=, as an HTML fragment for "Load more comments"."""
+    post = get_object_or_404(Post, slug=slug)
+    comments, next_cursor = comment_page(post, request.GET.get("cursor"))
+    return render(
+        request, "blog/comment-list.html", {"post": post, "comments": comments, "next_cursor": next_cursor}
+    )
 
 
 def get_ip(request):